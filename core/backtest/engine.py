@@ -0,0 +1,339 @@
+"""
+Backtester — إعادة تشغيل الشموع التاريخية عبر خط القرار الكامل.
+Strategy scores are precomputed for every bar in vectorized blocks over the same `lookback`
+window the scanner hands to strategies, so they match MomentumStrategy / PatternStrategy /
+RSIStrategy bar for bar. Only bars where the scanner gate and the brain threshold can fire go
+through the real WeightedBrain.evaluate and RiskGovernor.validate_trade, in time order across
+the whole portfolio. Fills, SL/TP exits (as TradeMonitor), fees and funding are simulated.
+"""
+import heapq
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from core.tools.candle_series import CandleSeries
+from core.tools.execution_guard import MIN_AVAILABLE_BALANCE, risk_notional
+from core.tools.indicators import _wilder_averages, window_range
+from core.tools.momentum_engine import LONG, SHORT, FLAT, DIRECTION_NAMES, OHLCV, MomentumEngine
+from core.tools.risk_governor import RiskGovernor
+from core.tools.strategy_scores import StrategyScore
+from core.tools.weighted_brain import WeightedBrain
+
+# (T,) score and (T,) int8 direction for the window ending at each bar
+Signals = Tuple[np.ndarray, np.ndarray]
+FundingHistory = Tuple[np.ndarray, np.ndarray]  # (funding times ms, rates)
+DAY_MS = 86_400_000
+
+
+@dataclass
+class BacktestConfig:
+    lookback: int = 100          # candles per decision (MarketScanner's SCAN_LOOKBACK)
+    initial_equity: float = 1000.0
+    fee_rate: float = 0.0004     # taker fee per side
+    slippage: float = 0.0002     # adverse fill, fraction of price, on entry and exit
+    block: int = 4096            # windows per vectorized block (bounds memory)
+
+
+# ---------- vectorized per-bar strategy signals ----------
+def _window_blocks(series: CandleSeries, lookback: int, block: int, columns=OHLCV):
+    """Yield (first bar index, (n, lookback, len(columns)) windows) over the whole series."""
+    views = [sliding_window_view(getattr(series, name), lookback) for name in columns]
+    for start in range(0, len(views[0]), block):
+        yield start + lookback - 1, np.stack([v[start:start + block] for v in views], axis=-1)
+
+
+def momentum_signals(series: CandleSeries, lookback: int, block: int = 4096) -> Signals:
+    engine = MomentumEngine()
+    score = np.zeros(len(series))
+    direction = np.zeros(len(series), dtype=np.int8)
+    if len(series) < lookback:
+        return score, direction
+    for first, windows in _window_blocks(series, lookback, block):
+        s, d = engine.analyze_batch(windows)
+        score[first:first + len(s)] = s
+        direction[first:first + len(d)] = d
+    return score, direction
+
+
+def pattern_signals(series: CandleSeries, lookback: int, block: int = 4096) -> Signals:
+    # PatternsEngine: 30-bar range under 2% of the close → 2.0 in the direction of the last bar
+    score = np.zeros(len(series))
+    direction = np.zeros(len(series), dtype=np.int8)
+    if lookback < 50 or len(series) < lookback:
+        return score, direction
+    squeeze = window_range(series.high, series.low, 30) < series.close * 0.02
+    squeeze[:lookback - 1] = False
+    up = np.r_[False, series.close[1:] > series.close[:-1]]
+    score[squeeze] = 2.0
+    direction[squeeze] = np.where(up[squeeze], LONG, SHORT)
+    return score, direction
+
+
+def rsi_signals(series: CandleSeries, lookback: int, block: int = 4096, period: int = 14) -> Signals:
+    # RSIStrategy reads the legacy RSI, which is seeded at the window start
+    score = np.zeros(len(series))
+    direction = np.zeros(len(series), dtype=np.int8)
+    if lookback < period + 5 or len(series) < lookback:
+        return score, direction
+    for first, windows in _window_blocks(series, lookback, block, ("close",)):
+        avg_gain, avg_loss = _wilder_averages(windows[..., 0], period)
+        gain, loss = avg_gain[:, -2], avg_loss[:, -2]  # the newest delta is excluded
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = np.where(loss == 0, 100.0, gain / loss)
+        value = 100 - 100 / (1 + rs)
+        s = np.select([value < 25, value > 75, value > 60, value < 40], [2.0, 2.0, 1.0, 1.0], 0.0)
+        d = np.select([value < 25, value > 75, value > 60, value < 40], [LONG, SHORT, LONG, SHORT], FLAT)
+        score[first:first + len(s)] = s
+        direction[first:first + len(d)] = d
+    return score, direction
+
+
+# Keyed like policy strategy_weights; funding_oi needs OI history and is not replayed
+SIGNAL_BUILDERS: Dict[str, Callable[..., Signals]] = {
+    "momentum": momentum_signals,
+    "patterns": pattern_signals,
+    "rsi": rsi_signals,
+}
+
+
+def fetch_funding_history(client, symbol: str, start_ms: int, end_ms: int) -> FundingHistory:
+    """Paged /fapi/v1/fundingRate history as (times, rates) arrays."""
+    times, rates = [], []
+    while start_ms < end_ms:
+        rows = client._get("/fapi/v1/fundingRate",
+                           {"symbol": symbol, "startTime": start_ms, "endTime": end_ms, "limit": 1000})
+        if not isinstance(rows, list) or not rows:
+            break
+        for row in rows:
+            times.append(int(row["fundingTime"]))
+            rates.append(float(row["fundingRate"]))
+        start_ms = times[-1] + 1
+        if len(rows) < 1000:
+            break
+    return np.asarray(times, dtype=np.int64), np.asarray(rates, dtype=np.float64)
+
+
+# ---------- simulation ----------
+class _Ledger:
+    """Memory stand-in for RiskGovernor: the state keys it reads, nothing persisted."""
+    def __init__(self):
+        self.state = {"date": None, "daily_pnl": 0.0, "open_positions": {}}
+        self._day = None
+
+    def roll_day(self, ts_ms: int):
+        """Memory._check_new_day on simulated time: daily PnL resets at UTC midnight."""
+        day = ts_ms // DAY_MS
+        if day != self._day:
+            self._day = day
+            self.state["date"] = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+            self.state["daily_pnl"] = 0.0
+
+
+@dataclass
+class BacktestResult:
+    trades: List[Dict]
+    equity_times: np.ndarray
+    equity: np.ndarray               # realized equity after each closed trade
+    attribution: Dict[str, Dict[str, float]]
+    initial_equity: float
+    rejections: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def drawdown(self) -> np.ndarray:
+        return self.equity / np.maximum.accumulate(self.equity) - 1.0
+
+    def summary(self) -> Dict[str, float]:
+        pnl = np.array([t["pnl"] for t in self.trades])
+        gains, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+        return {
+            "trades": len(pnl),
+            "net_pnl": float(pnl.sum()),
+            "return_pct": float(self.equity[-1] / self.initial_equity - 1.0),
+            "win_rate": float((pnl > 0).mean()) if len(pnl) else 0.0,
+            "profit_factor": float(gains / losses) if losses else float("inf") if gains else 0.0,
+            "max_drawdown": float(self.drawdown.min()),
+            "fees": float(sum(t["fees"] for t in self.trades)),
+            "funding": float(sum(t["funding"] for t in self.trades)),
+        }
+
+
+class Backtester:
+    def __init__(self, policy: dict, config: BacktestConfig = None, signal_builders: Dict = None):
+        self.policy = policy
+        self.config = config or BacktestConfig()
+        builders = signal_builders or SIGNAL_BUILDERS
+        weights = policy.get('strategy_weights', {})
+        self.builders = {name: fn for name, fn in builders.items() if weights.get(name)}
+        self.weights = {name: weights[name] for name in self.builders}
+        self.brain = WeightedBrain(policy)
+        # MarketScanner only passes symbols whose momentum score clears its threshold
+        self.scan_threshold = policy.get('scanner', {}).get('entry_threshold', 3.5)
+
+    def precompute(self, series: CandleSeries) -> Dict[str, Signals]:
+        """Every active strategy's score and direction for each bar of one symbol."""
+        return {name: fn(series, self.config.lookback, self.config.block)
+                for name, fn in self.builders.items()}
+
+    def _entry_mask(self, signals: Dict[str, Signals], scan_score: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Bars where the scanner gate and brain threshold pass (same sums, same order)."""
+        n = len(scan_score)
+        long_total, short_total = np.zeros(n), np.zeros(n)
+        for name, (score, direction) in signals.items():
+            weighted = score * self.weights[name]
+            long_total += np.where(direction == LONG, weighted, 0.0)
+            short_total += np.where(direction == SHORT, weighted, 0.0)
+        final = np.abs(long_total - short_total)
+        mask = (final >= self.policy['scanner']['entry_threshold']) & (long_total != short_total)
+        if self.policy.get('conflict_policy') != "dominant":
+            mask[:] = False  # WeightedBrain only decides under "dominant"
+        mask &= scan_score >= self.scan_threshold
+        mask[:self.config.lookback - 1] = False
+        return mask, final
+
+    @staticmethod
+    def _scores(signals: Dict[str, Signals], i: int) -> List[StrategyScore]:
+        return [StrategyScore(name=name, score=float(score[i]), direction=DIRECTION_NAMES[int(direction[i])],
+                              confidence=0.0, reason="backtest")
+                for name, (score, direction) in signals.items()]
+
+    @staticmethod
+    def _first_exit(series: CandleSeries, i: int, long: bool, sl: float, tp: float) -> Tuple[int, float, str]:
+        """First bar after `i` touching SL or TP (SL first when both do); END_OF_DATA otherwise."""
+        start, step = i + 1, 256
+        while start < len(series):
+            stop = min(start + step, len(series))
+            high, low = series.high[start:stop], series.low[start:stop]
+            sl_hit = low <= sl if long else high >= sl
+            tp_hit = high >= tp if long else low <= tp
+            hits = np.flatnonzero(sl_hit | tp_hit)
+            if len(hits):
+                j = start + int(hits[0])
+                open_ = series.open[j]
+                if sl_hit[hits[0]]:  # a gap through the stop fills at the open
+                    return j, (min(open_, sl) if long else max(open_, sl)), "STOP_LOSS"
+                return j, (max(open_, tp) if long else min(open_, tp)), "TAKE_PROFIT"
+            start, step = stop, step * 2
+        return len(series) - 1, float(series.close[-1]), "END_OF_DATA"
+
+    @staticmethod
+    def _funding_cost(series: CandleSeries, funding: Optional[FundingHistory], start_ms: int,
+                      end_ms: int, signed_qty: float) -> float:
+        """Funding paid over (start, end]: rate × position value at each funding time."""
+        if funding is None or not len(funding[0]):
+            return 0.0
+        times, rates = funding
+        lo, hi = np.searchsorted(times, [start_ms, end_ms], side="right")
+        if hi <= lo:
+            return 0.0
+        bars = np.clip(np.searchsorted(series.open_time, times[lo:hi], side="right") - 1, 0, len(series) - 1)
+        return float(signed_qty * np.sum(rates[lo:hi] * series.close[bars]))
+
+    def run(self, data: Dict[str, CandleSeries], funding: Dict[str, FundingHistory] = None,
+            signals: Dict[str, Dict[str, Signals]] = None) -> BacktestResult:
+        """
+        Replay `data` ({symbol: series}). `signals` ({symbol: {strategy: (score, direction)}})
+        skips the precompute step, e.g. arrays shared by a parameter sweep; strategies without
+        weight in this policy are ignored.
+        """
+        cfg = self.config
+        funding = funding or {}
+        shared = signals or {}
+        # 1. vectorized signals, then the bars that can produce an entry
+        signals, events = {}, []
+        for symbol, series in data.items():
+            given = shared.get(symbol)
+            signals[symbol] = ({name: given[name] for name in self.builders} if given is not None
+                               else self.precompute(series))
+            # the scanner gate runs the momentum engine whatever its strategy weight
+            scan = (given or signals[symbol]).get("momentum") or momentum_signals(series, cfg.lookback, cfg.block)
+            mask, final = self._entry_mask(signals[symbol], scan[0])
+            for i in np.flatnonzero(mask):
+                # decided at the bar close; stronger signals first within the same close
+                events.append((int(series.close_time[i]) + 1, -float(final[i]), symbol, int(i)))
+        events.sort()
+
+        ledger = _Ledger()
+        governor = RiskGovernor(self.policy, ledger)
+        equity = cfg.initial_equity
+        margin = 0.0
+        exits: list = []  # heap of (exit bar close_time + 1, seq, trade)
+        trades, times, curve = [], [], [equity]
+        attribution: Dict[str, Dict[str, float]] = {}
+        rejections: Dict[str, int] = {}
+        starts = [int(s.open_time[0]) for s in data.values() if len(s)]
+        times.append(min(starts) if starts else 0)
+
+        def settle(until_ms: int):
+            nonlocal equity, margin
+            while exits and exits[0][0] <= until_ms:
+                exit_ms, _, trade = heapq.heappop(exits)
+                ledger.roll_day(exit_ms)
+                equity += trade["pnl"]
+                margin -= trade["margin"]
+                ledger.state["daily_pnl"] += trade["pnl"]
+                ledger.state["open_positions"].pop(trade["symbol"], None)
+                trades.append(trade)
+                times.append(exit_ms)
+                curve.append(equity)
+                self._attribute(attribution, trade)
+
+        for seq, (ts, _, symbol, i) in enumerate(events):
+            settle(ts)
+            ledger.roll_day(ts)
+            series = data[symbol]
+            scores = self._scores(signals[symbol], i)
+            brain_dump = self.brain.evaluate(scores)
+            candidate = {"symbol": symbol, "candles": series[i - cfg.lookback + 1:i + 1]}
+            signal = governor.validate_trade(symbol, brain_dump, candidate)
+            if not signal.approved:
+                rejections[signal.reason] = rejections.get(signal.reason, 0) + 1
+                continue
+            avail = equity - margin
+            if avail < MIN_AVAILABLE_BALANCE:
+                rejections["INSUFFICIENT_BALANCE"] = rejections.get("INSUFFICIENT_BALANCE", 0) + 1
+                continue
+            long = signal.direction == "LONG"
+            side = 1.0 if long else -1.0
+            entry = signal.entry_price * (1 + side * cfg.slippage)
+            sl_pct = abs(entry - signal.sl_price) / entry
+            notional = risk_notional(avail, self.policy.get('risk_per_trade', 0.02), sl_pct, signal.leverage)
+            quantity = notional / entry
+            j, exit_price, reason = self._first_exit(series, i, long, signal.sl_price, signal.tp_price)
+            exit_price *= 1 - side * cfg.slippage
+            # the fill lands somewhere inside bar j: the trade is only settled once that bar has
+            # closed, so decisions at or before bar j's open still see its margin and slot
+            exit_ms = int(series.close_time[j]) + 1
+            fees = (entry + exit_price) * quantity * cfg.fee_rate
+            funding_paid = self._funding_cost(series, funding.get(symbol), ts, exit_ms - 1, side * quantity)
+            trade = {
+                "symbol": symbol, "side": "BUY" if long else "SELL", "direction": signal.direction,
+                "entry_time": ts, "exit_time": exit_ms, "bars_held": j - i,
+                "entry_price": entry, "exit_price": exit_price, "quantity": quantity,
+                "leverage": signal.leverage, "margin": notional / signal.leverage,
+                "fees": fees, "funding": funding_paid,
+                "pnl": side * (exit_price - entry) * quantity - fees - funding_paid,
+                "reason": reason, "strength": signal.strength, "details": brain_dump["details"],
+            }
+            margin += trade["margin"]
+            ledger.state["open_positions"][symbol] = {
+                "side": trade["side"], "entry_price": entry, "quantity": quantity,
+                "sl_price": signal.sl_price, "tp_price": signal.tp_price, "leverage": signal.leverage,
+            }
+            heapq.heappush(exits, (exit_ms, seq, trade))
+        settle(np.iinfo(np.int64).max)
+
+        return BacktestResult(trades=trades, equity_times=np.asarray(times, dtype=np.int64),
+                              equity=np.asarray(curve), attribution=attribution,
+                              initial_equity=cfg.initial_equity, rejections=rejections)
+
+    @staticmethod
+    def _attribute(attribution: Dict[str, Dict[str, float]], trade: Dict):
+        """Split a trade's PnL across the strategies that voted for its direction, by weighted score."""
+        voters = [d for d in trade["details"] if d["direction"] == trade["direction"] and d["weighted_score"] > 0]
+        total = sum(d["weighted_score"] for d in voters)
+        for d in voters:
+            stats = attribution.setdefault(d["strategy"], {"trades": 0, "wins": 0, "pnl": 0.0})
+            stats["trades"] += 1
+            stats["wins"] += int(trade["pnl"] > 0)
+            stats["pnl"] += float(trade["pnl"] * d["weighted_score"] / total)
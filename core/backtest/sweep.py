@@ -0,0 +1,218 @@
+"""
+Sweep — مسح متوازي لأوزان الدماغ وحدود المخاطر عبر الاختبار الرجعي.
+Trials override policy keys by dotted path ("strategy_weights.momentum",
+"scanner.entry_threshold", "default_sl", "leverage", ...) and run as Backtester replays on a
+process pool. Candles and every strategy's per-bar signals are written once as .npy files that
+workers memory-map, so all processes share one page-cached copy. Finished trials are appended
+to a JSONL file keyed by a hash of their parameters; a rerun skips them.
+"""
+import copy
+import hashlib
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from core.tools.candle_series import CandleSeries, FIELDS
+from core.backtest.engine import SIGNAL_BUILDERS, Backtester, BacktestConfig, FundingHistory, Signals
+
+RANK_KEYS = ("trades", "return_pct", "max_drawdown", "win_rate", "profit_factor")
+
+
+# ---------- trials ----------
+def trial_id(params: Dict) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def apply_params(policy: dict, params: Dict) -> dict:
+    """Copy of `policy` with each dotted key in `params` set."""
+    policy = copy.deepcopy(policy)
+    for path, value in params.items():
+        node = policy
+        *parents, leaf = path.split(".")
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return policy
+
+
+def grid(space: Dict[str, Sequence]) -> List[Dict]:
+    """Every combination of the listed values."""
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_samples(space: Dict[str, Sequence], n: int, seed: int = 0) -> List[Dict]:
+    """`n` draws: a (low, high) tuple samples uniformly, a list picks one of its values."""
+    rng = random.Random(seed)
+    trials = []
+    for _ in range(n):
+        trials.append({key: round(rng.uniform(*values), 6) if isinstance(values, tuple) else rng.choice(values)
+                       for key, values in space.items()})
+    return trials
+
+
+# ---------- shared arrays ----------
+def _digest(columns: Iterable[np.ndarray]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for values in columns:
+        h.update(np.ascontiguousarray(values).data)
+    return h.hexdigest()
+
+
+def _symbol_meta(series: CandleSeries, funding: Optional[FundingHistory], config: BacktestConfig) -> Dict:
+    """What the cached copy was built from; a content hash catches corrected candles of the same span."""
+    return {"len": len(series), "last_open_time": int(series.open_time[-1]) if len(series) else 0,
+            "digest": _digest(getattr(series, name) for name in FIELDS),
+            "funding": None if funding is None else {
+                "len": len(funding[0]), "last_time": int(funding[0][-1]) if len(funding[0]) else 0,
+                "digest": _digest(funding)},
+            "lookback": config.lookback, "interval": series.interval, "strategies": sorted(SIGNAL_BUILDERS)}
+
+
+def _prepare_symbol(directory: Path, series: CandleSeries, funding: Optional[FundingHistory],
+                    config: BacktestConfig) -> bool:
+    """Write one symbol's columns, funding and signals; False when the cached copy is current."""
+    meta = _symbol_meta(series, funding, config)
+    meta_path = directory / "meta.json"
+    if meta_path.exists() and json.loads(meta_path.read_text()) == meta:
+        return False
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in FIELDS:
+        np.save(directory / f"{name}.npy", getattr(series, name))
+    for name, builder in SIGNAL_BUILDERS.items():
+        score, direction = builder(series, config.lookback, config.block)
+        np.save(directory / f"{name}.score.npy", score)
+        np.save(directory / f"{name}.direction.npy", direction)
+    if funding is not None:
+        np.save(directory / "funding.time.npy", funding[0])
+        np.save(directory / "funding.rate.npy", funding[1])
+    else:
+        for name in ("funding.time", "funding.rate"):
+            (directory / f"{name}.npy").unlink(missing_ok=True)
+    meta_path.write_text(json.dumps(meta))  # written last: marks the directory complete
+    return True
+
+
+def load_arrays(cache_dir: Path) -> Tuple[Dict[str, CandleSeries], Dict[str, FundingHistory],
+                                          Dict[str, Dict[str, Signals]]]:
+    """Memory-mapped (data, funding, signals) from a prepared cache directory."""
+    data, funding, signals = {}, {}, {}
+    for directory in sorted(Path(cache_dir).iterdir()):
+        meta_path = directory / "meta.json"
+        if not meta_path.exists():
+            continue
+        meta = json.loads(meta_path.read_text())
+        load = lambda name: np.load(directory / f"{name}.npy", mmap_mode="r")
+        symbol = directory.name
+        data[symbol] = CandleSeries(*(load(name) for name in FIELDS), symbol=symbol, interval=meta["interval"])
+        signals[symbol] = {name: (load(f"{name}.score"), load(f"{name}.direction")) for name in meta["strategies"]}
+        if (directory / "funding.time.npy").exists():
+            funding[symbol] = (load("funding.time"), load("funding.rate"))
+    return data, funding, signals
+
+
+# ---------- worker side ----------
+_worker = {}
+
+
+def _init_worker(cache_dir: str, policy: dict, config: BacktestConfig):
+    _worker["arrays"] = load_arrays(Path(cache_dir))
+    _worker["policy"] = policy
+    _worker["config"] = config
+
+
+def _run_trial(params: Dict) -> Dict:
+    data, funding, signals = _worker["arrays"]
+    result = Backtester(apply_params(_worker["policy"], params), _worker["config"]).run(data, funding, signals)
+    return {"trial": trial_id(params), "params": params, "summary": result.summary(),
+            "attribution": result.attribution, "rejections": result.rejections}
+
+
+# ---------- driver ----------
+class SweepRunner:
+    def __init__(self, policy: dict, cache_dir: Path, results_path: Path,
+                 config: BacktestConfig = None, max_workers: int = None):
+        self.policy = policy
+        self.cache_dir = Path(cache_dir)
+        self.results_path = Path(results_path)
+        self.config = config or BacktestConfig()
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def prepare(self, data: Dict[str, CandleSeries], funding: Dict[str, FundingHistory] = None) -> int:
+        """Precompute every symbol's signals into the cache (in parallel). Returns symbols written."""
+        funding = funding or {}
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            jobs = [pool.submit(_prepare_symbol, self.cache_dir / symbol, series, funding.get(symbol), self.config)
+                    for symbol, series in data.items()]
+            written = sum(job.result() for job in jobs)
+        print(f"[Sweep] Prepared {written}/{len(data)} symbols in {self.cache_dir}", flush=True)
+        return written
+
+    def completed(self) -> Dict[str, Dict]:
+        """Trials already stored, by id (a torn last line from an interrupted run is ignored)."""
+        done = {}
+        if self.results_path.exists():
+            with open(self.results_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    done[row["trial"]] = row
+        return done
+
+    def _torn_tail(self) -> bool:
+        if not self.results_path.exists() or not self.results_path.stat().st_size:
+            return False
+        with open(self.results_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def run(self, trials: Iterable[Dict]) -> List[Dict]:
+        """Run the trials not stored yet; returns the results of every requested trial."""
+        trials = list(trials)
+        done = self.completed()
+        pending = list({trial_id(p): p for p in trials if trial_id(p) not in done}.values())
+        print(f"[Sweep] {len(trials)} trials: {len(trials) - len(pending)} stored, {len(pending)} to run "
+              f"on {self.max_workers} workers", flush=True)
+        if pending:
+            self.results_path.parent.mkdir(parents=True, exist_ok=True)
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                     initargs=(str(self.cache_dir), self.policy, self.config)) as pool, \
+                    open(self.results_path, "a", encoding="utf-8") as out:
+                if self._torn_tail():
+                    out.write("\n")  # keep new rows off the interrupted line
+                jobs = {pool.submit(_run_trial, params): params for params in pending}
+                for n, job in enumerate(as_completed(jobs), 1):
+                    try:
+                        row = job.result()
+                    except Exception as e:
+                        print(f"[Sweep] Trial {jobs[job]} failed: {type(e).__name__}: {e}", flush=True)
+                        continue
+                    out.write(json.dumps(row) + "\n")
+                    out.flush()
+                    done[row["trial"]] = row
+                    if n % 50 == 0 or n == len(pending):
+                        print(f"[Sweep] {n}/{len(pending)} trials done", flush=True)
+        return [done[trial_id(p)] for p in trials if trial_id(p) in done]
+
+
+def rank(results: List[Dict], key: str = "return_pct", min_trades: int = 1,
+         top: int = None, descending: bool = True) -> List[Dict]:
+    """Results with at least `min_trades` trades, best `key` first."""
+    eligible = [r for r in results if r["summary"]["trades"] >= min_trades]
+    ranked = sorted(eligible, key=lambda r: r["summary"][key], reverse=descending)
+    return ranked[:top] if top else ranked
+
+
+def format_ranking(ranked: List[Dict], keys: Sequence[str] = RANK_KEYS) -> str:
+    """Plain-text table: rank, trial id, summary columns, then the parameters."""
+    lines = ["#    trial         " + " ".join(f"{k:>13}" for k in keys) + "  params"]
+    for n, row in enumerate(ranked, 1):
+        values = " ".join(f"{row['summary'][k]:>13.4f}" for k in keys)
+        lines.append(f"{n:<4} {row['trial']:<13} {values}  {json.dumps(row['params'], sort_keys=True)}")
+    return "\n".join(lines)
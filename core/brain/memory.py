@@ -1,5 +1,15 @@
+"""
+Memory — حالة البوت المحفوظة (سجل عمليات إلحاقي + لقطات ذرية).
+`state.json` is a snapshot; every save after it appends one line of operations to
+`state.json.journal`, so write I/O follows the size of the change, not of the state. Loading
+replays the journal over the snapshot; a torn last line is dropped. The journal is folded into
+a new snapshot (temp file + fsync + rename) every `snapshot_every` lines. Saves inside
+`batch()` coalesce into one journal line.
+"""
 import json
 import copy
+import os
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, timezone
 DEFAULT_STATE = {
@@ -13,24 +23,171 @@ DEFAULT_STATE = {
     "win_streak": 0,
     "risk_boost_until": 0
 }
+# Changed through Memory methods only, which journal them as operations; every other key is
+# compared with its last persisted value on save (callers may mutate those in place)
+JOURNALED_KEYS = ("open_positions", "trade_history", "last_user_messages")
+FSYNC_POLICIES = ("always", "snapshot", "never")  # always: every journal line; snapshot: snapshots only
+SEQ_KEY = "_journal_seq"
+MAX_USER_MESSAGES = 30
+def apply_op(state: dict, op: list):
+    """Replay one journal operation: ["set", path, value], ["del", path], ["append", path, value, cap]."""
+    kind, path = op[0], op[1]
+    node = state
+    for key in path[:-1]:
+        node = node.setdefault(key, {})
+    leaf = path[-1]
+    if kind == "set":
+        node[leaf] = op[2]
+    elif kind == "del":
+        node.pop(leaf, None)
+    elif kind == "append":
+        items = node.setdefault(leaf, [])
+        items.append(op[2])
+        if op[3]:
+            del items[:-op[3]]
+def read_journal(journal_path: Path, after_seq: int = 0):
+    """(entries newer than `after_seq`, byte length of the intact prefix); reads only."""
+    entries, good = [], 0
+    if not journal_path.exists():
+        return entries, good
+    with open(journal_path, "rb") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                break
+            if not line.endswith(b"\n"):
+                break
+            good += len(line)
+            if entry["seq"] > after_seq:  # older ones are already in the snapshot
+                entries.append(entry)
+    return entries, good
+def read_state(data_path: Path) -> dict:
+    """A saved state (snapshot + journal) without Memory's side effects: nothing is written."""
+    data_path = Path(data_path)
+    try:
+        with open(data_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return copy.deepcopy(DEFAULT_STATE)
+    entries, _ = read_journal(data_path.with_name(data_path.name + ".journal"), state.pop(SEQ_KEY, 0))
+    for entry in entries:
+        for op in entry["ops"]:
+            apply_op(state, op)
+    return state
 class Memory:
-    def __init__(self, data_path: Path):
-        self.data_path = data_path
+    def __init__(self, data_path: Path, fsync: str = "always", snapshot_every: int = 500):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.data_path = Path(data_path)
+        self.journal_path = self.data_path.with_name(self.data_path.name + ".journal")
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+        self._seq = 0             # sequence number of the last persisted write
+        self._journal_lines = 0
+        self._ops = []            # operations not written yet
+        self._depth = 0           # nesting of batch()
         self.state = self._load_state()
+        self._persisted = self._encode_keys()
         self._check_new_day()
     def _load_state(self):
-        if self.data_path.exists():
-            with open(self.data_path, "r", encoding="utf-8") as f:
-                try:
-                    return json.load(f)
-                except json.JSONDecodeError:
-                    return DEFAULT_STATE.copy()
-        else:
+        if not self.data_path.exists():
+            self._truncate_journal()  # a journal without its snapshot belongs to an older state
             return copy.deepcopy(DEFAULT_STATE)
+        with open(self.data_path, "r", encoding="utf-8") as f:
+            try:
+                state = json.load(f)
+            except json.JSONDecodeError:
+                self._truncate_journal()
+                return copy.deepcopy(DEFAULT_STATE)
+        self._seq = state.pop(SEQ_KEY, 0)
+        self._replay(state)
+        return state
+    def _replay(self, state: dict):
+        entries, good = read_journal(self.journal_path, self._seq)
+        for entry in entries:
+            for op in entry["ops"]:
+                apply_op(state, op)
+            self._seq = entry["seq"]
+            self._journal_lines += 1
+        if self.journal_path.exists() and good < self.journal_path.stat().st_size:
+            print(f"[Memory] Dropping a torn journal tail in {self.journal_path}", flush=True)
+            os.truncate(self.journal_path, good)
+    def _truncate_journal(self):
+        if self.journal_path.exists():
+            open(self.journal_path, "w").close()
+        self._journal_lines = 0
+    def _encode_keys(self) -> dict:
+        return {key: json.dumps(value, sort_keys=True, ensure_ascii=False)
+                for key, value in self.state.items() if key not in JOURNALED_KEYS}
+    def _diff_keys(self) -> list:
+        """`set`/`del` operations for the non-journaled keys changed since the last write."""
+        ops = []
+        current = self._encode_keys()
+        for key, encoded in current.items():
+            if self._persisted.get(key) != encoded:
+                ops.append(["set", [key], self.state[key]])
+        ops.extend(["del", [key]] for key in self._persisted if key not in current)
+        self._persisted = current
+        return ops
+    def _record(self, *op):
+        self._ops.append(list(op))
+        self.save()
     def save(self):
+        """Persist pending changes; inside batch() the write waits for the outermost block."""
+        if not self._depth:
+            self.flush()
+    @contextmanager
+    def batch(self):
+        """
+        Coalesce the saves in the block (e.g. one monitor pass) into one write at exit.
+        add_open_position still writes at once: a live position must never be deferred.
+        """
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if not self._depth:
+                self.flush()
+    def flush(self):
+        ops = self._ops + self._diff_keys()
+        self._ops = []
+        if ops:
+            self._write(ops)
+    def _write(self, ops: list):
+        """Persist one batch of operations (the storage backend's hook)."""
+        if not self.data_path.exists() or self._journal_lines >= self.snapshot_every:
+            self.snapshot()
+            return
+        self._seq += 1
+        line = json.dumps({"seq": self._seq, "ops": ops}, ensure_ascii=False) + "\n"
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            if self.fsync == "always":
+                os.fsync(f.fileno())
+        self._journal_lines += 1
+    def snapshot(self):
+        """Write the whole state atomically and empty the journal."""
+        self._ops = []
+        self._seq += 1
         self.data_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.data_path, "w", encoding="utf-8") as f:
-            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        tmp = self.data_path.with_name(self.data_path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(dict(self.state, **{SEQ_KEY: self._seq}), f, indent=2, ensure_ascii=False)
+            f.flush()
+            if self.fsync != "never":
+                os.fsync(f.fileno())
+        os.replace(tmp, self.data_path)
+        if self.fsync != "never":
+            fd = os.open(self.data_path.parent, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self._truncate_journal()
+        self._persisted = self._encode_keys()
     def _check_new_day(self):
         today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
         if self.state.get("date") != today:
@@ -39,23 +196,26 @@ class Memory:
             self.state["trades_today"] = 0
             self.state["trade_history"] = []
             # Do NOT reset open_positions on new day - they may still be open
-            self.save()
+            self._record("set", ["trade_history"], [])
     def record_trade(self, trade_data: dict):
         self.state["trade_history"].append(trade_data)
         self.state["trades_today"] += 1
-        self.save()
+        self._record("append", ["trade_history"], trade_data, None)
     def update_pnl(self, pnl: float):
         self.state["daily_pnl"] += pnl
         self.save()
     def add_open_position(self, symbol: str, position_data: dict):
         self.state["open_positions"][symbol] = position_data
-        self.save()
+        # written even inside batch(): a live position the restarted worker does not know would
+        # never get its SL/TP managed
+        self._ops.append(["set", ["open_positions", symbol], position_data])
+        self.flush()
     def remove_open_position(self, symbol: str):
         if symbol in self.state["open_positions"]:
             del self.state["open_positions"][symbol]
-            self.save()
+            self._record("del", ["open_positions", symbol])
     def add_user_message(self, text: str):
         msgs = self.state.get("last_user_messages", [])
         msgs.append(text)
-        self.state["last_user_messages"] = msgs[-30:]
-        self.save()
+        self.state["last_user_messages"] = msgs[-MAX_USER_MESSAGES:]
+        self._record("append", ["last_user_messages"], text, MAX_USER_MESSAGES)
@@ -0,0 +1,173 @@
+"""
+SQLiteMemory — حالة البوت وسجل الصفقات في SQLite (وضع WAL) مع استعلامات مفهرسة.
+Same interface as Memory: `state` is still the in-process dict, and the operations Memory
+journals are applied as SQL, one transaction per flush (so `batch()` is one commit). Positions,
+trades, strategy stats and daily PnL live in their own tables; trades are never wiped, and
+`state['trade_history']` only holds today's rows. Startup reads today's slice through indexes
+instead of parsing the whole history.
+"""
+import copy
+import json
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+from core.brain.memory import DEFAULT_STATE, Memory, read_state
+
+DAY_MS = 86_400_000
+DAILY_KEYS = ("date", "daily_pnl", "trades_today")
+# fsync policy → PRAGMA synchronous (in WAL mode NORMAL syncs at checkpoints only)
+SYNCHRONOUS = {"always": "FULL", "snapshot": "NORMAL", "never": "OFF"}
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (symbol TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY, ts INTEGER NOT NULL, symbol TEXT, strategy TEXT, side TEXT,
+    pnl REAL, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS trades_ts ON trades (ts);
+CREATE INDEX IF NOT EXISTS trades_symbol_ts ON trades (symbol, ts);
+CREATE INDEX IF NOT EXISTS trades_strategy_ts ON trades (strategy, ts);
+CREATE TABLE IF NOT EXISTS strategy_stats (
+    strategy TEXT PRIMARY KEY, wins INTEGER NOT NULL, losses INTEGER NOT NULL, total INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS daily_pnl (day TEXT PRIMARY KEY, pnl REAL NOT NULL, trades INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def _day_start_ms(day: str) -> int:
+    return int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+class SQLiteMemory(Memory):
+    def __init__(self, data_path: Path, fsync: str = "always", snapshot_every: int = 500,
+                 migrate_from: Path = None):
+        """migrate_from: a JSON Memory state imported when the database is new."""
+        self.migrate_from = Path(migrate_from) if migrate_from else None
+        self.conn = None
+        super().__init__(data_path, fsync, snapshot_every)
+
+    # ---------- loading ----------
+    def _load_state(self):
+        self.data_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.data_path, isolation_level=None)  # transactions are explicit
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={SYNCHRONOUS[self.fsync]}")
+        self.conn.executescript(SCHEMA)
+        fresh = self.conn.execute("SELECT COUNT(*) FROM kv").fetchone()[0] == 0
+        if fresh and self.migrate_from and self.migrate_from.exists():
+            return self._migrate()
+        state = copy.deepcopy(DEFAULT_STATE)
+        for key, value in self.conn.execute("SELECT key, value FROM kv"):
+            state[key] = json.loads(value)
+        state["open_positions"] = {symbol: json.loads(data)
+                                   for symbol, data in self.conn.execute("SELECT symbol, data FROM positions")}
+        state["strategy_stats"] = {name: {"wins": w, "losses": l, "total": t} for name, w, l, t in
+                                   self.conn.execute("SELECT strategy, wins, losses, total FROM strategy_stats")}
+        if state["date"]:
+            row = self.conn.execute("SELECT pnl, trades FROM daily_pnl WHERE day = ?", (state["date"],)).fetchone()
+            state["daily_pnl"], state["trades_today"] = row or (0.0, 0)
+            start = _day_start_ms(state["date"])
+            state["trade_history"] = [json.loads(data) for (data,) in self.conn.execute(
+                "SELECT data FROM trades WHERE ts >= ? AND ts < ? ORDER BY id", (start, start + DAY_MS))]
+        return state
+
+    def _migrate(self) -> dict:
+        """Import a JSON Memory (snapshot + journal) in one transaction; the legacy files are only read."""
+        state = read_state(self.migrate_from)
+        ops = [["set", ["open_positions", s], p] for s, p in state.get("open_positions", {}).items()]
+        ops += [["append", ["trade_history"], t, None] for t in state.get("trade_history", [])]
+        ops += [["set", [key], value] for key, value in state.items()
+                if key not in ("open_positions", "trade_history")]
+        self.state = state
+        self._write(ops)
+        print(f"[SQLiteMemory] Imported {self.migrate_from} into {self.data_path}", flush=True)
+        return state
+
+    # ---------- writing ----------
+    def _write(self, ops: list):
+        cur = self.conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            daily = False
+            for op in ops:
+                daily |= self._apply_sql(cur, op)
+            if daily:
+                cur.execute("INSERT OR REPLACE INTO daily_pnl (day, pnl, trades) VALUES (?, ?, ?)",
+                            (self.state["date"], self.state["daily_pnl"], self.state["trades_today"]))
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+    def _apply_sql(self, cur, op: list) -> bool:
+        """Run one Memory operation; True when the daily_pnl row must be rewritten."""
+        kind, path = op[0], op[1]
+        key = path[0]
+        if key == "open_positions":
+            if len(path) == 1:
+                cur.execute("DELETE FROM positions")
+                items = op[2].items() if kind == "set" else ()
+            else:
+                cur.execute("DELETE FROM positions WHERE symbol = ?", (path[1],))
+                items = [(path[1], op[2])] if kind == "set" else ()
+            cur.executemany("INSERT INTO positions (symbol, data) VALUES (?, ?)",
+                            [(symbol, json.dumps(data, ensure_ascii=False)) for symbol, data in items])
+        elif key == "trade_history":
+            # the daily reset ("set" []) only empties today's view; stored trades are kept
+            if kind == "append":
+                trade = op[2]
+                cur.execute("INSERT INTO trades (ts, symbol, strategy, side, pnl, data) VALUES (?, ?, ?, ?, ?, ?)",
+                            (int(trade.get("ts") or time.time() * 1000), trade.get("symbol"), trade.get("strategy"),
+                             trade.get("side"), trade.get("pnl"), json.dumps(trade, ensure_ascii=False)))
+            return True
+        elif key == "strategy_stats":
+            cur.execute("DELETE FROM strategy_stats")
+            cur.executemany("INSERT INTO strategy_stats (strategy, wins, losses, total) VALUES (?, ?, ?, ?)",
+                            [(name, s.get("wins", 0), s.get("losses", 0), s.get("total", 0))
+                             for name, s in (op[2] if kind == "set" else {}).items()])
+        elif key in DAILY_KEYS[1:]:
+            return True
+        else:
+            if kind == "del":
+                cur.execute("DELETE FROM kv WHERE key = ?", (key,))
+            else:
+                cur.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+                            (key, json.dumps(self.state.get(key), ensure_ascii=False)))
+            return key == "date"
+        return False
+
+    def snapshot(self):
+        """Flush pending changes and fold the WAL back into the database file."""
+        self.flush()
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    # ---------- queries ----------
+    def strategy_pnl(self, days: int = 30, now_ms: int = None) -> Dict[str, Dict]:
+        """{strategy: {trades, pnl, wins}} over the last `days` (a range scan on the ts index)."""
+        since = (now_ms or int(time.time() * 1000)) - days * DAY_MS
+        rows = self.conn.execute("SELECT strategy, COUNT(*), SUM(pnl), SUM(pnl > 0) FROM trades "
+                                 "WHERE ts >= ? GROUP BY strategy", (since,))
+        return {name: {"trades": n, "pnl": pnl or 0.0, "wins": wins or 0} for name, n, pnl, wins in rows}
+
+    def trades(self, symbol: str = None, strategy: str = None, since_ms: int = None,
+               until_ms: int = None, limit: int = None) -> List[Dict]:
+        """Stored trades, oldest first, filtered on indexed columns; `limit` keeps the newest."""
+        where, args = [], []
+        for clause, value in (("symbol = ?", symbol), ("strategy = ?", strategy),
+                              ("ts >= ?", since_ms), ("ts < ?", until_ms)):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        sql = "SELECT data FROM trades" + (" WHERE " + " AND ".join(where) if where else "")
+        sql += " ORDER BY ts DESC, id DESC" + (" LIMIT ?" if limit else "")
+        rows = self.conn.execute(sql, args + ([limit] if limit else []))
+        return [json.loads(data) for (data,) in rows][::-1]
+
+    def daily_pnl_history(self, days: int = 30) -> List[Dict]:
+        """The last `days` daily rows, oldest first."""
+        rows = self.conn.execute("SELECT day, pnl, trades FROM daily_pnl ORDER BY day DESC LIMIT ?", (days,))
+        return [{"day": day, "pnl": pnl, "trades": trades} for day, pnl, trades in rows][::-1]
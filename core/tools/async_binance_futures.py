@@ -0,0 +1,129 @@
+"""
+AsyncBinanceFutures — asyncio counterpart of BinanceFutures for concurrent market-data fan-out.
+Same method surface (_get/_post, signed requests, get_candles, get_all_tickers ...), every
+request bounded by one semaphore so hundreds of klines can be in flight without flooding the pool.
+"""
+import asyncio
+import time
+import aiohttp
+from core.tools.binance_futures import BinanceClientBase, DEFAULT_TIMEOUT
+from core.tools.rate_limiter import RateLimiter
+from core.tools.candle_series import CandleSeries
+from core.tools.fast_decode import decode_klines, decoder_for
+
+DEFAULT_MAX_CONCURRENCY = 50
+
+
+class AsyncBinanceFutures(BinanceClientBase):
+    def __init__(self, api_key: str = "", secret_key: str = "",
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT, max_retries: int = 3,
+                 backoff_factor: float = 0.3, session: aiohttp.ClientSession = None,
+                 limiter: RateLimiter = None):
+        super().__init__(api_key, secret_key, limiter)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.session = session
+        self._owns_session = session is None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        self._ensure_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _ensure_session(self):
+        # Session and semaphore must be created inside the running loop
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self.session is not None and self._owns_session:
+            await self.session.close()
+        self.session = None
+        self._semaphore = None  # bound to this event loop; a reuse under a new loop makes its own
+
+    async def _request(self, method, endpoint, params=None, signed=False, decoder=None):
+        self._ensure_session()
+        headers = {"X-MBX-APIKEY": self.api_key}
+        # Only idempotent GETs are retried — orders are never replayed
+        attempts = self.max_retries + 1 if method == "GET" else 1
+        async with self._semaphore:
+            for attempt in range(attempts):
+                await self.limiter.acquire_async(method, endpoint, params)
+                # signed after the limiter wait, per attempt: a stale timestamp fails recvWindow (-1021)
+                query = {k: str(v) for k, v in self._prepare_params(dict(params or {}), signed).items()}
+                started = time.perf_counter()
+                try:
+                    async with self.session.request(method, self.base_url + endpoint,
+                                                    params=query, headers=headers) as res:
+                        body = await res.read()
+                        self._record_timing(method, endpoint, res.status, (time.perf_counter() - started) * 1000)
+                        self.limiter.update_from_response(res.status, res.headers)
+                        if res.status >= 500 and attempt < attempts - 1:
+                            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+                            continue
+                        if res.status >= 400:
+                            print(f"[Binance API Error] {res.status}: {body[:200].decode('utf-8', 'replace')}", flush=True)
+                            return None
+                        return (decoder or decoder_for(endpoint))(body)
+                except ValueError as e:
+                    print(f"[Binance API Error] Bad payload from {endpoint}: {e}", flush=True)
+                    return None
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    self._record_timing(method, endpoint, None, (time.perf_counter() - started) * 1000)
+                    if attempt < attempts - 1:
+                        await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+                        continue
+                    print(f"[Binance API Error] {type(e).__name__}: {e}", flush=True)
+                    return None
+        return None
+
+    async def _get(self, endpoint, params=None, signed=False):
+        return await self._request("GET", endpoint, params, signed)
+
+    async def _post(self, endpoint, params=None, signed=False):
+        return await self._request("POST", endpoint, params, signed)
+
+    async def get_all_tickers(self):
+        return await self._get('/fapi/v1/ticker/price')
+
+    async def get_candles(self, symbol: str, interval: str = '15m', limit: int = 100,
+                          start_time: int = None, end_time: int = None):
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start_time is not None:
+            params['startTime'] = start_time
+        if end_time is not None:
+            params['endTime'] = end_time
+        candles = await self._request("GET", '/fapi/v1/klines', params,
+                                      decoder=lambda payload: decode_klines(payload, symbol, interval))
+        return candles if candles is not None else CandleSeries.empty(symbol, interval)
+
+    async def get_candles_many(self, symbols, interval: str = '15m', limit: int = 100) -> dict:
+        """Fetch klines for every symbol concurrently; returns {symbol: candles}."""
+        symbols = list(symbols)
+        results = await asyncio.gather(
+            *(self.get_candles(s, interval, limit) for s in symbols)
+        )
+        return dict(zip(symbols, results))
+
+    async def get_ticker(self, symbol: str):
+        return await self._get('/fapi/v1/ticker/price', {'symbol': symbol})
+
+    async def place_market_order(self, symbol: str, side: str, quantity: float):
+        params = {'symbol': symbol, 'side': side, 'type': 'MARKET', 'quantity': quantity}
+        return await self._post('/fapi/v1/order', params, signed=True)
+
+    async def get_avg_price(self, symbol: str):
+        data = await self._get('/fapi/v1/avgPrice', {'symbol': symbol})
+        return float(data['price']) if data else None
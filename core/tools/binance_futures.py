@@ -1,14 +1,70 @@
+import asyncio
 import hmac
 import hashlib
+import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from core.tools.rate_limiter import RateLimiter, get_shared_limiter
+from core.tools.candle_series import CandleSeries
+from core.tools.fast_decode import decode_klines, decoder_for
 
+# Connection pool shared by every client that doesn't bring its own session
+DEFAULT_POOL_SIZE = 32
+DEFAULT_TIMEOUT = 10
 
-class BinanceFutures:
-    def __init__(self, api_key: str, secret_key: str):
-        self.base_url = "https://fapi.binance.com"
-        self.api_key = api_key
-        self.secret_key = secret_key
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def make_session(pool_size: int = DEFAULT_POOL_SIZE, max_retries: int = 3,
+                 backoff_factor: float = 0.3) -> requests.Session:
+    """
+    Build a keep-alive session with a bounded connection pool.
+    The adapter only retries failed connects (nothing reached the server, so no weight was
+    spent); 5xx and read failures are retried by the client, through the rate limiter.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        status=0,
+        backoff_factor=backoff_factor,
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retry, pool_block=True)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def get_shared_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """Process-wide session, created on first use."""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = make_session(pool_size)
+        return _shared_session
+
+
+class BinanceClientBase:
+    """Signing and timing shared by the sync and asyncio clients."""
+    base_url = "https://fapi.binance.com"
+
+    def __init__(self, api_key: str = "", secret_key: str = "", limiter: RateLimiter = None):
+        self.api_key = api_key or ""
+        self.secret_key = secret_key or ""
+        # Request weight is an IP-wide budget, so every client shares one limiter by default
+        self.limiter = limiter or get_shared_limiter()
+        # Per-request timing: last call + running totals per endpoint
+        self.last_request = None
+        self.request_stats = {}
+        self._stats_lock = threading.Lock()
 
     def _get_timestamp(self):
         return int(time.time() * 1000)
@@ -20,29 +76,104 @@ class BinanceFutures:
             hashlib.sha256
         ).hexdigest()
 
-    def _request(self, method, endpoint, params=None, signed=False):
+    def _prepare_params(self, params, signed):
         if params is None:
             params = {}
         if signed:
             params["timestamp"] = self._get_timestamp()
             query_string = "&".join([f"{k}={v}" for k, v in params.items()])
             params["signature"] = self._sign(query_string)
+        return params
+
+    def _record_timing(self, method, endpoint, status, elapsed_ms):
+        timing = {
+            "method": method,
+            "endpoint": endpoint,
+            "status": status,
+            "elapsed_ms": round(elapsed_ms, 2),
+        }
+        with self._stats_lock:
+            self.last_request = timing
+            stats = self.request_stats.setdefault(endpoint, {
+                "count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0
+            })
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            if status is None or status >= 400:
+                stats["errors"] += 1
+
+    def timing_summary(self) -> dict:
+        """Average / max latency per endpoint since the client was created."""
+        with self._stats_lock:
+            return {
+                endpoint: {
+                    "count": s["count"],
+                    "errors": s["errors"],
+                    "avg_ms": round(s["total_ms"] / s["count"], 2) if s["count"] else 0.0,
+                    "max_ms": round(s["max_ms"], 2),
+                }
+                for endpoint, s in self.request_stats.items()
+            }
+
+
+class BinanceFutures(BinanceClientBase):
+    def __init__(self, api_key: str = "", secret_key: str = "",
+                 session: requests.Session = None, pool_size: int = None,
+                 timeout: float = DEFAULT_TIMEOUT, limiter: RateLimiter = None,
+                 max_retries: int = 3, backoff_factor: float = 0.3):
+        super().__init__(api_key, secret_key, limiter)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        # session=None → shared pool; pool_size → a private pool for this client
+        if session is not None:
+            self.session = session
+        elif pool_size:
+            self.session = make_session(pool_size)
+        else:
+            self.session = get_shared_session()
+
+    def _request(self, method, endpoint, params=None, signed=False, decoder=None):
+        """decoder: bytes → result; defaults to the endpoint's fast decoder (orjson when installed)."""
         headers = {"X-MBX-APIKEY": self.api_key}
-        try:
-            res = requests.request(
-                method,
-                self.base_url + endpoint,
-                params=params,
-                headers=headers,
-                timeout=10
-            )
-            if not res.ok:
-                print(f"[Binance API Error] {res.status_code}: {res.text[:200]}", flush=True)
+        # Only idempotent GETs are retried — orders are never replayed. Every attempt goes
+        # through the limiter, since a server that answered 5xx still counted its weight.
+        attempts = self.max_retries + 1 if method == "GET" else 1
+        for attempt in range(attempts):
+            self.limiter.acquire(method, endpoint, params)
+            # signed after the limiter wait, per attempt: a stale timestamp fails recvWindow (-1021)
+            query = self._prepare_params(dict(params or {}), signed)
+            started = time.perf_counter()
+            try:
+                res = self.session.request(
+                    method,
+                    self.base_url + endpoint,
+                    params=query,
+                    headers=headers,
+                    timeout=self.timeout
+                )
+                self._record_timing(method, endpoint, res.status_code, (time.perf_counter() - started) * 1000)
+                self.limiter.update_from_response(res.status_code, res.headers)
+                if res.status_code >= 500 and attempt < attempts - 1:
+                    time.sleep(self.backoff_factor * (2 ** attempt))
+                    continue
+                if not res.ok:
+                    print(f"[Binance API Error] {res.status_code}: {res.text[:200]}", flush=True)
+                    return None
+                return (decoder or decoder_for(endpoint))(res.content)
+            except requests.exceptions.RequestException as e:
+                self._record_timing(method, endpoint, None, (time.perf_counter() - started) * 1000)
+                # failed connects were already retried by the adapter
+                if attempt < attempts - 1 and not isinstance(e, requests.exceptions.ConnectTimeout):
+                    time.sleep(self.backoff_factor * (2 ** attempt))
+                    continue
+                print(f"[Binance API Error] {e}", flush=True)
+                return None
+            except ValueError as e:
+                print(f"[Binance API Error] Bad payload from {endpoint}: {e}", flush=True)
                 return None
-            return res.json()
-        except requests.exceptions.RequestException as e:
-            print(f"[Binance API Error] {e}", flush=True)
-            return None
+        return None
 
     def _get(self, endpoint, params=None, signed=False):
         return self._request("GET", endpoint, params, signed)
@@ -53,23 +184,33 @@ class BinanceFutures:
     def get_all_tickers(self):
         return self._get('/fapi/v1/ticker/price')
 
-    def get_candles(self, symbol: str, interval: str = '15m', limit: int = 100):
+    def get_candles(self, symbol: str, interval: str = '15m', limit: int = 100,
+                    start_time: int = None, end_time: int = None):
         params = {'symbol': symbol, 'interval': interval, 'limit': limit}
-        klines = self._get('/fapi/v1/klines', params)
-        if not klines:
-            return []
-        candles = []
-        for k in klines:
-            candles.append({
-                'open_time': k[0],
-                'open': float(k[1]),
-                'high': float(k[2]),
-                'low': float(k[3]),
-                'close': float(k[4]),
-                'volume': float(k[5]),
-                'close_time': k[6],
-            })
-        return candles
+        if start_time is not None:
+            params['startTime'] = start_time
+        if end_time is not None:
+            params['endTime'] = end_time
+        candles = self._request("GET", '/fapi/v1/klines', params,
+                                decoder=lambda payload: decode_klines(payload, symbol, interval))
+        return candles if candles is not None else CandleSeries.empty(symbol, interval)
+
+    def get_candles_many(self, symbols, interval: str = '15m', limit: int = 100,
+                         max_concurrency: int = None) -> dict:
+        """
+        Sync entry point for a concurrent kline fan-out.
+        Runs AsyncBinanceFutures on a private event loop; returns {symbol: candles}.
+        """
+        from core.tools.async_binance_futures import AsyncBinanceFutures, DEFAULT_MAX_CONCURRENCY
+
+        async def _fetch():
+            async with AsyncBinanceFutures(self.api_key, self.secret_key,
+                                           max_concurrency=max_concurrency or DEFAULT_MAX_CONCURRENCY,
+                                           timeout=self.timeout) as client:
+                client.base_url = self.base_url
+                return await client.get_candles_many(symbols, interval, limit)
+
+        return asyncio.run(_fetch())
 
     def get_ticker(self, symbol: str):
         return self._get('/fapi/v1/ticker/price', {'symbol': symbol})
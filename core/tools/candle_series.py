@@ -0,0 +1,95 @@
+"""
+CandleSeries — شموع بأعمدة متجاورة بدلاً من قائمة قواميس.
+Columnar OHLCV: float64 price/volume columns plus int64 open/close times. Slicing returns
+views (no copy); integer indexing and iteration yield the old candle dicts for code that
+still reads candle["close"].
+"""
+from typing import Dict, Iterator, List, Optional, Union
+import numpy as np
+
+FLOAT_FIELDS = ("open", "high", "low", "close", "volume")
+TIME_FIELDS = ("open_time", "close_time")
+FIELDS = ("open_time",) + FLOAT_FIELDS + ("close_time",)
+
+
+class CandleSeries:
+    __slots__ = FIELDS + ("symbol", "interval")
+
+    def __init__(self, open_time, open, high, low, close, volume, close_time=None,
+                 symbol: Optional[str] = None, interval: Optional[str] = None):
+        self.open_time = np.asarray(open_time, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.float64)
+        self.close_time = (np.asarray(close_time, dtype=np.int64) if close_time is not None
+                           else np.zeros(len(self.close), dtype=np.int64))
+        self.symbol = symbol
+        self.interval = interval
+
+    # ---------- constructors ----------
+    @classmethod
+    def empty(cls, symbol: str = None, interval: str = None) -> "CandleSeries":
+        return cls([], [], [], [], [], [], [], symbol=symbol, interval=interval)
+
+    @classmethod
+    def from_dicts(cls, candles: List[Dict], symbol: str = None, interval: str = None) -> "CandleSeries":
+        columns = {
+            name: [c.get(name, 0) or 0 for c in candles]
+            for name in FIELDS
+        }
+        return cls(**columns, symbol=symbol, interval=interval)
+
+    @classmethod
+    def from_klines(cls, klines: list, symbol: str = None, interval: str = None) -> "CandleSeries":
+        """Raw /fapi/v1/klines rows [open_time, o, h, l, c, v, close_time, ...]."""
+        from core.tools.fast_decode import klines_to_series
+        return klines_to_series(klines, symbol, interval)
+
+    @classmethod
+    def coerce(cls, candles: "Candles") -> "CandleSeries":
+        """Accept either a CandleSeries or the legacy list of candle dicts."""
+        if isinstance(candles, CandleSeries):
+            return candles
+        return cls.from_dicts(list(candles or []))
+
+    # ---------- sequence protocol ----------
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def __bool__(self) -> bool:
+        return len(self.close) > 0
+
+    def _row(self, i: int) -> Dict:
+        return {
+            "open_time": int(self.open_time[i]),
+            "open": float(self.open[i]),
+            "high": float(self.high[i]),
+            "low": float(self.low[i]),
+            "close": float(self.close[i]),
+            "volume": float(self.volume[i]),
+            "close_time": int(self.close_time[i]),
+        }
+
+    def __getitem__(self, key) -> Union[Dict, "CandleSeries"]:
+        if isinstance(key, slice):
+            return CandleSeries(*(getattr(self, f)[key] for f in FIELDS),
+                                symbol=self.symbol, interval=self.interval)
+        return self._row(key)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def __repr__(self) -> str:
+        return f"CandleSeries(symbol={self.symbol!r}, interval={self.interval!r}, len={len(self)})"
+
+    def to_dicts(self) -> List[Dict]:
+        return list(self)
+
+    def column(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+
+Candles = Union[CandleSeries, List[Dict]]
@@ -0,0 +1,225 @@
+"""
+RollingCandleStore — مخزن شموع دوّار لكل (رمز، فريم).
+After one backfill per (symbol, interval) only the candles since the last stored open_time
+are requested, and only once a candle boundary has passed; the still-forming candle is
+updated in place. With a KlineStore attached, closed candles are persisted and a cold ring
+backfills from disk, requesting only the candles since the last stored one.
+"""
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import numpy as np
+from core.tools.candle_series import CandleSeries, FIELDS, TIME_FIELDS
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000,
+    "1w": 604_800_000,
+}
+MAX_KLINES_PER_REQUEST = 1500
+
+
+def interval_ms(interval: str) -> int:
+    if interval in INTERVAL_MS:
+        return INTERVAL_MS[interval]
+    raise ValueError(f"Unknown kline interval: {interval}")
+
+
+class CandleRing:
+    """
+    Fixed-capacity ring of candle columns. Every row is written twice (at i and i + capacity),
+    so the newest `len` rows are always one contiguous slice and can be handed out as views.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._cols = {
+            name: np.zeros(2 * capacity, dtype=np.int64 if name in TIME_FIELDS else np.float64)
+            for name in FIELDS
+        }
+        self._next = 0   # slot (0..capacity-1) the next appended row goes to
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        if not self._len:
+            return None
+        return int(self._cols["open_time"][self._end() - 1])
+
+    def _end(self) -> int:
+        # Exclusive end of the contiguous window inside the doubled buffer
+        return (self._next - 1) % self.capacity + self.capacity + 1
+
+    def _write(self, slots: np.ndarray, series: CandleSeries, rows):
+        for name in FIELDS:
+            values = getattr(series, name)[rows]
+            col = self._cols[name]
+            col[slots] = values
+            col[slots + self.capacity] = values
+
+    def clear(self):
+        self._next = 0
+        self._len = 0
+
+    def extend(self, series: CandleSeries):
+        """Upsert rows: newer open_times are appended, the current last row is updated in place."""
+        if not len(series):
+            return
+        open_times = series.open_time
+        last = self.last_open_time
+        if last is not None:
+            same = np.nonzero(open_times == last)[0]
+            if len(same):
+                self._write(np.array([(self._next - 1) % self.capacity]), series, same[-1:])
+            newer = np.nonzero(open_times > last)[0]
+        else:
+            newer = np.arange(len(series))
+        if not len(newer):
+            return
+        newer = newer[-self.capacity:]
+        slots = (self._next + np.arange(len(newer))) % self.capacity
+        self._write(slots, series, newer)
+        self._next = int((self._next + len(newer)) % self.capacity)
+        self._len = min(self.capacity, self._len + len(newer))
+
+    def series(self, limit: int = None, copy: bool = True, symbol: str = None,
+               interval: str = None) -> CandleSeries:
+        """Newest `limit` rows. copy=False returns views that later writes will overwrite."""
+        n = self._len if limit is None else min(limit, self._len)
+        end = self._end() if self._len else 0
+        columns = []
+        for name in FIELDS:
+            window = self._cols[name][end - n:end]
+            columns.append(window.copy() if copy else window)
+        return CandleSeries(*columns, symbol=symbol, interval=interval)
+
+
+class RollingCandleStore:
+    def __init__(self, client, capacity: int = 1000, forming_refresh_seconds: float = None,
+                 live_timeout: float = 60.0, clock=time.time, history=None):
+        self.client = client
+        self.history = history  # optional KlineStore: disk-backed backfill + closed-candle archive
+        self.capacity = capacity
+        # None → touch the exchange only after a boundary; N → also re-pull the forming candle every N s
+        self.forming_refresh_seconds = forming_refresh_seconds
+        self.clock = clock
+        # Keys fed by a live stream are served locally while updates keep arriving
+        self.live_timeout = live_timeout
+        self._live = set()
+        self._rings: Dict[Tuple[str, str], CandleRing] = {}
+        self._refreshed_at: Dict[Tuple[str, str], float] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, key) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def ring(self, symbol: str, interval: str) -> Optional[CandleRing]:
+        return self._rings.get((symbol, interval))
+
+    def _backfill(self, key, ring: CandleRing, limit: int):
+        if self.history is not None and self._backfill_from_history(key, ring, limit):
+            return
+        symbol, interval = key
+        candles = self.client.get_candles(symbol, interval, min(limit, MAX_KLINES_PER_REQUEST))
+        if candles:
+            ring.clear()
+            ring.extend(candles)
+            self._refreshed_at[key] = self.clock()
+            self._persist(key, candles)
+
+    def _backfill_from_history(self, key, ring: CandleRing, limit: int) -> bool:
+        """Seed the ring from disk and fetch only the gap; False when disk cannot cover `limit`."""
+        stored = self.history.tail(key[0], key[1], limit)
+        if not len(stored):
+            return False
+        missed = (int(self.clock() * 1000) - int(stored.open_time[-1])) // interval_ms(key[1])
+        if len(stored) + missed < limit or missed >= min(limit, MAX_KLINES_PER_REQUEST):
+            return False  # disk plus the gap cannot fill the ring, or the gap is a full backfill anyway
+        ring.clear()
+        ring.extend(stored)
+        self._fetch_since(key, ring, missed)
+        return True
+
+    def _fetch_since(self, key, ring: CandleRing, missed: int):
+        symbol, interval = key
+        candles = self.client.get_candles(symbol, interval, min(missed + 1, MAX_KLINES_PER_REQUEST),
+                                          start_time=ring.last_open_time)
+        if candles:
+            ring.extend(candles)
+            self._refreshed_at[key] = self.clock()
+            self._persist(key, candles)
+
+    def _persist(self, key, candles: CandleSeries):
+        """Archive the closed candles (the forming one is never written)."""
+        if self.history is None:
+            return
+        closed = int(np.count_nonzero(candles.close_time < int(self.clock() * 1000)))
+        if not closed:
+            return
+        try:
+            self.history.append(candles[:closed], *key)
+        except Exception as e:
+            print(f"[RollingCandleStore] History write failed for {key[0]} {key[1]}: {e}", flush=True)
+
+    def set_live(self, symbol: str, interval: str, live: bool):
+        if live:
+            self._live.add((symbol, interval))
+        else:
+            self._live.discard((symbol, interval))
+
+    def is_live(self, symbol: str, interval: str) -> bool:
+        key = (symbol, interval)
+        return key in self._live and self.clock() - self._refreshed_at.get(key, 0) < self.live_timeout
+
+    def get(self, symbol: str, interval: str = '15m', limit: int = 100) -> CandleSeries:
+        key = (symbol, interval)
+        with self._lock(key):
+            ring = self._rings.get(key)
+            if ring is None or ring.capacity < limit:
+                ring = self._rings[key] = CandleRing(max(self.capacity, limit))
+            if len(ring) < limit:
+                self._backfill(key, ring, max(limit, len(ring)))
+            elif not self.is_live(symbol, interval):
+                self._refresh(key, ring)
+            return ring.series(limit, symbol=symbol, interval=interval)
+
+    def get_resampled(self, symbol: str, interval: str, limit: int = 100,
+                      base: str = '1m') -> CandleSeries:
+        """
+        `interval` candles derived from the stored `base` series — no request for `interval`
+        itself. Falls back to fetching `interval` directly when the base history it would need
+        exceeds one klines request.
+        """
+        from core.tools.resampler import resample, resample_factor
+        if interval == base:
+            return self.get(symbol, base, limit)
+        needed = (limit + 1) * resample_factor(base, interval)  # +1 covers a partial head bucket
+        if needed > MAX_KLINES_PER_REQUEST:
+            return self.get(symbol, interval, limit)
+        return resample(self.get(symbol, base, needed), interval, base)[-limit:]
+
+    def _refresh(self, key, ring: CandleRing):
+        missed = (int(self.clock() * 1000) - ring.last_open_time) // interval_ms(key[1])
+        if missed >= ring.capacity:
+            self._backfill(key, ring, ring.capacity)
+        elif missed >= 1:
+            self._fetch_since(key, ring, missed)
+        elif (self.forming_refresh_seconds is not None and
+              self.clock() - self._refreshed_at.get(key, 0) >= self.forming_refresh_seconds):
+            self._fetch_since(key, ring, 0)
+
+    def apply(self, symbol: str, interval: str, candles: CandleSeries):
+        """Push candles from an external feed (e.g. a stream) into the ring."""
+        key = (symbol, interval)
+        with self._lock(key):
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = CandleRing(self.capacity)
+            ring.extend(candles)
+            self._refreshed_at[key] = self.clock()
+            self._persist(key, candles)
@@ -1,49 +1,288 @@
+"""
+DerivativesData — بيانات التمويل والفائدة المفتوحة لكل السوق.
+Funding comes from one unfiltered /fapi/v1/premiumIndex call for every symbol. Open interest
+is sampled per tracked symbol (seeded from /futures/data/openInterestHist). Both go into
+fixed-size ring buffers from the poller only, so samples stay evenly spaced and OI delta /
+z-score and funding trend are O(1) reads.
+"""
+import math
+import threading
 import time
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+import numpy as np
 from core.tools.binance_futures import BinanceFutures
+
+DEFAULT_HISTORY = 96          # samples kept per symbol (8h of 5m OI samples)
+OI_HIST_PERIOD = "5m"
+
+
+class SeriesRing:
+    """Fixed-capacity (ts, value) ring with running sums for O(1) mean / std / delta."""
+    def __init__(self, capacity: int = DEFAULT_HISTORY):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._len = 0
+        # sums are kept relative to a reference value to avoid cancellation on large OI numbers
+        self._ref = 0.0
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _index(self, back: int) -> int:
+        """Slot of the sample `back` steps before the newest (0 = newest)."""
+        return (self._next - 1 - back) % self.capacity
+
+    @property
+    def last(self) -> float:
+        return float(self.values[self._index(0)]) if self._len else math.nan
+
+    @property
+    def last_ts(self) -> int:
+        return int(self.ts[self._index(0)]) if self._len else 0
+
+    def append(self, ts: int, value: float):
+        if self._len and ts <= self.last_ts:
+            if ts == self.last_ts:  # same sample re-read → replace in place
+                self._remove(self.values[self._index(0)])
+                self.values[self._index(0)] = value
+                self._add(value)
+            return
+        if self._len == self.capacity:
+            self._remove(self.values[self._next])
+        else:
+            self._len += 1
+        if self._len == 1:
+            self._ref = value
+        self.ts[self._next] = ts
+        self.values[self._next] = value
+        self._add(value)
+        self._next = (self._next + 1) % self.capacity
+        if self._next == 0:
+            self._resum()
+
+    def _add(self, value: float):
+        d = value - self._ref
+        self._sum += d
+        self._sumsq += d * d
+
+    def _remove(self, value: float):
+        d = value - self._ref
+        self._sum -= d
+        self._sumsq -= d * d
+
+    def _resum(self):
+        window = self.window()
+        self._ref = float(window[-1])
+        d = window - self._ref
+        self._sum = math.fsum(d)
+        self._sumsq = math.fsum(d * d)
+
+    def window(self) -> np.ndarray:
+        """Samples oldest → newest (copy)."""
+        if self._len < self.capacity:
+            return self.values[:self._len].copy()
+        return np.concatenate((self.values[self._next:], self.values[:self._next]))
+
+    def mean(self) -> float:
+        return self._ref + self._sum / self._len if self._len else math.nan
+
+    def std(self) -> float:
+        if self._len < 2:
+            return math.nan
+        m = self._sum / self._len
+        return math.sqrt(max(self._sumsq / self._len - m * m, 0.0))
+
+    def delta(self, back: int = 1) -> float:
+        """Newest value minus the value `back` samples earlier."""
+        if back >= self._len:
+            return math.nan
+        return float(self.values[self._index(0)] - self.values[self._index(back)])
+
+    def change_pct(self, back: int = 1) -> float:
+        if back >= self._len:
+            return math.nan
+        base = float(self.values[self._index(back)])
+        return (self.last - base) / base if base else math.nan
+
+    def zscore(self) -> float:
+        std = self.std()
+        if not std or math.isnan(std):
+            return 0.0
+        return (self.last - self.mean()) / std
+
+
 class DerivativesData:
-    def __init__(self):
-        self.client = BinanceFutures()
-        self._funding_cache: Dict[str, dict] = {}
-        self._oi_cache: Dict[str, dict] = {}
+    def __init__(self, client: BinanceFutures = None, history: int = DEFAULT_HISTORY,
+                 max_workers: int = 8):
+        self.client = client or BinanceFutures()
+        self.history = history
+        self.max_workers = max_workers
         self.cache_ttl = 60  # 1 minute
-    def _cached(self, cache: dict, symbol: str):
-        entry = cache.get(symbol)
-        if not entry:
-            return None
-        if time.time() - entry.get("ts", 0) > self.cache_ttl:
-            return None
-        return entry.get("data")
+        self._funding: Dict[str, dict] = {}       # symbol → latest premiumIndex fields
+        self._funding_ts = 0.0
+        self._funding_rings: Dict[str, SeriesRing] = {}
+        self._oi_rings: Dict[str, SeriesRing] = {}
+        self._oi_adhoc: Dict[str, tuple] = {}     # untracked symbol → (wall time, OI); never in a ring
+        self._lock = threading.Lock()
+        self._poller: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------- funding: one call for the whole market ----------
+    def refresh_funding(self, record: bool = False) -> int:
+        """
+        Reload funding / mark for every symbol with one premiumIndex call. Returns symbols updated.
+        record: also append to the funding rings (the poller's cadence only).
+        """
+        data = self.client._get("/fapi/v1/premiumIndex")
+        if not isinstance(data, list):
+            return 0
+        now = time.time()
+        with self._lock:
+            for item in data:
+                symbol = item.get("symbol")
+                if not symbol:
+                    continue
+                try:
+                    rate = float(item.get("lastFundingRate") or 0.0)
+                    mark = float(item.get("markPrice") or 0.0)
+                except (TypeError, ValueError):
+                    continue
+                ts = int(item.get("time") or now * 1000)
+                self._funding[symbol] = {"rate": rate, "mark_price": mark,
+                                         "next_funding_time": item.get("nextFundingTime"), "ts": ts}
+                if record:
+                    ring = self._funding_rings.get(symbol)
+                    if ring is None:
+                        ring = self._funding_rings[symbol] = SeriesRing(self.history)
+                    ring.append(ts, rate)
+            self._funding_ts = now
+        return len(data)
+
     def get_funding_rate(self, symbol: str) -> float:
-        cached = self._cached(self._funding_cache, symbol)
-        if cached is not None:
-            return cached
-        data = self.client._get(
-            "/fapi/v1/premiumIndex",
-            {"symbol": symbol}
-        )
-        if not data:
+        if time.time() - self._funding_ts > self.cache_ttl:
+            self.refresh_funding()
+        entry = self._funding.get(symbol)
+        return entry["rate"] if entry else 0.0
+
+    def funding_trend(self, symbol: str) -> float:
+        """Latest funding minus its mean over the kept samples (> 0: funding rising)."""
+        ring = self._funding_rings.get(symbol)
+        if not ring or len(ring) < 2:
             return 0.0
-        funding = float(data.get("lastFundingRate", 0.0))
-        self._funding_cache[symbol] = {
-            "data": funding,
-            "ts": time.time()
-        }
-        return funding
-    def get_open_interest(self, symbol: str) -> float:
-        cached = self._cached(self._oi_cache, symbol)
-        if cached is not None:
-            return cached
-        data = self.client._get(
-            "/fapi/v1/openInterest",
-            {"symbol": symbol}
-        )
+        return ring.last - ring.mean()
+
+    # ---------- open interest: per-symbol samples into rings ----------
+    def _seed_open_interest(self, symbol: str, ring: SeriesRing):
+        history = self.client._get("/futures/data/openInterestHist",
+                                   {"symbol": symbol, "period": OI_HIST_PERIOD, "limit": self.history})
+        if not isinstance(history, list):
+            return
+        for row in history:
+            try:
+                ring.append(int(row["timestamp"]), float(row["sumOpenInterest"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    def _fetch_open_interest(self, symbol: str) -> Optional[tuple]:
+        data = self.client._get("/fapi/v1/openInterest", {"symbol": symbol})
         if not data:
-            return 0.0
-        oi = float(data.get("openInterest", 0.0))
-        self._oi_cache[symbol] = {
-            "data": oi,
-            "ts": time.time()
-        }
+            return None
+        return int(data.get("time") or time.time() * 1000), float(data.get("openInterest", 0.0))
+
+    def sample_open_interest(self, symbol: str) -> Optional[float]:
+        """Append one OI sample to the symbol's ring (the poller's cadence)."""
+        fetched = self._fetch_open_interest(symbol)
+        if fetched is None:
+            return None
+        ts, oi = fetched
+        if symbol not in self._oi_rings:
+            # first sight of this symbol: seed the ring with recent history (outside the lock)
+            ring = SeriesRing(self.history)
+            self._seed_open_interest(symbol, ring)
+            with self._lock:
+                self._oi_rings.setdefault(symbol, ring)
+        with self._lock:
+            self._oi_rings[symbol].append(ts, oi)
         return oi
-_
+
+    def sample_many(self, symbols: Iterable[str]) -> int:
+        """Sample OI for many symbols on a small thread pool (the endpoint has no bulk form)."""
+        symbols = list(symbols)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="oi") as pool:
+            return sum(1 for oi in pool.map(self.sample_open_interest, symbols) if oi is not None)
+
+    def get_open_interest(self, symbol: str) -> float:
+        """Latest polled OI; a symbol the poller does not track is read ad hoc, outside the rings."""
+        ring = self._oi_rings.get(symbol)
+        if ring:
+            return ring.last
+        wall, oi = self._oi_adhoc.get(symbol, (0.0, 0.0))
+        if time.time() - wall > self.cache_ttl:
+            fetched = self._fetch_open_interest(symbol)
+            if fetched is not None:
+                oi = fetched[1]
+                self._oi_adhoc[symbol] = (time.time(), oi)
+        return oi
+
+    def oi_delta(self, symbol: str, back: int = 1) -> float:
+        ring = self._oi_rings.get(symbol)
+        return ring.delta(back) if ring else math.nan
+
+    def oi_change_pct(self, symbol: str, back: int = 1) -> float:
+        ring = self._oi_rings.get(symbol)
+        return ring.change_pct(back) if ring else math.nan
+
+    def oi_zscore(self, symbol: str) -> float:
+        ring = self._oi_rings.get(symbol)
+        return ring.zscore() if ring else 0.0
+
+    def features(self, symbol: str) -> Dict[str, float]:
+        return {
+            "funding": self.get_funding_rate(symbol),
+            "funding_trend": self.funding_trend(symbol),
+            "open_interest": self.get_open_interest(symbol),
+            "oi_delta": self.oi_delta(symbol),
+            "oi_change_pct": self.oi_change_pct(symbol),
+            "oi_zscore": self.oi_zscore(symbol),
+        }
+
+    # ---------- background poller ----------
+    def poll(self, symbols: Iterable[str] = ()):
+        """One polling round: bulk funding refresh plus OI samples for the tracked symbols."""
+        self.refresh_funding(record=True)
+        self.sample_many(symbols)
+
+    def start(self, symbols: Callable[[], Iterable[str]], interval: float = 300.0):
+        """Poll every `interval` seconds on a daemon thread; `symbols` returns the tracked set."""
+        if self._poller and self._poller.is_alive():
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.poll(symbols())
+                except Exception as e:
+                    print(f"[DerivativesData] Poll error: {type(e).__name__}: {e}", flush=True)
+                self._stop.wait(interval)
+
+        self._stop.clear()
+        self._poller = threading.Thread(target=loop, name="derivatives-poller", daemon=True)
+        self._poller.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+_derivatives = None
+
+
+def get_derivatives_data() -> DerivativesData:
+    global _derivatives
+    if _derivatives is None:
+        _derivatives = DerivativesData()
+    return _derivatives
@@ -1,11 +1,14 @@
 from core.tools.strategy_scores import StrategyScore
-from core.tools.derivatives_data import DerivativesData
+from core.tools.derivatives_data import DerivativesData, get_derivatives_data
 class DerivativesStrategy:
-    def __init__(self):
-        self.data = DerivativesData()
+    def __init__(self, data: DerivativesData = None):
+        self.data = data or get_derivatives_data()
     def analyze(self, symbol: str) -> StrategyScore:
         funding = self.data.get_funding_rate(symbol)
         oi = self.data.get_open_interest(symbol)
+        oi_change = self.data.oi_change_pct(symbol)
+        oi_z = self.data.oi_zscore(symbol)
+        funding_trend = self.data.funding_trend(symbol)
         score = 0
         direction = None
         confidence = 0.5
@@ -33,10 +36,12 @@ class DerivativesStrategy:
             direction = "LONG"
             reason += "Mild short bias "
         # ===== Open Interest Influence =====
-        # Rising OI usually confirms trend pressure
-        # This logic is complex and needs historical data, so we keep it simple
-        if oi > 0:
+        # Rising OI usually confirms trend pressure; an unusually high OI (z ≥ 2) confirms it more
+        if oi_change > 0:
             score += 0.5
+            reason += f"OI rising ({oi_change * 100:.2f}%) "
+            if oi_z >= 2:
+                score += 0.5
         if not reason:
             reason = f"Neutral funding ({funding:.4f})"
         return StrategyScore(
@@ -47,7 +52,9 @@ class DerivativesStrategy:
             reason=reason.strip(),
             meta={
                 "funding": round(funding, 6),
-                "open_interest": oi
+                "funding_trend": round(funding_trend, 6),
+                "open_interest": oi,
+                "oi_change_pct": oi_change,
+                "oi_zscore": round(oi_z, 3)
             }
         )
-_
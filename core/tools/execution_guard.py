@@ -1,15 +1,32 @@
-import math
 from dataclasses import dataclass, field
 from typing import Optional
 from core.brain.policy import LIVE_TRADING
 from core.tools.binance_futures import BinanceFutures
-from core.tools.trade_logger import TradeLogger
+from core.tools.symbol_registry import get_symbol_registry
+from core.tools.trade_logger import get_trade_logger
 from core.brain.memory import Memory
 
 # Minimum available balance required to open a new position (USDT)
 MIN_AVAILABLE_BALANCE = 5.0
 
 
+def risk_notional(avail_balance: float, risk_pct: float, sl_pct: float, leverage: float) -> float:
+    """
+    Risk-based notional: avail_balance * risk_pct / sl_pct (margin-based, no leverage
+    multiplication), capped at 85% of available margin * leverage (15% safety buffer).
+    """
+    if sl_pct <= 0:
+        sl_pct = 0.012
+    return min(avail_balance * risk_pct / sl_pct, avail_balance * leverage * 0.85)
+
+
+def lead_strategy(brain_dump: Optional[dict], direction: str) -> Optional[str]:
+    """The strategy with the largest weighted score in the traded direction (per-trade attribution)."""
+    voters = [d for d in (brain_dump or {}).get("details", [])
+              if d.get("direction") == direction and d.get("weighted_score", 0) > 0]
+    return max(voters, key=lambda d: d["weighted_score"])["strategy"] if voters else None
+
+
 @dataclass
 class TradeSignal:
     symbol: str
@@ -33,7 +50,7 @@ class ExecutionGuard:
             policy.get('binance_api_key'),
             policy.get('binance_api_secret')
         )
-        self.logger = TradeLogger()
+        self.logger = get_trade_logger()
 
     def _get_account_balances(self) -> tuple:
         """
@@ -78,33 +95,13 @@ class ExecutionGuard:
         try:
             risk_pct = risk_override if risk_override else self.policy.get('risk_per_trade', 0.02)
             leverage = self.policy.get('leverage', 10)
-            if sl_pct <= 0:
-                sl_pct = 0.012
-
-            # Hard cap: never exceed 85% of available margin * leverage
-            max_notional = avail_balance * leverage * 0.85
-
-            # Risk-based notional: risk_amount / sl_pct gives position size
-            risk_amount = avail_balance * risk_pct
-            notional = (risk_amount / sl_pct)  # no leverage multiplication here — margin-based
-
-            # Cap at max notional
-            notional = min(notional, max_notional)
+            notional = risk_notional(avail_balance, risk_pct, sl_pct, leverage)
             quantity = notional / entry_price
 
-            # Get lot size precision from exchange info
-            exchange_info = self.client._get("/fapi/v1/exchangeInfo")
-            if exchange_info:
-                for s in exchange_info.get('symbols', []):
-                    if s['symbol'] == symbol:
-                        for f in s.get('filters', []):
-                            if f['filterType'] == 'LOT_SIZE':
-                                step = float(f['stepSize'])
-                                quantity = math.floor(quantity / step) * step
-                                decimals = len(str(step).rstrip('0').split('.')[-1]) if '.' in str(step) else 0
-                                quantity = round(quantity, decimals)
-                                break
-                        break
+            # Lot size precision from the cached exchange info
+            info = get_symbol_registry().get(symbol, self.client)
+            if info:
+                quantity = info.round_quantity(quantity)
 
             print(f"[ExecutionGuard] Quantity: {quantity} {symbol} (notional: ${notional:.2f}, avail: ${avail_balance:.2f})", flush=True)
             return quantity
@@ -218,6 +215,7 @@ class ExecutionGuard:
             "sl_price": signal.sl_price,
             "tp_price": signal.tp_price,
             "leverage": signal.leverage,
+            "strategy": lead_strategy(signal.brain_dump, signal.direction),
         })
 
         # 7. Log trade entry
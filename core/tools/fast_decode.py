@@ -0,0 +1,92 @@
+"""
+fast_decode — فك ترميز ردود Binance مباشرة من البايتات.
+JSON goes through orjson when it is installed (stdlib json otherwise). Klines are written
+column by column into preallocated NumPy buffers — no per-candle dicts — and exchangeInfo
+is cut down to the fields SymbolRegistry / MarketUniverse read before the rest is dropped.
+"""
+from operator import itemgetter
+import numpy as np
+from core.tools.candle_series import CandleSeries
+
+try:
+    import orjson as _json
+    JSON_BACKEND = "orjson"
+except ImportError:  # pure-Python fallback
+    import json as _json
+    JSON_BACKEND = "json"
+
+# Only these exchangeInfo fields survive decoding
+SYMBOL_FIELDS = ("symbol", "status", "contractType", "quoteAsset", "baseAsset")
+FILTER_FIELDS = {
+    "LOT_SIZE": ("stepSize", "minQty"),
+    "PRICE_FILTER": ("tickSize",),
+    "MIN_NOTIONAL": ("notional", "minNotional"),
+}
+
+
+def loads(payload):
+    if not payload:
+        return None
+    return _json.loads(payload)
+
+
+def _column(rows, index: int, dtype, n: int) -> np.ndarray:
+    convert = float if dtype is np.float64 else int
+    return np.fromiter(map(convert, map(itemgetter(index), rows)), dtype, count=n)
+
+
+def klines_to_series(rows: list, symbol: str = None, interval: str = None) -> CandleSeries:
+    """Kline rows → CandleSeries, one preallocated buffer per column."""
+    n = len(rows)
+    return CandleSeries(
+        _column(rows, 0, np.int64, n),
+        _column(rows, 1, np.float64, n),
+        _column(rows, 2, np.float64, n),
+        _column(rows, 3, np.float64, n),
+        _column(rows, 4, np.float64, n),
+        _column(rows, 5, np.float64, n),
+        _column(rows, 6, np.int64, n),
+        symbol=symbol,
+        interval=interval,
+    )
+
+
+def decode_klines(payload, symbol: str = None, interval: str = None) -> CandleSeries:
+    rows = loads(payload)
+    if not rows:
+        return CandleSeries.empty(symbol, interval)
+    return klines_to_series(rows, symbol, interval)
+
+
+def slim_exchange_info(info: dict) -> dict:
+    """Keep only what the registry needs from the multi-hundred-KB exchangeInfo document."""
+    symbols = []
+    for s in info.get("symbols", []):
+        slim = {k: s[k] for k in SYMBOL_FIELDS if k in s}
+        filters = []
+        for f in s.get("filters", []):
+            keep = FILTER_FIELDS.get(f.get("filterType"))
+            if keep:
+                slim_filter = {"filterType": f["filterType"]}
+                slim_filter.update({k: f[k] for k in keep if k in f})
+                filters.append(slim_filter)
+        slim["filters"] = filters
+        symbols.append(slim)
+    return {"serverTime": info.get("serverTime"), "rateLimits": info.get("rateLimits", []), "symbols": symbols}
+
+
+def decode_exchange_info(payload) -> dict:
+    info = loads(payload)
+    if not info:
+        return info
+    return slim_exchange_info(info)
+
+
+# Endpoint-specific decoders used by the transport; everything else goes through loads()
+ENDPOINT_DECODERS = {
+    "/fapi/v1/exchangeInfo": decode_exchange_info,
+}
+
+
+def decoder_for(endpoint: str):
+    return ENDPOINT_DECODERS.get(endpoint, loads)
@@ -0,0 +1,91 @@
+"""
+FeatureCache — ذاكرة مؤقتة مشتركة للمؤشرات ونتائج الاستراتيجيات لكل دورة.
+Entries are keyed by (symbol, interval, last open_time, length) and hold whatever the scanner
+and strategies derived from those candles (indicator columns, engine outputs, scores). A
+fingerprint of the newest bar invalidates the entry while that bar is still forming; LRU
+eviction bounds memory.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from core.tools.candle_series import CandleSeries, Candles
+
+DEFAULT_MAX_ENTRIES = 2048
+
+
+class FeatureCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._fingerprints: Dict[Tuple, Tuple] = {}
+        self._latest: Dict[Tuple[str, str], Tuple] = {}  # (symbol, interval) → current key
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    @staticmethod
+    def key_for(candles: Candles) -> Optional[Tuple]:
+        """(symbol, interval, last open_time, length), or None when the candles carry no identity."""
+        if not isinstance(candles, CandleSeries) or not candles or not candles.symbol:
+            return None
+        return (candles.symbol, candles.interval, int(candles.open_time[-1]), len(candles))
+
+    @staticmethod
+    def _fingerprint(series: CandleSeries) -> Tuple:
+        # the forming bar keeps its open_time while these move
+        return (float(series.close[-1]), float(series.high[-1]), float(series.low[-1]),
+                float(series.volume[-1]))
+
+    def _entry(self, key: Tuple, series: CandleSeries) -> Dict[str, Any]:
+        fingerprint = self._fingerprint(series)
+        entry = self._entries.get(key)
+        if entry is not None and self._fingerprints.get(key) != fingerprint:
+            entry.clear()
+            self.stats["invalidations"] += 1
+        if entry is None:
+            previous = self._latest.get(key[:2])
+            if previous is not None and previous[2] < key[2]:
+                # a newer candle superseded this symbol's features
+                self._entries.pop(previous, None)
+                self._fingerprints.pop(previous, None)
+            entry = self._entries[key] = {}
+            self._latest[key[:2]] = key
+            while len(self._entries) > self.max_entries:
+                old, _ = self._entries.popitem(last=False)
+                self._fingerprints.pop(old, None)
+                self.stats["evictions"] += 1
+        self._fingerprints[key] = fingerprint
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_or_compute(self, candles: Candles, name: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the memoized `name` feature for these candles, computing it on a miss."""
+        key = self.key_for(candles)
+        if key is None:
+            return compute()
+        with self._lock:
+            entry = self._entry(key, candles)
+            if name in entry:
+                self.stats["hits"] += 1
+                return entry[name]
+            self.stats["misses"] += 1
+        # compute outside the lock; a concurrent duplicate computation is harmless
+        value = compute()
+        with self._lock:
+            self._entry(key, candles)[name] = value
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+            self._latest.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache = FeatureCache()
+
+
+def get_feature_cache() -> FeatureCache:
+    return _cache
@@ -1,11 +1,15 @@
-from typing import List, Dict
+from core.tools.candle_series import CandleSeries, Candles
 from core.tools.strategy_scores import StrategyScore
 from core.tools.indicators import Indicators
+from core.tools.feature_cache import FeatureCache, get_feature_cache
 class RSIStrategy:
-    def __init__(self, period: int = 14):
+    def __init__(self, period: int = 14, feature_cache: FeatureCache = None):
         self.period = period
         self.ind = Indicators()
-    def analyze(self, candles: List[Dict]) -> StrategyScore:
+        self.cache = feature_cache or get_feature_cache()
+    def analyze(self, candles: Candles) -> StrategyScore:
+        return self.cache.get_or_compute(candles, f"score.rsi{self.period}", lambda: self._analyze(candles))
+    def _analyze(self, candles: Candles) -> StrategyScore:
         if len(candles) < self.period + 5:
             return StrategyScore(
                 name="rsi",
@@ -14,8 +18,9 @@ class RSIStrategy:
                 confidence=0.0,
                 reason="Not enough candles"
             )
-        closes = [c["close"] for c in candles]
-        rsi_values = self.ind.rsi(closes, self.period)
+        closes = CandleSeries.coerce(candles).close
+        rsi_values = self.cache.get_or_compute(candles, f"rsi{self.period}",
+                                               lambda: self.ind.rsi(closes, self.period))
         if not rsi_values:
             return StrategyScore(
                 name="rsi",
@@ -61,4 +66,3 @@ class RSIStrategy:
             reason=reason,
             meta={"rsi": round(current_rsi, 2)}
         )
-_
@@ -1,25 +1,177 @@
-from typing import List
+"""
+indicators — مكتبة مؤشرات متجهة (NumPy).
+Every function works along the last axis, so the same call handles one series (T,) or a
+symbol × time matrix (S, T). Outputs keep the input shape; bars without enough history are NaN.
+"""
+from typing import List, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _as_float(x) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64)
+
+
+def _nan_like(x: np.ndarray) -> np.ndarray:
+    return np.full(x.shape, np.nan)
+
+
+def ewma(x, alpha: float, seed=None) -> np.ndarray:
+    """
+    y[t] = y[t-1] + alpha * (x[t] - y[t-1]) with y[-1] = seed (x[0] when None).
+    Solved in closed form per block (decay powers kept inside float range), no per-bar loop.
+    """
+    x = _as_float(x)
+    out = np.empty_like(x)
+    if x.shape[-1] == 0:
+        return out
+    decay = 1.0 - alpha
+    prev = x[..., 0] if seed is None else np.broadcast_to(_as_float(seed), x.shape[:-1])
+    if decay <= 0.0:
+        out[...] = x
+        return out
+    # decay ** -block must stay well below the float64 max
+    block = max(1, min(x.shape[-1], int(600 / -np.log(decay)))) if decay < 1.0 else x.shape[-1]
+    powers = decay ** np.arange(block + 1)
+    for start in range(0, x.shape[-1], block):
+        chunk = x[..., start:start + block]
+        n = chunk.shape[-1]
+        up = powers[1:n + 1]              # decay^(j+1)
+        scaled = np.cumsum(chunk / powers[:n], axis=-1)  # Σ x_k · decay^-k
+        out[..., start:start + n] = up * np.asarray(prev)[..., None] + alpha * powers[:n] * scaled
+        prev = out[..., start + n - 1]
+    return out
+
+
+def ema(x, period: int) -> np.ndarray:
+    """EMA seeded with the SMA of the first `period` values (first valid bar: period - 1)."""
+    x = _as_float(x)
+    out = _nan_like(x)
+    if x.shape[-1] < period:
+        return out
+    seed = x[..., :period].mean(axis=-1)
+    out[..., period - 1] = seed
+    out[..., period:] = ewma(x[..., period:], 2.0 / (period + 1), seed)
+    return out
+
+
+def sma(x, period: int) -> np.ndarray:
+    x = _as_float(x)
+    out = _nan_like(x)
+    if x.shape[-1] < period:
+        return out
+    out[..., period - 1:] = sliding_window_view(x, period, axis=-1).mean(axis=-1)
+    return out
+
+
+def rolling_max(x, period: int) -> np.ndarray:
+    x = _as_float(x)
+    out = _nan_like(x)
+    if x.shape[-1] >= period:
+        out[..., period - 1:] = sliding_window_view(x, period, axis=-1).max(axis=-1)
+    return out
+
+
+def rolling_min(x, period: int) -> np.ndarray:
+    x = _as_float(x)
+    out = _nan_like(x)
+    if x.shape[-1] >= period:
+        out[..., period - 1:] = sliding_window_view(x, period, axis=-1).min(axis=-1)
+    return out
+
+
+def rolling_std(x, period: int, ddof: int = 0) -> np.ndarray:
+    x = _as_float(x)
+    out = _nan_like(x)
+    if x.shape[-1] >= period:
+        out[..., period - 1:] = sliding_window_view(x, period, axis=-1).std(axis=-1, ddof=ddof)
+    return out
+
+
+def window_range(high, low, period: int) -> np.ndarray:
+    """Highest high minus lowest low over the window."""
+    return rolling_max(high, period) - rolling_min(low, period)
+
+
+def _wilder_averages(closes, period: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Wilder-smoothed average gain / loss per delta; index i covers deltas[0..i] (valid from period-1)."""
+    closes = _as_float(closes)
+    deltas = np.diff(closes, axis=-1)
+    gains = np.clip(deltas, 0.0, None)
+    losses = np.clip(-deltas, 0.0, None)
+    avg_gain, avg_loss = _nan_like(deltas), _nan_like(deltas)
+    if deltas.shape[-1] < period:
+        return avg_gain, avg_loss
+    alpha = 1.0 / period
+    for avg, values in ((avg_gain, gains), (avg_loss, losses)):
+        seed = values[..., :period].mean(axis=-1)
+        avg[..., period - 1] = seed
+        avg[..., period:] = ewma(values[..., period:], alpha, seed)
+    return avg_gain, avg_loss
+
+
+def rsi_wilder(closes, period: int = 14) -> np.ndarray:
+    """Wilder RSI aligned with closes (first valid bar: period); 100 when there are no losses."""
+    closes = _as_float(closes)
+    out = _nan_like(closes)
+    avg_gain, avg_loss = _wilder_averages(closes, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    out[..., 1:] = np.where(np.isnan(avg_gain), np.nan, values)
+    return out
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """Average True Range with Wilder smoothing (first valid bar: period)."""
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    out = _nan_like(close)
+    prev_close = close[..., :-1]
+    tr = np.maximum(high[..., 1:] - low[..., 1:],
+                    np.maximum(np.abs(high[..., 1:] - prev_close), np.abs(low[..., 1:] - prev_close)))
+    if tr.shape[-1] < period:
+        return out
+    seed = tr[..., :period].mean(axis=-1)
+    out[..., period] = seed
+    out[..., period + 1:] = ewma(tr[..., period:], 1.0 / period, seed)
+    return out
+
+
+def bollinger(closes, period: int = 20, width: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(middle, upper, lower) bands; population standard deviation."""
+    middle = sma(closes, period)
+    std = rolling_std(closes, period)
+    return middle, middle + width * std, middle - width * std
+
+
+def volume_stats(volume, period: int = 20) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (mean, std, ratio) of the `period` bars *before* each bar; ratio = volume / mean.
+    Excluding the current bar is what spike detection wants.
+    """
+    volume = _as_float(volume)
+    mean, std = _nan_like(volume), _nan_like(volume)
+    mean[..., 1:] = sma(volume[..., :-1], period)
+    std[..., 1:] = rolling_std(volume[..., :-1], period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = volume / mean
+    return mean, std, ratio
+
+
 def rsi(closes: List[float], period: int = 14) -> List[float]:
-    if len(closes) < period:
+    """
+    Legacy list RSI kept for RSIStrategy: one value per delta from `period` on, the newest
+    delta excluded, and rs = 100 (not RSI = 100) when the average loss is zero.
+    """
+    closes = _as_float(closes)
+    if closes.shape[-1] < period + 2:
         return []
-    deltas = [closes[i] - closes[i-1] for i in range(1, len(closes))]
-    gains = [d if d > 0 else 0 for d in deltas]
-    losses = [-d if d < 0 else 0 for d in deltas]
-    avg_gain = sum(gains[:period]) / period
-    avg_loss = sum(losses[:period]) / period
-    rsi_values = []
-    for i in range(period, len(deltas)):
-        if avg_loss == 0:
-            rs = 100
-        else:
-            rs = avg_gain / avg_loss
-        
-        rsi = 100 - (100 / (1 + rs))
-        rsi_values.append(rsi)
-        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
-        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
-    return rsi_values
+    avg_gain, avg_loss = _wilder_averages(closes, period)
+    avg_gain, avg_loss = avg_gain[period - 1:-1], avg_loss[period - 1:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = np.where(avg_loss == 0, 100.0, avg_gain / avg_loss)
+    return (100 - 100 / (1 + rs)).tolist()
+
+
 class Indicators:
     def rsi(self, closes: List[float], period: int = 14) -> List[float]:
         return rsi(closes, period)
-_
@@ -0,0 +1,234 @@
+"""
+KlineDownloader — تنزيل الشموع التاريخية بالتوازي مع الاستئناف.
+Each (symbol, interval) range is split into /fapi/v1/klines pages of 1500 candles
+(startTime/endTime). Pages are fetched concurrently on AsyncBinanceFutures, under the shared
+request-weight limiter, and written to the KlineStore in order, so an interrupted run leaves
+no holes and the next run resumes from the store's newest candle. Internal gaps are detected
+and refilled; ranges the exchange confirms empty (and a symbol's listing date) are kept in a
+JSON checkpoint so they are not requested again.
+
+    python -m core.tools.kline_downloader --symbols BTCUSDT,ETHUSDT --interval 1m --start 2024-01-01
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from core.tools.async_binance_futures import AsyncBinanceFutures
+from core.tools.candle_series import CandleSeries, FIELDS
+from core.tools.candle_store import MAX_KLINES_PER_REQUEST, interval_ms
+from core.tools.fast_decode import decode_klines
+from core.tools.kline_store import DEFAULT_ROOT, KlineStore
+
+DEFAULT_CONCURRENCY = 8       # requests in flight (the weight limiter paces them further)
+DEFAULT_PAGES_AHEAD = 4       # pages fetched ahead of the write position, per symbol
+CHECKPOINT_FILE = "download_checkpoint.json"
+
+
+def plan_pages(start_ms: int, end_ms: int, interval: str,
+               page_size: int = MAX_KLINES_PER_REQUEST) -> List[Tuple[int, int]]:
+    """(startTime, endTime) pairs, both inclusive, covering open times in [start_ms, end_ms)."""
+    step = interval_ms(interval)
+    span = page_size * step
+    return [(s, min(s + span, end_ms) - 1) for s in range(start_ms, end_ms, span)]
+
+
+def find_gaps(open_times: np.ndarray, interval: str) -> List[Tuple[int, int]]:
+    """Missing [start, end) open-time ranges between consecutive stored candles."""
+    step = interval_ms(interval)
+    holes = np.flatnonzero(np.diff(open_times) > step)
+    return [(int(open_times[i]) + step, int(open_times[i + 1])) for i in holes]
+
+
+class KlineDownloader:
+    def __init__(self, store: KlineStore, max_concurrency: int = DEFAULT_CONCURRENCY,
+                 pages_ahead: int = DEFAULT_PAGES_AHEAD, checkpoint_path: Path = None,
+                 base_url: str = None, clock=time.time):
+        self.store = store
+        self.max_concurrency = max_concurrency
+        self.pages_ahead = pages_ahead
+        self.checkpoint_path = Path(checkpoint_path or store.root / CHECKPOINT_FILE)
+        self.base_url = base_url
+        self.clock = clock
+        self.checkpoint = self._load_checkpoint()
+        self.stats = {"requests": 0, "failed": 0, "rows": 0}
+
+    # ---------- checkpoint ----------
+    def _load_checkpoint(self) -> Dict[str, Dict]:
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_checkpoint(self):
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.checkpoint, f, indent=2)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _entry(self, symbol: str, interval: str) -> Dict:
+        return self.checkpoint.setdefault(f"{symbol}|{interval}", {"listed_from": None, "empty": []})
+
+    # ---------- fetching ----------
+    async def _page(self, client: AsyncBinanceFutures, symbol: str, interval: str,
+                    page: Tuple[int, int]) -> Optional[CandleSeries]:
+        """One klines page; None when the request failed (an empty series is a real answer)."""
+        self.stats["requests"] += 1
+        params = {"symbol": symbol, "interval": interval, "limit": MAX_KLINES_PER_REQUEST,
+                  "startTime": page[0], "endTime": page[1]}
+        candles = await client._request("GET", "/fapi/v1/klines", params,
+                                        decoder=lambda payload: decode_klines(payload, symbol, interval))
+        if candles is None:
+            self.stats["failed"] += 1
+        return candles
+
+    async def _fetch_range(self, client, symbol: str, interval: str, start_ms: int, end_ms: int):
+        """
+        Yield (page, candles) in page order while up to `pages_ahead` later pages are in flight.
+        Stops after the first failed page so nothing beyond it is written.
+        """
+        pages = plan_pages(start_ms, end_ms, interval)
+        tasks = {}
+        try:
+            for i, page in enumerate(pages):
+                for j in range(i, min(i + self.pages_ahead, len(pages))):
+                    if j not in tasks:
+                        tasks[j] = asyncio.ensure_future(self._page(client, symbol, interval, pages[j]))
+                candles = await tasks.pop(i)
+                yield page, candles
+                if candles is None:
+                    return
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    # ---------- per symbol ----------
+    async def _download_range(self, client, symbol: str, interval: str, start_ms: int, end_ms: int,
+                              append: bool, head: bool = False) -> Optional[int]:
+        """
+        Fetch [start, end) into the store: appended page by page, or merged once (insert).
+        head: the range begins at the requested start, so leading empty pages mean the symbol
+        was not listed yet. Returns rows stored, or None when a page failed.
+        """
+        entry = self._entry(symbol, interval)
+        table = self.store.table(symbol, interval)
+        collected, rows, seen_data = [], 0, False
+        async for (page_start, page_end), candles in self._fetch_range(client, symbol, interval, start_ms, end_ms):
+            if candles is None:
+                return None
+            if not len(candles):
+                if seen_data:
+                    entry["empty"].append([page_start, page_end + 1])  # an exchange-side gap
+                continue
+            if head and not seen_data and candles.open_time[0] > start_ms:
+                entry["listed_from"] = int(candles.open_time[0])
+            seen_data = True
+            if append:
+                rows += table.append(candles)
+            else:
+                collected.append(candles)
+        if head and not seen_data:
+            entry["listed_from"] = end_ms  # not listed before `end` (or before the stored history)
+        if collected:
+            merged = CandleSeries(*(np.concatenate([getattr(c, name) for c in collected]) for name in FIELDS),
+                                  symbol=symbol, interval=interval)
+            rows += table.insert(merged)
+        self.stats["rows"] += rows
+        return rows
+
+    def _known_empty(self, entry: Dict, gap: Tuple[int, int]) -> bool:
+        return any(a <= gap[0] and gap[1] <= b for a, b in entry["empty"])
+
+    async def download_symbol(self, client, symbol: str, interval: str, start_ms: int,
+                              end_ms: int = None) -> bool:
+        """Bring [start, end) of one symbol up to date: head, tail, then internal gaps."""
+        step = interval_ms(interval)
+        now_closed = int(self.clock() * 1000) // step * step  # the candle opening here is still forming
+        end_ms = now_closed if end_ms is None else min(-(-end_ms // step) * step, now_closed)
+        start_ms = -(-start_ms // step) * step
+        entry = self._entry(symbol, interval)
+        if entry["listed_from"] is not None:
+            start_ms = max(start_ms, entry["listed_from"])
+        table = self.store.table(symbol, interval)
+        first, last = table.first_open_time, table.last_open_time
+        ok = True
+        if last is None:
+            ok = await self._download_range(client, symbol, interval, start_ms, end_ms,
+                                            append=True, head=True) is not None
+        else:
+            if start_ms < first:
+                ok = await self._download_range(client, symbol, interval, start_ms, first,
+                                                append=False, head=True) is not None
+            if ok and last + step < end_ms:
+                ok = await self._download_range(client, symbol, interval, last + step, end_ms,
+                                                append=True) is not None
+        if ok:
+            for gap in find_gaps(table.range(start_ms, end_ms).open_time, interval):
+                if self._known_empty(entry, gap):
+                    continue
+                rows = await self._download_range(client, symbol, interval, gap[0], gap[1], append=False)
+                if rows is None:
+                    ok = False
+                elif rows == 0 and not self._known_empty(entry, gap):
+                    entry["empty"].append(list(gap))  # the exchange has nothing there either
+        self._save_checkpoint()
+        return ok
+
+    async def download_async(self, symbols: List[str], interval: str, start_ms: int,
+                             end_ms: int = None) -> Dict[str, bool]:
+        async with AsyncBinanceFutures(max_concurrency=self.max_concurrency) as client:
+            if self.base_url:
+                client.base_url = self.base_url
+            results = await asyncio.gather(*(self.download_symbol(client, s, interval, start_ms, end_ms)
+                                             for s in symbols))
+        done = dict(zip(symbols, results))
+        print(f"[KlineDownloader] {sum(done.values())}/{len(done)} symbols complete | "
+              f"{self.stats['rows']} rows | {self.stats['requests']} requests ({self.stats['failed']} failed)",
+              flush=True)
+        return done
+
+    def download(self, symbols: List[str], interval: str, start_ms: int, end_ms: int = None) -> Dict[str, bool]:
+        """Sync entry point; {symbol: True when its range is complete}. Rerun to resume."""
+        return asyncio.run(self.download_async(symbols, interval, start_ms, end_ms))
+
+
+def _parse_time(value: str) -> int:
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download historical klines into the local store.")
+    parser.add_argument("--symbols", help="comma-separated; default: every TRADING USDT perpetual")
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--start", required=True, help="YYYY-MM-DD[THH:MM] (UTC) or epoch ms")
+    parser.add_argument("--end", help="default: now")
+    parser.add_argument("--root", default=str(DEFAULT_ROOT))
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--base-url", help="alternative API host (e.g. a local test server)")
+    args = parser.parse_args(argv)
+
+    if args.symbols:
+        symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    else:
+        from core.tools.binance_futures import BinanceFutures
+        from core.tools.symbol_registry import get_symbol_registry
+        registry = get_symbol_registry()
+        symbols = sorted(registry.symbols(BinanceFutures(), status='TRADING', quote_asset='USDT',
+                                          contract_type='PERPETUAL'))
+    downloader = KlineDownloader(KlineStore(Path(args.root)), max_concurrency=args.concurrency,
+                                 base_url=args.base_url)
+    done = downloader.download(symbols, args.interval, _parse_time(args.start),
+                               _parse_time(args.end) if args.end else None)
+    return 0 if all(done.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
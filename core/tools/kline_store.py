@@ -0,0 +1,334 @@
+"""
+KlineStore — مخزن تاريخي للشموع على القرص بأعمدة ثابتة العرض.
+One directory per (symbol, interval): each column is a raw int64/float64 file that only grows,
+read back through numpy.memmap, so a range query is two binary searches on open_time and the
+returned CandleSeries are views on the mapped files. compact() moves old rows into compressed
+cold segments (.npz), which are decompressed only when a query reaches them.
+"""
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from core.tools.candle_series import CandleSeries, FIELDS, TIME_FIELDS
+
+DEFAULT_ROOT = Path("storage/klines")
+DTYPES = {name: np.dtype(np.int64 if name in TIME_FIELDS else np.float64) for name in FIELDS}
+# open_time is written last, so a torn append leaves it the shortest column
+WRITE_ORDER = tuple(name for name in FIELDS if name != "open_time") + ("open_time",)
+SEGMENT_CACHE = 8
+_HOT = re.compile(r"^hot\.(\d+)$")
+_SEGMENT = re.compile(r"^(-?\d+)_(-?\d+)_(\d+)\.npz$")  # first_last_rows.npz
+
+
+class KlineTable:
+    """Append-only columnar history of one (symbol, interval)."""
+    def __init__(self, path: Path, symbol: str = None, interval: str = None, fsync: bool = False):
+        self.path = Path(path)
+        self.symbol = symbol
+        self.interval = interval
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._segments_dir = self.path / "segments"
+        self._segments_dir.mkdir(parents=True, exist_ok=True)
+        self._segment_cache: "OrderedDict[Path, Dict[str, np.ndarray]]" = OrderedDict()
+        self._maps: Optional[Dict[str, np.ndarray]] = None
+        self._gen, self._hot = self._recover()
+        self._len = self._column_len()
+        self._segments = self._scan_segments()
+
+    # ---------- layout / recovery ----------
+    def _recover(self) -> Tuple[int, Path]:
+        """Current hot generation; unfinished compactions (.tmp) and stale generations are removed."""
+        gens = []
+        for entry in self.path.iterdir():
+            if entry.name.endswith(".tmp"):
+                shutil.rmtree(entry, ignore_errors=True)
+            elif _HOT.match(entry.name):
+                gens.append(int(_HOT.match(entry.name).group(1)))
+        gen = max(gens, default=0)
+        for old in gens:
+            if old != gen:
+                shutil.rmtree(self.path / f"hot.{old}", ignore_errors=True)
+        hot = self.path / f"hot.{gen}"
+        hot.mkdir(exist_ok=True)
+        return gen, hot
+
+    def _column_len(self) -> int:
+        """Rows present in every column; a torn tail beyond that is cut off."""
+        sizes = {}
+        for name, dtype in DTYPES.items():
+            file = self._hot / name
+            sizes[name] = file.stat().st_size // dtype.itemsize if file.exists() else 0
+        n = min(sizes.values())
+        for name, dtype in DTYPES.items():
+            file = self._hot / name
+            if not file.exists() or file.stat().st_size != n * dtype.itemsize:
+                with open(file, "ab") as f:
+                    f.truncate(n * dtype.itemsize)
+        return n
+
+    def _scan_segments(self) -> List[Tuple[int, int, int, Path]]:
+        segments = []
+        for file in self._segments_dir.iterdir():
+            m = _SEGMENT.match(file.name)
+            if m:
+                segments.append((int(m.group(1)), int(m.group(2)), int(m.group(3)), file))
+        kept = []
+        for segment in sorted(segments, key=lambda s: (s[0], -s[1], -s[2])):
+            if kept and segment[1] <= kept[-1][1]:
+                # already merged into the enclosing segment (a crash before the old one was removed)
+                segment[3].unlink(missing_ok=True)
+                continue
+            kept.append(segment)
+        return kept
+
+    # ---------- hot columns ----------
+    def _columns(self) -> Dict[str, np.ndarray]:
+        if self._maps is None or len(self._maps["open_time"]) != self._len:
+            if self._len:
+                self._maps = {name: np.memmap(self._hot / name, dtype=dtype, mode="r", shape=(self._len,))
+                              for name, dtype in DTYPES.items()}
+            else:
+                self._maps = {name: np.empty(0, dtype=dtype) for name, dtype in DTYPES.items()}
+        return self._maps
+
+    def _hot_start(self, columns: Dict[str, np.ndarray]) -> int:
+        # rows a crashed compaction already copied into a segment are skipped
+        if not self._segments:
+            return 0
+        return int(np.searchsorted(columns["open_time"], self._segments[-1][1], side="right"))
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        with self._lock:
+            if self._len:
+                return int(self._columns()["open_time"][-1])
+            return self._segments[-1][1] if self._segments else None
+
+    @property
+    def first_open_time(self) -> Optional[int]:
+        with self._lock:
+            if self._segments:
+                return self._segments[0][0]
+            return int(self._columns()["open_time"][0]) if self._len else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._len - self._hot_start(self._columns()) + sum(s[2] for s in self._segments)
+
+    def append(self, series: CandleSeries) -> int:
+        """Append rows newer than the stored history (sorted by open_time). Returns rows written."""
+        if not len(series):
+            return 0
+        with self._lock:
+            last = self.last_open_time
+            rows = np.flatnonzero(series.open_time > last) if last is not None else np.arange(len(series))
+            if not len(rows):
+                return 0
+            for name in WRITE_ORDER:
+                values = np.ascontiguousarray(getattr(series, name)[rows], dtype=DTYPES[name])
+                with open(self._hot / name, "ab") as f:
+                    f.write(values.tobytes())
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+            self._len += len(rows)
+            return len(rows)
+
+    # ---------- cold segments ----------
+    def _segment(self, path: Path) -> Dict[str, np.ndarray]:
+        cached = self._segment_cache.get(path)
+        if cached is None:
+            with np.load(path) as npz:
+                cached = {name: npz[name] for name in FIELDS}
+            self._segment_cache[path] = cached
+            while len(self._segment_cache) > SEGMENT_CACHE:
+                self._segment_cache.popitem(last=False)
+        self._segment_cache.move_to_end(path)
+        return cached
+
+    def _write_segment(self, columns: Dict[str, np.ndarray]) -> Path:
+        first, last = int(columns["open_time"][0]), int(columns["open_time"][-1])
+        segment = self._segments_dir / f"{first}_{last}_{len(columns['open_time'])}.npz"
+        tmp = self._segments_dir / f"{first}_{last}.tmp.npz"
+        np.savez_compressed(tmp, **columns)
+        os.replace(tmp, segment)
+        return segment
+
+    def compact(self, before_ms: int) -> int:
+        """Move hot rows opened before `before_ms` into a compressed cold segment. Returns rows moved."""
+        with self._lock:
+            columns = self._columns()
+            start = self._hot_start(columns)
+            cut = int(np.searchsorted(columns["open_time"], before_ms, side="left"))
+            if cut <= start:
+                return 0
+            self._write_segment({name: np.asarray(columns[name][start:cut]) for name in FIELDS})
+            self._segments = self._scan_segments()
+            self._swap_hot({name: columns[name][cut:] for name in FIELDS})
+            return cut - start
+
+    def _swap_hot(self, columns: Dict[str, np.ndarray]):
+        """Replace the hot columns with a new generation, swapped in with one directory rename."""
+        staging = self.path / f"hot.{self._gen + 1}.tmp"
+        staging.mkdir(exist_ok=True)
+        for name in WRITE_ORDER:
+            np.ascontiguousarray(columns[name], dtype=DTYPES[name]).tofile(staging / name)
+        os.rename(staging, self.path / f"hot.{self._gen + 1}")
+        old_hot = self._hot
+        self._gen, self._hot = self._gen + 1, self.path / f"hot.{self._gen + 1}"
+        self._len = len(columns["open_time"])
+        self._maps = None
+        shutil.rmtree(old_hot, ignore_errors=True)  # open memmaps stay valid until released
+
+    def insert(self, series: CandleSeries) -> int:
+        """
+        Merge missing rows (gap refills, an earlier start). Unlike append() this rewrites: the hot
+        columns for rows after the cold history, and the overlapped cold segments (or a new one)
+        for rows inside or before it. Returns rows added.
+        """
+        with self._lock:
+            open_times, first = np.unique(series.open_time, return_index=True)
+            cold = open_times <= self._segments[-1][1] if self._segments else np.zeros(len(open_times), dtype=bool)
+            added = self._insert_cold(series, first[cold]) if cold.any() else 0
+            columns = self._columns()
+            base = self._hot_start(columns)
+            rows = first[~cold & ~np.isin(open_times, columns["open_time"][base:])]
+            if len(rows):
+                merged = {name: np.concatenate([columns[name][base:], getattr(series, name)[rows]])
+                          for name in FIELDS}
+                order = np.argsort(merged["open_time"], kind="stable")
+                self._swap_hot({name: merged[name][order] for name in FIELDS})
+            return added + len(rows)
+
+    def _insert_cold(self, series: CandleSeries, rows: np.ndarray) -> int:
+        """Merge `rows` with the cold segments their span overlaps into one new segment."""
+        times = series.open_time[rows]
+        lo, hi = int(times.min()), int(times.max())
+        overlap = [s for s in self._segments if s[1] >= lo and s[0] <= hi]
+        parts = [self._segment(s[3]) for s in overlap]
+        if parts:
+            rows = rows[~np.isin(times, np.concatenate([p["open_time"] for p in parts]))]
+            if not len(rows):
+                return 0
+        merged = {name: np.concatenate([p[name] for p in parts] +
+                                       [np.asarray(getattr(series, name)[rows], dtype=DTYPES[name])])
+                  for name in FIELDS}
+        order = np.argsort(merged["open_time"], kind="stable")
+        self._write_segment({name: merged[name][order] for name in FIELDS})
+        for segment in overlap:  # the new segment encloses them; see _scan_segments for a crash here
+            segment[3].unlink(missing_ok=True)
+            self._segment_cache.pop(segment[3], None)
+        self._segments = self._scan_segments()
+        return len(rows)
+
+    # ---------- reads ----------
+    def range(self, start: int = None, end: int = None) -> CandleSeries:
+        """Candles with start <= open_time < end. Hot rows are memmap views; cold rows are copies."""
+        with self._lock:
+            parts = []
+            for first, last, _, path in self._segments:
+                if (end is not None and first >= end) or (start is not None and last < start):
+                    continue
+                seg = self._segment(path)
+                lo = 0 if start is None else int(np.searchsorted(seg["open_time"], start, side="left"))
+                hi = len(seg["open_time"]) if end is None else int(np.searchsorted(seg["open_time"], end, side="left"))
+                parts.append({name: seg[name][lo:hi] for name in FIELDS})
+            columns = self._columns()
+            base = self._hot_start(columns)
+            open_times = columns["open_time"][base:]
+            lo = base + (0 if start is None else int(np.searchsorted(open_times, start, side="left")))
+            hi = base + (len(open_times) if end is None else int(np.searchsorted(open_times, end, side="left")))
+            if hi > lo or not parts:
+                parts.append({name: columns[name][lo:hi] for name in FIELDS})
+        if len(parts) == 1:
+            cols = parts[0]
+        else:
+            cols = {name: np.concatenate([p[name] for p in parts]) for name in FIELDS}
+        return CandleSeries(*(cols[name] for name in FIELDS), symbol=self.symbol, interval=self.interval)
+
+    def tail(self, n: int) -> CandleSeries:
+        """Newest `n` candles (views when they are all still hot)."""
+        with self._lock:
+            columns = self._columns()
+            base = self._hot_start(columns)
+            if self._len - base >= n or not self._segments:
+                lo = max(base, self._len - n)
+                return CandleSeries(*(columns[name][lo:] for name in FIELDS),
+                                    symbol=self.symbol, interval=self.interval)
+            # reach back only through the cold segments the tail needs
+            need, start = n - (self._len - base), None
+            for first, _, rows, _ in reversed(self._segments):
+                start = first
+                need -= rows
+                if need <= 0:
+                    break
+        history = self.range(start)
+        return history[max(0, len(history) - n):]
+
+
+class KlineStore:
+    def __init__(self, root: Path = DEFAULT_ROOT, fsync: bool = False):
+        self.root = Path(root)
+        self.fsync = fsync
+        self._tables: Dict[Tuple[str, str], KlineTable] = {}
+        self._lock = threading.Lock()
+
+    def table(self, symbol: str, interval: str) -> KlineTable:
+        key = (symbol, interval)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is None:
+                table = self._tables[key] = KlineTable(self.root / symbol / interval, symbol, interval, self.fsync)
+            return table
+
+    def append(self, series: CandleSeries, symbol: str = None, interval: str = None) -> int:
+        return self.table(symbol or series.symbol, interval or series.interval).append(series)
+
+    def range(self, symbol: str, interval: str, start: int = None, end: int = None) -> CandleSeries:
+        return self.table(symbol, interval).range(start, end)
+
+    def tail(self, symbol: str, interval: str, n: int) -> CandleSeries:
+        return self.table(symbol, interval).tail(n)
+
+    def last_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        return self.table(symbol, interval).last_open_time
+
+    def symbols(self, interval: str = None) -> List[str]:
+        """Symbols with stored history (for `interval` when given)."""
+        if not self.root.exists():
+            return []
+        return sorted(d.name for d in self.root.iterdir()
+                      if d.is_dir() and (interval is None or (d / interval).is_dir()))
+
+    def load(self, symbols: Iterable[str], interval: str, start: int = None,
+             end: int = None) -> Dict[str, CandleSeries]:
+        """{symbol: series} for a backtest; symbols without rows in the range are left out."""
+        data = {}
+        for symbol in symbols:
+            series = self.range(symbol, interval, start, end)
+            if len(series):
+                data[symbol] = series
+        return data
+
+    def compact(self, before_ms: int) -> int:
+        moved = 0
+        for symbol in self.symbols():
+            for interval_dir in (self.root / symbol).iterdir():
+                if interval_dir.is_dir():
+                    moved += self.table(symbol, interval_dir.name).compact(before_ms)
+        return moved
+
+
+_store = None
+
+
+def get_kline_store(root: Path = DEFAULT_ROOT) -> KlineStore:
+    global _store
+    if _store is None:
+        _store = KlineStore(root)
+    return _store
@@ -1,66 +1,173 @@
-from typing import List, Dict
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
 from core.tools.binance_futures import BinanceFutures
-from core.tools.momentum_engine import MomentumEngine
+from core.tools.momentum_engine import MomentumEngine, DIRECTION_NAMES, stack_series
+from core.tools.symbol_registry import get_symbol_registry
+from core.tools.candle_store import RollingCandleStore
+from core.tools.kline_store import DEFAULT_ROOT, get_kline_store
+from core.tools.candle_series import CandleSeries
+from core.tools.market_universe import MarketUniverse, UniverseConfig
+from core.tools.feature_cache import get_feature_cache
 
 # Symbols known to have issues (delisted, settlement-only, or restricted)
 BLACKLISTED_SYMBOLS = set()
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_SHORTLIST_SIZE = 60
+SCAN_LOOKBACK = 100
 
 class MarketScanner:
     def __init__(self, policy: dict):
         self.policy = policy
         self.client = BinanceFutures(self.policy.get('binance_api_key'), self.policy.get('binance_api_secret'))
         self.momentum_engine = MomentumEngine()
+        # Shared with the strategies: the runner's MomentumStrategy reuses this scan's analysis
+        self.feature_cache = get_feature_cache()
+        scanner_cfg = self.policy.get('scanner', {})
+        # Full history is pulled once per symbol; later scans only fetch what changed.
+        # The forming candle is re-pulled at most once per scan interval so signals stay live.
+        # kline_store.enabled archives closed candles on disk and backfills from there on restart.
+        kline_cfg = self.policy.get('kline_store', {})
+        self.candle_store = RollingCandleStore(
+            self.client,
+            capacity=scanner_cfg.get('candle_capacity', 500),
+            forming_refresh_seconds=scanner_cfg.get('forming_refresh_seconds',
+                                                    scanner_cfg.get('scan_interval_seconds', 300) / 2),
+            history=get_kline_store(kline_cfg.get('path', DEFAULT_ROOT)) if kline_cfg.get('enabled') else None,
+        )
+        # Bounded fan-out: each worker holds one pooled HTTP connection at a time
+        self.max_workers = scanner_cfg.get('max_workers', DEFAULT_MAX_WORKERS)
+        # batch_scoring: fetch the whole list, then score every symbol in one analyze_batch call
+        self.batch_scoring = scanner_cfg.get('batch_scoring', False)
+        # Stage 1: one /ticker/24hr call ranks the market; only the shortlist gets klines.
+        # shortlist_size 0 scans the full USDT universe.
+        shortlist_size = scanner_cfg.get('shortlist_size', DEFAULT_SHORTLIST_SIZE)
+        self.universe = MarketUniverse(UniverseConfig(
+            top_n=shortlist_size,
+            refresh_seconds=scanner_cfg.get('shortlist_refresh_seconds', 300),
+            min_quote_volume=scanner_cfg.get('min_quote_volume', 0.0),
+        ), client=self.client) if shortlist_size else None
         self._valid_symbols = set()  # Cache of valid TRADING symbols
+        self.stream = None  # optional MarketStream feeding candle_store / mark prices
 
     def _load_valid_symbols(self):
         """Load only symbols with status=TRADING from exchange info."""
         try:
-            info = self.client._get("/fapi/v1/exchangeInfo")
-            if info:
-                self._valid_symbols = {
-                    s['symbol'] for s in info.get('symbols', [])
-                    if s.get('status') == 'TRADING' and s['symbol'].endswith('USDT')
-                }
+            symbols = get_symbol_registry().symbols(self.client, status='TRADING', quote_asset='USDT')
+            if symbols:
+                self._valid_symbols = symbols
                 print(f"[MarketScanner] Loaded {len(self._valid_symbols)} valid USDT trading symbols", flush=True)
         except Exception as e:
             print(f"[MarketScanner] Could not load exchange info: {e}", flush=True)
 
     def scan_for_candidates(self) -> List[Dict]:
+        return list(self.iter_candidates())
+
+    def _entry_threshold(self) -> float:
+        return self.policy.get('scanner', {}).get('entry_threshold', 3.5)
+
+    def _analyze_symbol(self, symbol: str) -> Optional[Dict]:
+        candles = self.candle_store.get(symbol, '15m', SCAN_LOOKBACK)
+        if not candles or len(candles) < 21:
+            return None
+        analysis = self.feature_cache.get_or_compute(
+            candles, "momentum", lambda: self.momentum_engine.analyze(candles))
+        score = analysis.get('score', 0)
+        if score < self._entry_threshold():
+            return None
+        return {
+            'symbol': symbol,
+            'score': score,
+            'direction': analysis.get('direction'),
+            'candles': candles
+        }
+
+    def _scan_symbols(self) -> List[str]:
         # Refresh valid symbols list if empty
         if not self._valid_symbols:
             self._load_valid_symbols()
 
-        print("Fetching all tickers...", flush=True)
-        tickers = self.client.get_all_tickers()
+        shortlist = self.universe.top_symbols() if self.universe else []
+        if shortlist:
+            tickers = [{'symbol': s} for s in shortlist]
+            print(f"[MarketScanner] Shortlist: {len(shortlist)} symbols by volume/change/range", flush=True)
+        elif self.stream and self.stream.mark_price_symbols():
+            # Live mark-price stream already lists every trading symbol
+            tickers = [{'symbol': s} for s in self.stream.mark_price_symbols()]
+        else:
+            print("Fetching all tickers...", flush=True)
+            tickers = self.client.get_all_tickers()
         if not tickers:
             print("Could not fetch tickers.", flush=True)
             return []
 
         # Filter: only USDT pairs that are actively TRADING
-        usdt_tickers = [
-            t for t in tickers
+        return [
+            t['symbol'] for t in tickers
             if t['symbol'].endswith('USDT')
             and t['symbol'] not in BLACKLISTED_SYMBOLS
             and (not self._valid_symbols or t['symbol'] in self._valid_symbols)
         ]
 
-        candidates = []
-        print(f"Found {len(usdt_tickers)} valid USDT tickers. Analyzing...", flush=True)
+    def iter_candidates(self) -> Iterator[Dict]:
+        """Yield candidates as soon as their symbol is analyzed, so routing can start mid-scan."""
+        symbols = self._scan_symbols()
+        if not symbols:
+            return
+        if self.batch_scoring:
+            yield from self._iter_batch_candidates(symbols)
+            return
+
+        print(f"Found {len(symbols)} valid USDT tickers. Analyzing with {self.max_workers} workers...", flush=True)
+        started = time.time()
+        found = errors = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scan") as pool:
+            futures = {pool.submit(self._analyze_symbol, symbol): symbol for symbol in symbols}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        candidate = future.result()
+                    except Exception as e:
+                        errors += 1
+                        print(f"[MarketScanner] {futures[future]}: {type(e).__name__}: {e}", flush=True)
+                        continue
+                    if candidate:
+                        found += 1
+                        print(f"*** Candidate found: {candidate['symbol']} (Score: {candidate['score']}) ***", flush=True)
+                        yield candidate
+            finally:
+                # consumer stopped early → drop the symbols not yet started
+                for future in futures:
+                    future.cancel()
+        print(f"[MarketScanner] Scanned {len(symbols)} symbols in {time.time() - started:.1f}s | "
+              f"candidates: {found} | errors: {errors}", flush=True)
+
+    def _fetch_candles(self, symbol: str) -> CandleSeries:
+        try:
+            return self.candle_store.get(symbol, '15m', SCAN_LOOKBACK)
+        except Exception as e:
+            print(f"[MarketScanner] {symbol}: {type(e).__name__}: {e}", flush=True)
+            return CandleSeries.empty(symbol, '15m')
 
-        for ticker in usdt_tickers:
-            symbol = ticker['symbol']
-            print(f"Fetching candles for {symbol}...", flush=True)
-            candles = self.client.get_candles(symbol, '15m')
-            if not candles or len(candles) < 21:
-                continue
-            analysis = self.momentum_engine.analyze(candles)
-            score = analysis.get('score', 0)
-            if score >= self.policy.get('scanner', {}).get('entry_threshold', 3.5):
-                candidates.append({
-                    'symbol': symbol,
-                    'score': score,
-                    'direction': analysis.get('direction'),
-                    'candles': candles
-                })
-                print(f"*** Candidate found: {symbol} (Score: {score}) ***", flush=True)
-        return candidates
+    def _iter_batch_candidates(self, symbols: List[str]) -> Iterator[Dict]:
+        """Fetch on the pool, then score the whole list with one MomentumEngine.analyze_batch call."""
+        print(f"Found {len(symbols)} valid USDT tickers. Fetching with {self.max_workers} workers...", flush=True)
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scan") as pool:
+            series = list(pool.map(self._fetch_candles, symbols))
+        rows, ohlcv = stack_series(series, SCAN_LOOKBACK)
+        scores, directions = self.momentum_engine.analyze_batch(ohlcv)
+        hits = [(int(scores[k]), i, int(directions[k])) for k, i in enumerate(rows)
+                if scores[k] >= self._entry_threshold()]
+        print(f"[MarketScanner] Scored {len(rows)}/{len(symbols)} symbols in {time.time() - started:.1f}s | "
+              f"candidates: {len(hits)}", flush=True)
+        for score, i, direction in sorted(hits, reverse=True):
+            print(f"*** Candidate found: {symbols[i]} (Score: {score}) ***", flush=True)
+            analysis = {'score': score, 'direction': DIRECTION_NAMES[direction]}
+            self.feature_cache.get_or_compute(series[i], "momentum", lambda: analysis)
+            yield {
+                'symbol': symbols[i],
+                'score': score,
+                'direction': analysis['direction'],
+                'candles': series[i]
+            }
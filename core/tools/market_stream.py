@@ -0,0 +1,160 @@
+"""
+MarketStream — بث بيانات السوق عبر WebSocket بدلاً من الاستعلام الدوري.
+Subscribes to combined <symbol>@kline_<interval> streams plus !markPrice@arr, writes every
+kline update into the RollingCandleStore in place and keeps the latest mark price / funding
+per symbol. Reconnects with backoff, resubscribes, and backfills missed candles over REST.
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+import aiohttp
+from core.tools.candle_series import CandleSeries
+from core.tools.candle_store import RollingCandleStore
+
+STREAM_URL = "wss://fstream.binance.com/stream"
+# Binance allows 1024 streams per connection; stay well below it
+MAX_STREAMS_PER_CONNECTION = 200
+MARK_PRICE_STREAM = "!markPrice@arr"
+
+
+def kline_to_series(k: dict) -> CandleSeries:
+    """One `k` payload of a kline event → single-row CandleSeries."""
+    return CandleSeries(
+        [k["t"]], [float(k["o"])], [float(k["h"])], [float(k["l"])],
+        [float(k["c"])], [float(k["v"])], [k["T"]],
+        symbol=k["s"], interval=k["i"],
+    )
+
+
+class MarketStream:
+    def __init__(self, store: RollingCandleStore, symbols: Iterable[str], interval: str = "15m",
+                 url: str = STREAM_URL, mark_prices: bool = True, backfill_limit: int = 100,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 60.0,
+                 streams_per_connection: int = MAX_STREAMS_PER_CONNECTION):
+        self.store = store
+        self.symbols = sorted(set(symbols))
+        self.interval = interval
+        self.url = url
+        self.with_mark_prices = mark_prices
+        self.backfill_limit = backfill_limit
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.streams_per_connection = streams_per_connection
+        # symbol → {"price", "funding_rate", "next_funding_time", "ts"}
+        self.mark_prices: Dict[str, dict] = {}
+        self.stats = {"messages": 0, "connects": 0, "subscribes": 0, "backfills": 0}
+        self._stop = None
+        self._loop = None
+        self._thread = None
+
+    # ---------- public, thread-safe reads ----------
+    def mark_price(self, symbol: str, max_age: float = 10.0) -> Optional[float]:
+        entry = self.mark_prices.get(symbol)
+        if not entry or time.time() - entry["received"] > max_age:
+            return None
+        return entry["price"]
+
+    def mark_price_symbols(self) -> List[str]:
+        return list(self.mark_prices.keys())
+
+    # ---------- lifecycle ----------
+    def start(self):
+        """Run the stream on a background thread with its own event loop."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.run()),
+                                        name="market-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._loop and self._stop:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _stream_groups(self) -> List[List[str]]:
+        suffix = f"@kline_{self.interval}"
+        streams = [s.lower() + suffix for s in self.symbols]
+        groups = [streams[i:i + self.streams_per_connection]
+                  for i in range(0, len(streams), self.streams_per_connection)]
+        if self.with_mark_prices:
+            if groups and len(groups[0]) < self.streams_per_connection:
+                groups[0].append(MARK_PRICE_STREAM)
+            else:
+                groups.insert(0, [MARK_PRICE_STREAM])
+        return groups
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        async with aiohttp.ClientSession() as session:
+            tasks = [asyncio.create_task(self._connection(session, group))
+                     for group in self._stream_groups()]
+            await self._stop.wait()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _connection(self, session: aiohttp.ClientSession, streams: List[str]):
+        delay = self.reconnect_delay
+        request_id = 0
+        symbols = [s.split("@")[0].upper() for s in streams if "@kline_" in s]
+        while not self._stop.is_set():
+            try:
+                async with session.ws_connect(self.url, heartbeat=30) as ws:
+                    self.stats["connects"] += 1
+                    request_id += 1
+                    await ws.send_str(json.dumps({"method": "SUBSCRIBE", "params": streams, "id": request_id}))
+                    self.stats["subscribes"] += 1
+                    # Fill whatever closed while we were away; the stream then keeps it current
+                    await self._backfill(symbols)
+                    delay = self.reconnect_delay
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            self._handle(json.loads(msg.data))
+                        elif msg.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[MarketStream] Connection error: {type(e).__name__}: {e}", flush=True)
+            self._set_live(symbols, False)
+            if self._stop.is_set():
+                break
+            print(f"[MarketStream] Reconnecting in {delay:.1f}s...", flush=True)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _backfill(self, symbols: List[str]):
+        loop = asyncio.get_running_loop()
+        for symbol in symbols:
+            await loop.run_in_executor(None, self.store.get, symbol, self.interval, self.backfill_limit)
+            self.stats["backfills"] += 1
+        self._set_live(symbols, True)
+
+    def _set_live(self, symbols: List[str], live: bool):
+        for symbol in symbols:
+            self.store.set_live(symbol, self.interval, live)
+
+    def _handle(self, message: dict):
+        data = message.get("data", message)
+        self.stats["messages"] += 1
+        if isinstance(data, list):
+            received = time.time()
+            for item in data:
+                if item.get("e") == "markPriceUpdate":
+                    self.mark_prices[item["s"]] = {
+                        "price": float(item["p"]),
+                        "funding_rate": float(item.get("r") or 0.0),
+                        "next_funding_time": item.get("T"),
+                        "ts": item.get("E"),
+                        "received": received,
+                    }
+        elif isinstance(data, dict) and data.get("e") == "kline":
+            k = data["k"]
+            self.store.apply(k["s"], k["i"], kline_to_series(k))
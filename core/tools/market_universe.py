@@ -1,49 +1,72 @@
 import time
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Optional
+import numpy as np
 from core.tools.binance_futures import BinanceFutures
+from core.tools.symbol_registry import SymbolRegistry, get_symbol_registry
 @dataclass
 class UniverseConfig:
     top_n: int = 20
     refresh_seconds: int = 300  # refresh every 5 minutes
+    # Composite rank = weighted sum of percentile ranks on each metric
+    volume_weight: float = 1.0
+    change_weight: float = 1.0
+    range_weight: float = 1.0
+    min_quote_volume: float = 0.0  # drop illiquid symbols before ranking
 class MarketUniverse:
-    def __init__(self, cfg: UniverseConfig | None = None):
+    def __init__(self, cfg: UniverseConfig | None = None, client: BinanceFutures | None = None,
+                 registry: SymbolRegistry | None = None):
         self.cfg = cfg or UniverseConfig()
-        self.client = BinanceFutures()
+        self.client = client or BinanceFutures()
+        self.registry = registry or get_symbol_registry()
         self._cache: List[str] = []
         self._last_refresh = 0
     def _all_usdt_perp_symbols(self) -> set[str]:
-        info = self.client.exchange_info()
-        if not info or "symbols" not in info:
-            return set()
-        syms = set()
-        for s in info.get("symbols", []):
-            if s.get("contractType") == "PERPETUAL" and s.get("quoteAsset") == "USDT" and s.get("status") == "TRADING":
-                syms.add(s["symbol"])
-        return syms
+        return self.registry.symbols(self.client, status="TRADING", quote_asset="USDT",
+                                     contract_type="PERPETUAL")
     def _tickers_24h(self) -> list[dict]:
-        # 24h rolling window ticker stats
+        # 24h rolling window ticker stats — one call for the whole market
         return self.client._get("/fapi/v1/ticker/24hr") or []
+    @staticmethod
+    def _metrics(t: dict) -> Optional[tuple]:
+        # quoteVolume = حجم التداول بالدولار تقريباً
+        try:
+            qv = float(t.get("quoteVolume", 0.0))
+            change = abs(float(t.get("priceChangePercent", 0.0)))
+            last = float(t.get("lastPrice", 0.0))
+            rng = (float(t.get("highPrice", 0.0)) - float(t.get("lowPrice", 0.0))) / last if last > 0 else 0.0
+        except (ValueError, TypeError):
+            return None
+        return qv, change, rng
+    def rank(self, tickers: list[dict], allowed: set[str]) -> List[str]:
+        """Symbols ordered by composite rank of quote volume, |24h change| and 24h range."""
+        symbols, rows = [], []
+        for t in tickers:
+            sym = t.get("symbol")
+            if sym not in allowed:
+                continue
+            metrics = self._metrics(t)
+            if metrics is None or metrics[0] < self.cfg.min_quote_volume:
+                continue
+            symbols.append(sym)
+            rows.append(metrics)
+        if not rows:
+            return []
+        values = np.asarray(rows, dtype=np.float64)
+        # percentile rank per column (0 = worst, 1 = best); robust to scale differences
+        ranks = values.argsort(axis=0).argsort(axis=0) / max(len(values) - 1, 1)
+        weights = np.array([self.cfg.volume_weight, self.cfg.change_weight, self.cfg.range_weight])
+        score = ranks @ weights
+        order = np.argsort(-score, kind="stable")
+        return [symbols[i] for i in order]
     def top_symbols(self) -> List[str]:
         now = int(time.time())
         if self._cache and (now - self._last_refresh) < self.cfg.refresh_seconds:
             return self._cache
         allowed = self._all_usdt_perp_symbols()
         tickers = self._tickers_24h()
-        scored = []
-        for t in tickers:
-            sym = t.get("symbol")
-            if sym not in allowed:
-                continue
-            # quoteVolume = حجم التداول بالدولار تقريباً
-            try:
-                qv = float(t.get("quoteVolume", 0.0))
-            except (ValueError, TypeError):
-                qv = 0.0
-            scored.append((qv, sym))
-        scored.sort(reverse=True, key=lambda x: x[0])
-        top = [sym for _, sym in scored[: self.cfg.top_n]]
-        self._cache = top
-        self._last_refresh = now
-        return top
-_
+        top = self.rank(tickers, allowed)[: self.cfg.top_n]
+        if top:
+            self._cache = top
+            self._last_refresh = now
+        return top or self._cache
@@ -1,17 +1,171 @@
-from typing import List, Dict
+from collections import deque
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from core.tools.candle_series import CandleSeries, Candles
+from core.tools.indicators import ema, rolling_max, rolling_min, volume_stats
+from core.tools.streaming_indicators import StreamingEMA, RollingExtreme, RollingSum, indicator_from_dict
+MIN_CANDLES = 21
+# analyze_batch encodes directions as int8
+LONG, SHORT, FLAT = 1, -1, 0
+DIRECTION_NAMES = {LONG: "LONG", SHORT: "SHORT", FLAT: None}
+OHLCV = ("open", "high", "low", "close", "volume")
+def stack_series(series: Sequence[CandleSeries], lookback: int = 100) -> Tuple[List[int], np.ndarray]:
+    """
+    Stack the newest `lookback` bars of each series into an (S, lookback, 5) OHLCV matrix.
+    Series shorter than `lookback` are skipped; returns (indices of stacked series, matrix).
+    """
+    keep = [i for i, s in enumerate(series) if len(s) >= lookback]
+    matrix = np.empty((len(keep), lookback, len(OHLCV)))
+    for row, i in enumerate(keep):
+        for col, name in enumerate(OHLCV):
+            matrix[row, :, col] = getattr(series[i], name)[-lookback:]
+    return keep, matrix
+class MomentumState:
+    """Per-symbol streaming state: everything analyze() reads, advanced one closed candle at a time."""
+    def __init__(self):
+        self.ema9 = StreamingEMA(9)
+        self.ema21 = StreamingEMA(21)
+        self.volume_sum = RollingSum(19)          # the 19 bars before the current one
+        self.high_max = RollingExtreme(11, "max")  # breakout window: 11 bars before the current one
+        self.low_min = RollingExtreme(11, "min")
+        self.closes = deque(maxlen=2)
+        self.count = 0
+        self.last_open_time = None
+        self.last_result: Dict = {"score": 0}
+    def commit(self, candle: Dict):
+        self.ema9.update(candle["close"])
+        self.ema21.update(candle["close"])
+        self.volume_sum.update(candle["volume"])
+        self.high_max.update(candle["high"])
+        self.low_min.update(candle["low"])
+        self.closes.append(candle["close"])
+        self.count += 1
+        self.last_open_time = candle.get("open_time", self.last_open_time)
+    def to_dict(self) -> Dict:
+        return {
+            "indicators": {name: getattr(self, name).to_dict()
+                           for name in ("ema9", "ema21", "volume_sum", "high_max", "low_min")},
+            "closes": list(self.closes),
+            "count": self.count,
+            "last_open_time": self.last_open_time,
+            "last_result": self.last_result,
+        }
+    @classmethod
+    def from_dict(cls, d: Dict) -> "MomentumState":
+        state = cls()
+        for name, payload in d["indicators"].items():
+            setattr(state, name, indicator_from_dict(payload))
+        state.closes.extend(d["closes"])
+        state.count = d["count"]
+        state.last_open_time = d["last_open_time"]
+        state.last_result = d["last_result"]
+        return state
 class MomentumEngine:
-    def analyze(self, candles: List[Dict]) -> Dict:
-        if len(candles) < 21:
+    def __init__(self):
+        self._states: Dict[str, MomentumState] = {}
+    def analyze(self, candles: Candles) -> Dict:
+        if len(candles) < MIN_CANDLES:
             return {"score": 0}
-        closes = [c["close"] for c in candles]
-        highs = [c["high"] for c in candles]
-        lows = [c["low"] for c in candles]
-        volumes = [c["volume"] for c in candles]
+        series = CandleSeries.coerce(candles)
+        closes = series.close
+        highs = series.high
+        lows = series.low
+        volumes = series.volume
+        return self._score(
+            ema9=ema(closes, 9)[-1],
+            ema21=ema(closes, 21)[-1],
+            volume=volumes[-1],
+            avg_volume=volume_stats(volumes[-20:], 19)[0][-1],  # mean of the 19 bars before the last
+            recent_high=rolling_max(highs[-12:-1], 11)[-1],
+            recent_low=rolling_min(lows[-12:-1], 11)[-1],
+            open_=series.open[-1], high=highs[-1], low=lows[-1],
+            closes=(closes[-3], closes[-2], closes[-1]),
+        )
+    def analyze_batch(self, ohlcv: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        analyze() for many symbols at once. `ohlcv` is (S, T, 5) with columns open, high, low,
+        close, volume (see stack_series). Returns (scores, directions) arrays of length S;
+        directions are LONG / SHORT / FLAT. Rows match analyze() on the same T bars.
+        """
+        ohlcv = np.asarray(ohlcv, dtype=np.float64)
+        n = ohlcv.shape[0]
+        if ohlcv.ndim != 3 or ohlcv.shape[1] < MIN_CANDLES:
+            return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int8)
+        opens, highs, lows, closes, volumes = (ohlcv[:, :, i] for i in range(len(OHLCV)))
+        last_close = closes[:, -1]
+        # EMA
+        direction = np.sign(ema(closes, 9)[:, -1] - ema(closes, 21)[:, -1]).astype(np.int8)
+        score = (direction != FLAT).astype(np.int64)
+        # Volume Spike
+        avg_volume = volumes[:, -20:-1].mean(axis=1)
+        score += 2 * (volumes[:, -1] > avg_volume * 2.5)
+        # Breakout with strong candle body
+        body = np.abs(last_close - opens[:, -1])
+        range_ = highs[:, -1] - lows[:, -1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            strong_body = (range_ > 0) & (body / range_ > 0.6)
+        breakout_up = (last_close > highs[:, -12:-1].max(axis=1)) & strong_body
+        breakout_down = (last_close < lows[:, -12:-1].min(axis=1)) & strong_body
+        score += 3 * breakout_up + 3 * breakout_down
+        direction[breakout_up] = LONG
+        direction[breakout_down] = SHORT
+        # 3-candle momentum
+        rising = (last_close > closes[:, -2]) & (closes[:, -2] > closes[:, -3])
+        falling = (last_close < closes[:, -2]) & (closes[:, -2] < closes[:, -3])
+        score += ((direction == LONG) & rising) | ((direction == SHORT) & falling)
+        return score, direction
+    def update(self, candle: Dict, key: str = "default", closed: bool = True) -> Dict:
+        """
+        O(1) incremental analyze(): `candle` is the newest bar of `key`.
+        closed=True commits it to the state; closed=False scores the forming bar without committing.
+        Each closed bar must be fed once, in order (repeats by open_time are ignored).
+        """
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = MomentumState()
+        open_time = candle.get("open_time")
+        if closed and open_time is not None and state.last_open_time is not None \
+                and open_time <= state.last_open_time:
+            return state.last_result
+        if state.count + 1 < MIN_CANDLES:
+            result = {"score": 0}
+        else:
+            close = candle["close"]
+            result = self._score(
+                ema9=state.ema9.peek(close),
+                ema21=state.ema21.peek(close),
+                volume=candle["volume"],
+                avg_volume=state.volume_sum.mean,
+                recent_high=state.high_max.value,
+                recent_low=state.low_min.value,
+                open_=candle["open"], high=candle["high"], low=candle["low"],
+                closes=(state.closes[0], state.closes[1], close),
+            )
+        if closed:
+            state.commit(candle)
+            state.last_result = result
+        return result
+    def warm(self, key: str, candles: Candles) -> Dict:
+        """Rebuild the streaming state of `key` from closed history (one O(T) pass)."""
+        self._states.pop(key, None)
+        result = {"score": 0}
+        for candle in CandleSeries.coerce(candles):
+            result = self.update(candle, key)
+        return result
+    def reset(self, key: str = None):
+        if key is None:
+            self._states.clear()
+        else:
+            self._states.pop(key, None)
+    def state_dict(self) -> Dict[str, Dict]:
+        return {key: state.to_dict() for key, state in self._states.items()}
+    def load_state_dict(self, states: Dict[str, Dict]):
+        self._states = {key: MomentumState.from_dict(d) for key, d in states.items()}
+    @staticmethod
+    def _score(ema9, ema21, volume, avg_volume, recent_high, recent_low, open_, high, low, closes) -> Dict:
         score = 0
         direction = None
         # EMA
-        ema9 = self._ema(closes, 9)[-1]
-        ema21 = self._ema(closes, 21)[-1]
         if ema9 > ema21:
             score += 1
             direction = "LONG"
@@ -19,17 +173,13 @@ class MomentumEngine:
             score += 1
             direction = "SHORT"
         # Volume Spike
-        avg_volume = sum(volumes[-20:-1]) / 19
-        if volumes[-1] > avg_volume * 2.5:
+        if volume > avg_volume * 2.5:
             score += 2
         # Breakout
-        recent_high = max(highs[-12:-1])
-        recent_low = min(lows[-12:-1])
-        last_close = closes[-1]
+        c3, c2, last_close = closes
         # Strong candle body filter
-        last_candle = candles[-1]
-        body = abs(last_candle["close"] - last_candle["open"])
-        range_ = last_candle["high"] - last_candle["low"]
+        body = abs(last_close - open_)
+        range_ = high - low
         strong_body = range_ > 0 and (body / range_) > 0.6
         if last_close > recent_high and strong_body:
             score += 3
@@ -38,14 +188,10 @@ class MomentumEngine:
             score += 3
             direction = "SHORT"
         # 3-candle momentum
-        if direction == "LONG" and closes[-1] > closes[-2] > closes[-3]:
+        if direction == "LONG" and last_close > c2 > c3:
             score += 1
-        if direction == "SHORT" and closes[-1] < closes[-2] < closes[-3]:
+        if direction == "SHORT" and last_close < c2 < c3:
             score += 1
         return {"score": score, "direction": direction}
     def _ema(self, data, period):
-        ema = [sum(data[:period]) / period]
-        multiplier = 2 / (period + 1)
-        for price in data[period:]:
-            ema.append((price - ema[-1]) * multiplier + ema[-1])
-        return ema
+        return ema(data, period)[period - 1:].tolist()
@@ -1,14 +1,21 @@
-from typing import List, Dict
 from core.tools.momentum_engine import MomentumEngine
 from core.tools.strategy_scores import StrategyScore
+from core.tools.candle_series import Candles
+from core.tools.feature_cache import FeatureCache, get_feature_cache
 
 class MomentumStrategy:
 
-    def __init__(self):
+    def __init__(self, feature_cache: FeatureCache = None):
         self.engine = MomentumEngine()
+        self.cache = feature_cache or get_feature_cache()
 
-    def analyze(self, candles: List[Dict]) -> StrategyScore:
-        analysis = self.engine.analyze(candles)
+    def analyze(self, candles: Candles) -> StrategyScore:
+        # Unchanged candles → last cycle's score is reused outright
+        return self.cache.get_or_compute(candles, "score.momentum", lambda: self._analyze(candles))
+
+    def _analyze(self, candles: Candles) -> StrategyScore:
+        # "momentum" is shared with MarketScanner, which already ran the engine on these candles
+        analysis = self.cache.get_or_compute(candles, "momentum", lambda: self.engine.analyze(candles))
         score = analysis.get("score", 0)
         direction = analysis.get("direction")
 
@@ -1,11 +1,17 @@
-from typing import List, Dict
+from typing import List
 from core.tools.patterns_engine import PatternsEngine, PatternSignal
 from core.tools.strategy_scores import StrategyScore
+from core.tools.candle_series import Candles
+from core.tools.feature_cache import FeatureCache, get_feature_cache
 class PatternStrategy:
-    def __init__(self):
+    def __init__(self, feature_cache: FeatureCache = None):
         self.engine = PatternsEngine()
-    def analyze(self, candles: List[Dict]) -> StrategyScore:
-        patterns: List[PatternSignal] = self.engine.analyze(candles)
+        self.cache = feature_cache or get_feature_cache()
+    def analyze(self, candles: Candles) -> StrategyScore:
+        return self.cache.get_or_compute(candles, "score.patterns", lambda: self._analyze(candles))
+    def _analyze(self, candles: Candles) -> StrategyScore:
+        patterns: List[PatternSignal] = self.cache.get_or_compute(
+            candles, "patterns", lambda: self.engine.analyze(candles))
         if not patterns:
             return StrategyScore(
                 name="patterns",
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 from typing import List, Dict, Optional
+from core.tools.candle_series import CandleSeries, Candles
+from core.tools.indicators import window_range
 @dataclass
 class PatternSignal:
     pattern: str
@@ -9,19 +11,17 @@ class PatternSignal:
     reason: str
     meta: Optional[Dict] = None
 class PatternsEngine:
-    def analyze(self, candles: List[Dict]) -> List[PatternSignal]:
+    def analyze(self, candles: Candles) -> List[PatternSignal]:
         # This is a placeholder for a real pattern detection library.
         # The logic here is simplified for demonstration.
         signals = []
         if len(candles) < 50:
             return []
-        closes = [c["close"] for c in candles]
-        highs = [c["high"] for c in candles]
-        lows = [c["low"] for c in candles]
+        series = CandleSeries.coerce(candles)
+        closes = series.close
         # Simple Triangle Detection (very basic)
-        last_30_highs = highs[-30:]
-        last_30_lows = lows[-30:]
-        if max(last_30_highs) - min(last_30_lows) < closes[-1] * 0.02: # Squeezing
+        squeeze_range = window_range(series.high[-30:], series.low[-30:], 30)[-1]
+        if squeeze_range < closes[-1] * 0.02: # Squeezing
             if closes[-1] > closes[-2]:
                 signals.append(PatternSignal(
                     pattern="Triangle Squeeze",
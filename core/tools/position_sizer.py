@@ -1,4 +1,4 @@
-import math
+from core.tools.symbol_registry import get_symbol_registry
 
 class PositionSizer:
 
@@ -57,19 +57,10 @@ class PositionSizer:
             # Quantity in base asset
             quantity = notional / entry_price
 
-            # Get exchange info for precision
-            exchange_info = client._get("/fapi/v1/exchangeInfo")
-            if exchange_info:
-                for s in exchange_info.get('symbols', []):
-                    if s['symbol'] == symbol:
-                        for f in s.get('filters', []):
-                            if f['filterType'] == 'LOT_SIZE':
-                                step = float(f['stepSize'])
-                                precision = len(str(step).rstrip('0').split('.')[-1]) if '.' in str(step) else 0
-                                quantity = math.floor(quantity / step) * step
-                                quantity = round(quantity, precision)
-                                break
-                        break
+            # Precision from the cached exchange info
+            info = get_symbol_registry().get(symbol, client)
+            if info:
+                quantity = info.round_quantity(quantity)
 
             print(f"[PositionSizer] Quantity: {quantity} {symbol} (notional: ${notional:.2f})", flush=True)
             return quantity
@@ -0,0 +1,155 @@
+"""
+RateLimiter — عدّاد أوزان الطلبات المشترك لكل طلبات Binance.
+Token buckets for request weight and order count, synced from the X-MBX-* response
+headers and frozen on 429/418 until Retry-After passes.
+"""
+import asyncio
+import threading
+import time
+
+# Binance USDT-M futures defaults (GET /fapi/v1/exchangeInfo → rateLimits)
+REQUEST_WEIGHT_PER_MINUTE = 2400
+ORDERS_PER_10S = 300
+ORDERS_PER_MINUTE = 1200
+# Used when a 429/418 arrives without a Retry-After header
+DEFAULT_BAN_SECONDS = 60
+
+ORDER_ENDPOINTS = {"/fapi/v1/order"}
+
+
+def klines_weight(limit) -> int:
+    limit = int(limit or 500)
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+def endpoint_weight(method: str, endpoint: str, params: dict = None) -> int:
+    """Request weight Binance charges for one call."""
+    params = params or {}
+    has_symbol = "symbol" in params
+    if endpoint in ("/fapi/v1/klines", "/fapi/v1/continuousKlines", "/fapi/v1/markPriceKlines"):
+        return klines_weight(params.get("limit"))
+    if endpoint == "/fapi/v1/exchangeInfo":
+        return 40
+    if endpoint == "/fapi/v1/ticker/price":
+        return 1 if has_symbol else 2
+    if endpoint == "/fapi/v1/ticker/24hr":
+        return 1 if has_symbol else 40
+    if endpoint == "/fapi/v1/premiumIndex":
+        return 1 if has_symbol else 10
+    if endpoint in ("/fapi/v2/positionRisk", "/fapi/v2/account"):
+        return 5
+    return 1
+
+
+class TokenBucket:
+    """
+    Reservation-style bucket: take() always succeeds and returns how long the caller
+    must wait, so concurrent callers queue up instead of racing for the same tokens.
+    """
+    def __init__(self, capacity: float, per_seconds: float, clock=time.monotonic):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / per_seconds
+        self.clock = clock
+        self.tokens = self.capacity
+        self._last = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def take(self, amount: float) -> float:
+        self._refill()
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def sync_used(self, used: float):
+        # The exchange is the source of truth — never believe we have more than it says
+        self._refill()
+        self.tokens = min(self.tokens, self.capacity - used)
+
+
+class RateLimiter:
+    def __init__(self, weight_per_minute: int = REQUEST_WEIGHT_PER_MINUTE,
+                 orders_per_10s: int = ORDERS_PER_10S,
+                 orders_per_minute: int = ORDERS_PER_MINUTE,
+                 headroom: float = 0.9, clock=time.monotonic):
+        self.clock = clock
+        self.headroom = headroom
+        self.weight = TokenBucket(weight_per_minute * headroom, 60, clock)
+        self.orders_10s = TokenBucket(orders_per_10s * headroom, 10, clock)
+        self.orders_1m = TokenBucket(orders_per_minute * headroom, 60, clock)
+        self.blocked_until = 0.0
+        self.used_weight = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, method: str, endpoint: str, params: dict = None) -> float:
+        """Book the call's weight and return the seconds to wait before sending it."""
+        weight = endpoint_weight(method, endpoint, params)
+        with self._lock:
+            wait = self.weight.take(weight)
+            if method == "POST" and endpoint in ORDER_ENDPOINTS:
+                wait = max(wait, self.orders_10s.take(1), self.orders_1m.take(1))
+            ban_wait = self.blocked_until - self.clock()
+            return max(wait, ban_wait, 0.0)
+
+    def acquire(self, method: str, endpoint: str, params: dict = None):
+        wait = self.reserve(method, endpoint, params)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, method: str, endpoint: str, params: dict = None):
+        wait = self.reserve(method, endpoint, params)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def update_from_response(self, status: int, headers):
+        """Sync counters from X-MBX-* headers; freeze all traffic on 429/418."""
+        headers = headers or {}
+        with self._lock:
+            used = headers.get("X-MBX-USED-WEIGHT-1M") or headers.get("x-mbx-used-weight-1m")
+            if used is not None:
+                self.used_weight = int(used)
+                self.weight.sync_used(int(used))
+            count_10s = headers.get("X-MBX-ORDER-COUNT-10S") or headers.get("x-mbx-order-count-10s")
+            if count_10s is not None:
+                self.orders_10s.sync_used(int(count_10s))
+            count_1m = headers.get("X-MBX-ORDER-COUNT-1M") or headers.get("x-mbx-order-count-1m")
+            if count_1m is not None:
+                self.orders_1m.sync_used(int(count_1m))
+            if status in (418, 429):
+                retry_after = headers.get("Retry-After") or headers.get("retry-after")
+                try:
+                    seconds = float(retry_after)
+                except (TypeError, ValueError):
+                    seconds = DEFAULT_BAN_SECONDS
+                self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+                print(f"[RateLimiter] HTTP {status} — pausing all Binance calls for {seconds:.0f}s", flush=True)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self.weight._refill()
+            return {
+                "used_weight_1m": self.used_weight,
+                "weight_available": round(self.weight.tokens, 1),
+                "blocked_for": round(max(0.0, self.blocked_until - self.clock()), 1),
+            }
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_shared_limiter() -> RateLimiter:
+    """All clients in the process draw from the same IP-wide budget."""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
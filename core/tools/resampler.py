@@ -0,0 +1,120 @@
+"""
+Resampler — اشتقاق الفريمات الأعلى محلياً من فريم أساسي.
+Higher timeframes are built from stored base-interval candles: `resample` does a whole
+history in one vectorized pass, `Resampler` keeps a target-interval ring current as base
+candles (closed or forming) arrive. Buckets follow Binance alignment (UTC epoch; weeks
+open on Monday).
+"""
+from typing import Dict, Optional
+import numpy as np
+from core.tools.candle_series import CandleSeries
+from core.tools.candle_store import CandleRing, interval_ms
+
+# 1970-01-01 was a Thursday; Binance weekly candles open on Monday
+WEEK_OFFSET_MS = 4 * 86_400_000
+
+
+def resample_factor(base: str, target: str) -> int:
+    base_ms, target_ms = interval_ms(base), interval_ms(target)
+    if target_ms % base_ms:
+        raise ValueError(f"{target} is not a multiple of {base}")
+    return target_ms // base_ms
+
+
+def bucket_start(open_time, target: str):
+    """Open time of the target-interval candle containing `open_time` (scalar or array)."""
+    step = interval_ms(target)
+    offset = WEEK_OFFSET_MS if target == "1w" else 0
+    return open_time - (open_time - offset) % step
+
+
+def resample(series: CandleSeries, target: str, base: str = None,
+             drop_partial_head: bool = True) -> CandleSeries:
+    """
+    Aggregate base candles into `target` candles: first open, max high, min low, last close,
+    summed volume. The newest bucket may be incomplete (it is the forming candle); a leading
+    bucket that starts mid-interval is dropped unless drop_partial_head=False.
+    """
+    base = base or series.interval
+    if base is not None:
+        resample_factor(base, target)
+    if not len(series):
+        return CandleSeries.empty(series.symbol, target)
+    starts = bucket_start(series.open_time, target)
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    last = np.r_[first[1:], len(series)] - 1
+    out = CandleSeries(
+        starts[first],
+        series.open[first],
+        np.maximum.reduceat(series.high, first),
+        np.minimum.reduceat(series.low, first),
+        series.close[last],
+        np.add.reduceat(series.volume, first),
+        starts[first] + interval_ms(target) - 1,
+        symbol=series.symbol, interval=target,
+    )
+    if drop_partial_head and series.open_time[0] != starts[0]:
+        out = out[1:]
+    return out
+
+
+class Resampler:
+    """
+    Incremental base → target aggregation. Base rows are upserted like CandleRing.extend:
+    newer open_times append, the newest one may be re-sent while it is still forming.
+    Complete buckets inside a batch go through `resample`; only the open bucket keeps its
+    base rows (at most `factor` of them).
+    """
+    def __init__(self, base: str, target: str, capacity: int = 500, symbol: str = None):
+        self.base = base
+        self.target = target
+        self.factor = resample_factor(base, target)
+        self.symbol = symbol
+        self.ring = CandleRing(capacity)
+        self._bucket: Optional[int] = None     # open time of the open (newest) target candle
+        self._rows: Dict[int, tuple] = {}      # its base rows, by open_time
+        self._min_bucket: Optional[int] = None  # buckets before this are ignored (partial head)
+
+    def _add_row(self, series: CandleSeries, i: int):
+        self._rows[int(series.open_time[i])] = (float(series.open[i]), float(series.high[i]),
+                                                float(series.low[i]), float(series.close[i]),
+                                                float(series.volume[i]))
+
+    def _emit(self) -> CandleSeries:
+        rows = [self._rows[t] for t in sorted(self._rows)]
+        return CandleSeries(
+            [self._bucket], [rows[0][0]], [max(r[1] for r in rows)], [min(r[2] for r in rows)],
+            [rows[-1][3]], [sum(r[4] for r in rows)], [self._bucket + interval_ms(self.target) - 1],
+            symbol=self.symbol, interval=self.target,
+        )
+
+    def update(self, series: CandleSeries) -> CandleSeries:
+        """Fold new base rows in; returns the current (possibly forming) target candle."""
+        if len(series):
+            starts = bucket_start(series.open_time, self.target)
+            if self._min_bucket is None:
+                # history that begins mid-bucket cannot produce a correct first candle
+                partial = series.open_time[0] != starts[0]
+                self._min_bucket = int(starts[0]) + (interval_ms(self.target) if partial else 0)
+            if self._bucket is not None:
+                current = np.flatnonzero(starts == self._bucket)
+                for i in current:
+                    self._add_row(series, i)
+                if len(current):
+                    self.ring.extend(self._emit())
+            floor = self._min_bucket if self._bucket is None else max(self._min_bucket, self._bucket + 1)
+            newer = np.flatnonzero(starts >= floor)
+            if len(newer):
+                last_start = int(starts[-1])
+                complete = newer[starts[newer] < last_start]
+                if len(complete):
+                    self.ring.extend(resample(series[int(complete[0]):int(complete[-1]) + 1], self.target,
+                                              self.base, drop_partial_head=False))
+                self._bucket, self._rows = last_start, {}
+                for i in newer[starts[newer] == last_start]:
+                    self._add_row(series, i)
+                self.ring.extend(self._emit())
+        return self.ring.series(1, symbol=self.symbol, interval=self.target)
+
+    def series(self, limit: int = None) -> CandleSeries:
+        return self.ring.series(limit, symbol=self.symbol, interval=self.target)
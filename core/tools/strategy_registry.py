@@ -0,0 +1,173 @@
+"""
+StrategyRegistry — سجل الاستراتيجيات وتشغيلها بالتوازي لكل مرشح.
+Strategies are built once from policy `strategy_weights`, declare how many candles they need
+and what they read (candles or the symbol, for funding/OI), and run on their own thread pool
+or a shared process pool. Every strategy has its own timeout, so a slow one is dropped for that
+candidate instead of stalling the cycle; a run that cannot be cancelled keeps only its own
+strategy's pool busy, and that strategy is not submitted again until the run returns.
+"""
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from core.tools.strategy_scores import StrategyScore
+
+DEFAULT_STRATEGY_WORKERS = 8
+
+
+def _momentum():
+    from core.tools.momentum_strategy import MomentumStrategy
+    return MomentumStrategy()
+
+
+def _patterns():
+    from core.tools.pattern_strategy import PatternStrategy
+    return PatternStrategy()
+
+
+def _rsi():
+    from core.tools.indicator_strategy import RSIStrategy
+    return RSIStrategy()
+
+
+def _funding_oi():
+    from core.tools.derivatives_strategy import DerivativesStrategy
+    return DerivativesStrategy()
+
+
+@dataclass
+class StrategySpec:
+    name: str
+    factory: Callable[[], object]
+    lookback: int = 0             # candles required; fewer → the strategy is skipped
+    needs: str = "candles"        # "candles" → analyze(candles), "symbol" → analyze(symbol)
+    executor: str = "thread"      # "thread" | "process"
+    timeout: float = 5.0          # seconds per evaluation
+
+
+# Names match the keys of policy strategy_weights. Candle strategies default to threads so
+# they share the in-process FeatureCache; set executor "process" in policy for heavy ones.
+STRATEGY_SPECS: Dict[str, StrategySpec] = {
+    "momentum": StrategySpec("momentum", _momentum, lookback=21),
+    "patterns": StrategySpec("patterns", _patterns, lookback=50),
+    "rsi": StrategySpec("rsi", _rsi, lookback=19),
+    "funding_oi": StrategySpec("funding_oi", _funding_oi, needs="symbol", timeout=10.0),
+}
+
+# One instance per (strategy, factory) in every worker process
+_process_strategies: Dict[Tuple[str, Callable], object] = {}
+
+
+def _analyze_in_process(name: str, factory: Callable[[], object], arg) -> StrategyScore:
+    """`factory` comes from the registry's spec, so custom and overridden specs run as configured."""
+    strategy = _process_strategies.get((name, factory))
+    if strategy is None:
+        strategy = _process_strategies[(name, factory)] = factory()
+    return strategy.analyze(arg)
+
+
+class StrategyRegistry:
+    def __init__(self, policy: dict, specs: Dict[str, StrategySpec] = None):
+        specs = specs or STRATEGY_SPECS
+        overrides = policy.get('strategies', {})
+        self.specs: Dict[str, StrategySpec] = {}
+        self.instances: Dict[str, object] = {}
+        for name, weight in policy.get('strategy_weights', {}).items():
+            if name not in specs:
+                print(f"[StrategyRegistry] No strategy registered for '{name}', skipping.", flush=True)
+                continue
+            if not weight:
+                continue
+            spec = replace(specs[name], **overrides.get(name, {}))
+            self.specs[name] = spec
+            if spec.executor == "thread":
+                self.instances[name] = spec.factory()
+        workers = policy.get('strategy_workers', DEFAULT_STRATEGY_WORKERS)
+        # a pool per strategy: a hung one cannot take the threads the others need
+        self._threads = {name: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"strategy-{name}")
+                         for name in self.instances}
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._process_workers = workers
+        self._lock = threading.Lock()
+        self.in_flight_abandoned: Dict[str, int] = {name: 0 for name in self.specs}  # timed out, still running
+        self.abandoned: Dict[str, int] = {name: 0 for name in self.specs}            # timeouts since start
+        self.skipped: Dict[str, int] = {name: 0 for name in self.specs}              # not submitted meanwhile
+        print(f"[StrategyRegistry] Active strategies: {', '.join(self.specs) or 'none'}", flush=True)
+
+    @property
+    def lookback(self) -> int:
+        return max((s.lookback for s in self.specs.values()), default=0)
+
+    def _submit(self, spec: StrategySpec, candidate: Dict) -> Optional[Future]:
+        with self._lock:
+            if self.in_flight_abandoned[spec.name]:
+                self.skipped[spec.name] += 1
+                return None
+        if spec.needs == "symbol":
+            arg = candidate['symbol']
+        else:
+            arg = candidate.get('candles')
+            if arg is None or len(arg) < spec.lookback:
+                return None
+        if spec.executor == "process":
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self._process_workers)
+            return self._processes.submit(_analyze_in_process, spec.name, spec.factory, arg)
+        return self._threads[spec.name].submit(self.instances[spec.name].analyze, arg)
+
+    def _abandon(self, spec: StrategySpec, future: Future) -> bool:
+        """Drop a timed-out job; one already running holds its strategy back until it returns."""
+        if future.cancel():
+            return False
+        with self._lock:
+            self.abandoned[spec.name] += 1
+            self.in_flight_abandoned[spec.name] += 1
+
+        def released(_):
+            with self._lock:
+                self.in_flight_abandoned[spec.name] -= 1
+        future.add_done_callback(released)
+        return True
+
+    def _collect(self, symbol: str, jobs: List[Tuple[StrategySpec, Future, float]]) -> List[StrategyScore]:
+        scores = []
+        for spec, future, deadline in jobs:
+            try:
+                scores.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                running = self._abandon(spec, future)
+                print(f"[StrategyRegistry] {spec.name} timed out on {symbol} after {spec.timeout}s"
+                      + ("; skipped until it returns" if running else ""), flush=True)
+            except Exception as e:
+                print(f"[StrategyRegistry] {spec.name} failed on {symbol}: {type(e).__name__}: {e}", flush=True)
+        return scores
+
+    def _jobs(self, candidate: Dict) -> List[Tuple[StrategySpec, Future, float]]:
+        jobs = []
+        for spec in self.specs.values():
+            future = self._submit(spec, candidate)
+            if future is not None:
+                jobs.append((spec, future, time.monotonic() + spec.timeout))
+        return jobs
+
+    def evaluate_one(self, candidate: Dict) -> List[StrategyScore]:
+        """Run every active strategy on one candidate concurrently."""
+        return self._collect(candidate['symbol'], self._jobs(candidate))
+
+    def evaluate_all(self, candidates: List[Dict]) -> Dict[str, List[StrategyScore]]:
+        """Submit every (candidate, strategy) pair up front, then gather per candidate."""
+        submitted = [(c, self._jobs(c)) for c in candidates]
+        return {c['symbol']: self._collect(c['symbol'], jobs) for c, jobs in submitted}
+
+    def evaluate(self, candidates: Iterable[Dict]) -> Iterator[Tuple[Dict, List[StrategyScore]]]:
+        """Score candidates as they stream in from the scanner."""
+        for candidate in candidates:
+            yield candidate, self.evaluate_one(candidate)
+
+    def close(self):
+        for pool in self._threads.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,226 @@
+"""
+streaming_indicators — مؤشرات تدريجية بتكلفة O(1) لكل شمعة.
+Each indicator keeps just enough state to absorb one closed candle at a time (`update`) and
+to evaluate the still-forming candle without committing it (`peek`). Values match the batch
+functions in indicators.py; state round-trips through to_dict()/from_dict() for persistence.
+"""
+import json
+import math
+import os
+from collections import deque
+from typing import Dict, Optional
+
+NAN = float("nan")
+
+
+class StreamingEMA:
+    """EMA seeded with the SMA of the first `period` values, like indicators.ema."""
+    def __init__(self, period: int, alpha: float = None):
+        self.period = period
+        self.alpha = 2.0 / (period + 1) if alpha is None else alpha
+        self.count = 0
+        self.value = NAN
+        self._seed_sum = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.period
+
+    def _next(self, x: float) -> float:
+        if self.count + 1 < self.period:
+            return NAN
+        if self.count + 1 == self.period:
+            return (self._seed_sum + x) / self.period
+        return self.value + self.alpha * (x - self.value)
+
+    def peek(self, x: float) -> float:
+        return self._next(x)
+
+    def update(self, x: float) -> float:
+        value = self._next(x)
+        if self.count < self.period:
+            self._seed_sum += x
+        self.count += 1
+        self.value = value
+        return value
+
+    def to_dict(self) -> dict:
+        return {"type": "ema", "period": self.period, "alpha": self.alpha, "count": self.count,
+                "value": self.value, "seed_sum": self._seed_sum}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "StreamingEMA":
+        obj = cls(d["period"], d["alpha"])
+        obj.count, obj.value, obj._seed_sum = d["count"], d["value"], d["seed_sum"]
+        return obj
+
+
+class StreamingRSI:
+    """Wilder RSI (indicators.rsi_wilder): 100 when there are no losses."""
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_close: Optional[float] = None
+        self.gain = StreamingEMA(period, alpha=1.0 / period)
+        self.loss = StreamingEMA(period, alpha=1.0 / period)
+        self.value = NAN
+
+    @staticmethod
+    def _rsi(avg_gain: float, avg_loss: float) -> float:
+        if math.isnan(avg_gain):
+            return NAN
+        if avg_loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    def peek(self, close: float) -> float:
+        if self.prev_close is None:
+            return NAN
+        delta = close - self.prev_close
+        return self._rsi(self.gain.peek(max(delta, 0.0)), self.loss.peek(max(-delta, 0.0)))
+
+    def update(self, close: float) -> float:
+        if self.prev_close is not None:
+            delta = close - self.prev_close
+            self.value = self._rsi(self.gain.update(max(delta, 0.0)), self.loss.update(max(-delta, 0.0)))
+        self.prev_close = close
+        return self.value
+
+    def to_dict(self) -> dict:
+        return {"type": "rsi", "period": self.period, "prev_close": self.prev_close, "value": self.value,
+                "gain": self.gain.to_dict(), "loss": self.loss.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "StreamingRSI":
+        obj = cls(d["period"])
+        obj.prev_close, obj.value = d["prev_close"], d["value"]
+        obj.gain, obj.loss = StreamingEMA.from_dict(d["gain"]), StreamingEMA.from_dict(d["loss"])
+        return obj
+
+
+class RollingExtreme:
+    """
+    Rolling max (or min) over the last `period` values via a monotonic deque of (index, value):
+    amortised O(1) per update, O(1) peek.
+    """
+    def __init__(self, period: int, mode: str = "max"):
+        self.period = period
+        self.mode = mode
+        self.count = 0
+        self._deque = deque()  # candidates, best first
+
+    def _beats(self, a: float, b: float) -> bool:
+        return a >= b if self.mode == "max" else a <= b
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.period
+
+    @property
+    def value(self) -> float:
+        """Extreme of the last `period` committed values."""
+        return self._deque[0][1] if self.ready else NAN
+
+    def peek(self, x: float) -> float:
+        """Extreme of the last period-1 committed values plus x."""
+        if self.count + 1 < self.period:
+            return NAN
+        oldest = self.count - self.period + 1
+        for index, value in self._deque:
+            if index >= oldest:
+                return value if self._beats(value, x) else x
+        return x
+
+    def update(self, x: float) -> float:
+        while self._deque and self._beats(x, self._deque[-1][1]):
+            self._deque.pop()
+        self._deque.append((self.count, x))
+        self.count += 1
+        if self._deque[0][0] <= self.count - 1 - self.period:
+            self._deque.popleft()
+        return self.value
+
+    def to_dict(self) -> dict:
+        return {"type": "extreme", "period": self.period, "mode": self.mode, "count": self.count,
+                "deque": [list(item) for item in self._deque]}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "RollingExtreme":
+        obj = cls(d["period"], d["mode"])
+        obj.count = d["count"]
+        obj._deque = deque(tuple(item) for item in d["deque"])
+        return obj
+
+
+class RollingSum:
+    """Sum of the last `period` values; re-summed once per window to stop float drift."""
+    def __init__(self, period: int):
+        self.period = period
+        self.count = 0
+        self.total = 0.0
+        self._window = deque(maxlen=period)
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.period
+
+    @property
+    def value(self) -> float:
+        return self.total if self.ready else NAN
+
+    @property
+    def mean(self) -> float:
+        return self.value / self.period
+
+    def peek(self, x: float) -> float:
+        """Sum of the last period-1 committed values plus x."""
+        if self.count + 1 < self.period:
+            return NAN
+        return self.total - (self._window[0] if self.ready else 0.0) + x
+
+    def update(self, x: float) -> float:
+        if self.ready:
+            self.total -= self._window[0]
+        self._window.append(x)
+        self.total += x
+        self.count += 1
+        if self.count % self.period == 0:
+            self.total = math.fsum(self._window)
+        return self.value
+
+    def to_dict(self) -> dict:
+        return {"type": "sum", "period": self.period, "count": self.count, "window": list(self._window)}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "RollingSum":
+        obj = cls(d["period"])
+        obj.count = d["count"]
+        obj._window.extend(d["window"])
+        obj.total = math.fsum(obj._window)
+        return obj
+
+
+INDICATOR_TYPES = {
+    "ema": StreamingEMA,
+    "rsi": StreamingRSI,
+    "extreme": RollingExtreme,
+    "sum": RollingSum,
+}
+
+
+def indicator_from_dict(d: dict):
+    return INDICATOR_TYPES[d["type"]].from_dict(d)
+
+
+def save_states(path: str, states: Dict[str, dict]):
+    """Write serialized states atomically (temp file + rename)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(states, f)
+    os.replace(tmp, path)
+
+
+def load_states(path: str) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,138 @@
+"""
+SymbolRegistry — نسخة واحدة من exchangeInfo لكل العملية.
+Loads /fapi/v1/exchangeInfo once, indexes the filters we trade on per symbol and
+precompiles the LOT_SIZE / PRICE_FILTER quantizers, refreshing on a TTL or when an
+unknown symbol (new listing) is requested.
+"""
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Set
+
+
+def _decimals(step: float) -> int:
+    text = f"{step:.12f}".rstrip('0')
+    return len(text.split('.')[-1]) if '.' in text and not text.endswith('.') else 0
+
+
+def make_quantizer(step: float) -> Callable[[float], float]:
+    """Floor a value to the nearest multiple of step (LOT_SIZE / PRICE_FILTER rounding)."""
+    if step <= 0:
+        return lambda value: value
+    decimals = _decimals(step)
+
+    def quantize(value: float) -> float:
+        # epsilon guards 0.3 / 0.1 = 2.9999999999999996 style float error
+        return round(math.floor(value / step + 1e-9) * step, decimals)
+    return quantize
+
+
+@dataclass
+class SymbolInfo:
+    symbol: str
+    status: str
+    contract_type: str
+    quote_asset: str
+    step_size: float = 0.0
+    min_qty: float = 0.0
+    tick_size: float = 0.0
+    min_notional: float = 0.0
+    round_quantity: Callable[[float], float] = field(default=None, repr=False)
+    round_price: Callable[[float], float] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.round_quantity is None:
+            self.round_quantity = make_quantizer(self.step_size)
+        if self.round_price is None:
+            self.round_price = make_quantizer(self.tick_size)
+
+    @classmethod
+    def from_exchange_info(cls, s: dict) -> "SymbolInfo":
+        filters = {f.get('filterType'): f for f in s.get('filters', [])}
+        lot = filters.get('LOT_SIZE', {})
+        price = filters.get('PRICE_FILTER', {})
+        notional = filters.get('MIN_NOTIONAL', {})
+        return cls(
+            symbol=s['symbol'],
+            status=s.get('status', ''),
+            contract_type=s.get('contractType', ''),
+            quote_asset=s.get('quoteAsset', ''),
+            step_size=float(lot.get('stepSize', 0)),
+            min_qty=float(lot.get('minQty', 0)),
+            tick_size=float(price.get('tickSize', 0)),
+            min_notional=float(notional.get('notional', notional.get('minNotional', 0))),
+        )
+
+
+class SymbolRegistry:
+    def __init__(self, ttl: int = 3600, min_refresh_interval: int = 60):
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval  # throttle for unknown-symbol refreshes
+        self._symbols: Dict[str, SymbolInfo] = {}
+        self._loaded_at = 0.0
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        return not self._symbols or time.time() - self._loaded_at > self.ttl
+
+    def refresh(self, client, force: bool = False) -> bool:
+        """Reload exchangeInfo through the caller's client. Returns True if the index changed."""
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_attempt < self.min_refresh_interval:
+                return False
+            self._last_attempt = now
+            try:
+                info = client._get("/fapi/v1/exchangeInfo")
+            except Exception as e:
+                print(f"[SymbolRegistry] exchangeInfo error: {e}", flush=True)
+                return False
+            if not info or not info.get('symbols'):
+                return False
+            symbols = {}
+            for s in info['symbols']:
+                if 'symbol' in s:
+                    symbols[s['symbol']] = SymbolInfo.from_exchange_info(s)
+            added = symbols.keys() - self._symbols.keys()
+            removed = self._symbols.keys() - symbols.keys()
+            if self._symbols and (added or removed):
+                print(f"[SymbolRegistry] Listing change: +{sorted(added)} -{sorted(removed)}", flush=True)
+            self._symbols = symbols
+            self._loaded_at = now
+            return True
+
+    def ensure(self, client):
+        if client is not None and self.is_stale():
+            self.refresh(client)
+
+    def get(self, symbol: str, client=None) -> Optional[SymbolInfo]:
+        self.ensure(client)
+        info = self._symbols.get(symbol)
+        if info is None and client is not None:
+            # Possibly a new listing — refresh, throttled by min_refresh_interval
+            if self.refresh(client):
+                info = self._symbols.get(symbol)
+        return info
+
+    def symbols(self, client=None, status: str = "TRADING", quote_asset: str = None,
+                contract_type: str = None) -> Set[str]:
+        self.ensure(client)
+        return {
+            s.symbol for s in self._symbols.values()
+            if (status is None or s.status == status)
+            and (quote_asset is None or s.quote_asset == quote_asset)
+            and (contract_type is None or s.contract_type == contract_type)
+        }
+
+    def round_quantity(self, symbol: str, quantity: float, client=None) -> Optional[float]:
+        info = self.get(symbol, client)
+        return info.round_quantity(quantity) if info else None
+
+
+_registry = SymbolRegistry()
+
+
+def get_symbol_registry() -> SymbolRegistry:
+    return _registry
@@ -1,26 +1,220 @@
+"""
+TradeLogger — سجل الصفقات: كاتب خلفي مخزّن مع تدوير وأرشيف عمودي.
+One logger is shared per process (get_trade_logger). log_trade only queues the row; a
+background thread appends whatever is queued to the open CSV in one write. The CSV rotates
+when it passes `max_bytes` or the day changes: its rows move into a compressed columnar .npz
+archive (typed columns, dictionary-encoded text) named by its time range, and `read_trades`
+loads archives plus the live CSV into typed numpy columns.
+"""
+import atexit
 import csv
+import os
+import queue
+import threading
 from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+
+DEFAULT_FILE = "storage/trade_history.csv"
+COLUMNS = ['timestamp', 'symbol', 'side', 'entry_price', 'exit_price', 'pnl', 'duration_seconds', 'reason']
+FLOAT_COLUMNS = ('entry_price', 'exit_price', 'pnl', 'duration_seconds')
+TEXT_COLUMNS = ('symbol', 'side', 'reason')
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+ARCHIVE_DIR = "trade_archive"
+
+
+# ---------- columnar format ----------
+def rows_to_columns(rows: List[List[str]]) -> Dict[str, np.ndarray]:
+    """CSV rows (strings, header excluded) → typed columns; empty cells become NaN / NaT."""
+    cells = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    columns = dict(zip(COLUMNS, cells))
+    out = {"timestamp": np.array(columns["timestamp"], dtype="datetime64[us]")}
+    for name in FLOAT_COLUMNS:
+        out[name] = np.array([v or "nan" for v in columns[name]], dtype=str).astype(np.float64)
+    for name in TEXT_COLUMNS:
+        out[name] = np.array(columns[name], dtype=str)
+    return out
+
+
+def _time_tag(ts: np.datetime64) -> str:
+    return np.datetime_as_string(ts, unit="s").replace("-", "").replace(":", "")
+
+
+def write_archive(directory: Path, stem: str, columns: Dict[str, np.ndarray]) -> Path:
+    """Write one compressed .npz archive named `{stem}.{first}-{last}.npz`; returns its path."""
+    directory.mkdir(parents=True, exist_ok=True)
+    times = columns["timestamp"]
+    name = f"{stem}.{_time_tag(times.min())}-{_time_tag(times.max())}"
+    path, n = directory / f"{name}.npz", 1
+    while path.exists():
+        path, n = directory / f"{name}.{n}.npz", n + 1
+    arrays = {"timestamp": times.astype(np.int64)}
+    for col in FLOAT_COLUMNS:
+        arrays[col] = columns[col]
+    for col in TEXT_COLUMNS:
+        values, codes = np.unique(columns[col], return_inverse=True)
+        arrays[f"{col}.values"], arrays[f"{col}.codes"] = values, codes.astype(np.int32)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def read_archive(path: Path) -> Dict[str, np.ndarray]:
+    with np.load(path) as data:
+        out = {"timestamp": data["timestamp"].view("datetime64[us]")}
+        for col in FLOAT_COLUMNS:
+            out[col] = data[col]
+        for col in TEXT_COLUMNS:
+            out[col] = data[f"{col}.values"][data[f"{col}.codes"]]
+    return out
+
+
+def _archive_key(path: Path, stem: str):
+    """(first, end, n) from `{stem}.{first}-{last}[.n].npz`; end is exclusive (names keep seconds)."""
+    span, *counter = path.name[len(stem) + 1:-len(".npz")].split(".")
+    first, last = span.split("-")
+    parse = lambda tag: np.datetime64(f"{tag[:4]}-{tag[4:6]}-{tag[6:8]}T{tag[9:11]}:{tag[11:13]}:{tag[13:15]}", "s")
+    return parse(first), parse(last) + np.timedelta64(1, "s"), int(counter[0]) if counter else 0
+
+
+def read_trades(filename: str = DEFAULT_FILE, start=None, end=None) -> Dict[str, np.ndarray]:
+    """
+    Every logged trade as typed columns, oldest first: archives (skipped by name when outside
+    [start, end)), then the live CSV. start/end: anything np.datetime64 accepts.
+    """
+    filename = Path(filename)
+    start = np.datetime64(start, "us") if start is not None else None
+    end = np.datetime64(end, "us") if end is not None else None
+    parts = []
+    archives = {path: _archive_key(path, filename.stem)
+                for path in (filename.parent / ARCHIVE_DIR).glob(f"{filename.stem}.*.npz")}
+    for path in sorted(archives, key=archives.get):
+        first, last, _ = archives[path]
+        if (start is not None and last <= start) or (end is not None and first >= end):
+            continue
+        parts.append(read_archive(path))
+    if filename.exists():
+        with open(filename, newline='') as f:
+            rows = list(csv.reader(f))[1:]
+        parts.append(rows_to_columns(rows))
+    if not parts:
+        return rows_to_columns([])
+    out = {col: np.concatenate([p[col] for p in parts]) for col in COLUMNS}
+    mask = np.ones(len(out["timestamp"]), dtype=bool)
+    if start is not None:
+        mask &= out["timestamp"] >= start
+    if end is not None:
+        mask &= out["timestamp"] < end
+    return out if mask.all() else {col: values[mask] for col, values in out.items()}
+
+
+# ---------- writer ----------
 class TradeLogger:
-    def __init__(self, filename="storage/trade_history.csv"):
+    def __init__(self, filename=DEFAULT_FILE, max_bytes: int = DEFAULT_MAX_BYTES, rotate_daily: bool = True):
         self.filename = filename
+        self.path = Path(filename)
+        self.archive_dir = self.path.parent / ARCHIVE_DIR
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self._queue = queue.Queue()
+        self._fh = None
         self._init_file()
+        self._thread = threading.Thread(target=self._run, name="TradeLogger", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
     def _init_file(self):
         try:
             with open(self.filename, 'x', newline='') as f:
                 writer = csv.writer(f)
-                writer.writerow(['timestamp', 'symbol', 'side', 'entry_price', 'exit_price', 'pnl', 'duration_seconds', 'reason'])
+                writer.writerow(COLUMNS)
         except FileExistsError:
             pass
+        self._size = self.path.stat().st_size
+        has_rows = self._size > len(",".join(COLUMNS)) + 2
+        self._day = datetime.fromtimestamp(self.path.stat().st_mtime).date() if has_rows else None
+
     def log_trade(self, **kwargs):
-        with open(self.filename, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                datetime.now(),
-                kwargs.get('symbol'),
-                kwargs.get('side'),
-                kwargs.get('entry_price'),
-                kwargs.get('exit_price'),
-                kwargs.get('pnl'),
-                kwargs.get('duration'),
-                kwargs.get('reason')
-            ])
+        """Queue one row; the background writer appends it."""
+        self._queue.put([
+            datetime.now(),
+            kwargs.get('symbol'),
+            kwargs.get('side'),
+            kwargs.get('entry_price'),
+            kwargs.get('exit_price'),
+            kwargs.get('pnl'),
+            kwargs.get('duration'),
+            kwargs.get('reason')
+        ])
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"[TradeLogger] Write error ({len(batch)} rows lost): {e}", flush=True)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, rows: List[list]):
+        for row in rows:
+            day = row[0].date()
+            if self._day is not None and ((self.rotate_daily and day != self._day)
+                                          or self._size >= self.max_bytes):
+                self._rotate()
+            if self._fh is None:
+                self._fh = open(self.filename, 'a', newline='')
+                self._writer = csv.writer(self._fh)
+            self._size += self._writer.writerow(row)
+            self._day = day
+        self._fh.flush()  # one flush per batch
+
+    def _rotate(self):
+        """Move the live CSV's rows into a columnar archive and restart the CSV."""
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        with open(self.filename, newline='') as f:
+            rows = list(csv.reader(f))[1:]
+        if rows:
+            # archive first: a crash in between can duplicate rows, never lose them
+            path = write_archive(self.archive_dir, self.path.stem, rows_to_columns(rows))
+            print(f"[TradeLogger] Archived {len(rows)} trades to {path}", flush=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, 'w', newline='') as f:
+            csv.writer(f).writerow(COLUMNS)
+        os.replace(tmp, self.path)
+        self._size = self.path.stat().st_size
+        self._day = None
+
+    def flush(self):
+        """Block until every queued row is written."""
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+_logger = None
+
+
+def get_trade_logger(filename=DEFAULT_FILE, max_bytes: int = DEFAULT_MAX_BYTES,
+                     rotate_daily: bool = True) -> TradeLogger:
+    """The process-wide logger; the first call's settings win."""
+    global _logger
+    if _logger is None:
+        _logger = TradeLogger(filename, max_bytes, rotate_daily)
+    return _logger
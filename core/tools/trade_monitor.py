@@ -2,11 +2,13 @@
 TradeMonitor — يراقب الصفقات المفتوحة في كل دورة ويغلقها عند SL أو TP.
 يُستدعى من runner.py في بداية كل دورة مسح.
 """
-import math
+import time
 from datetime import datetime
+from typing import Dict, Optional
 from core.brain.memory import Memory
 from core.tools.binance_futures import BinanceFutures
-from core.tools.trade_logger import TradeLogger
+from core.tools.symbol_registry import get_symbol_registry
+from core.tools.trade_logger import get_trade_logger
 
 
 class TradeMonitor:
@@ -17,7 +19,8 @@ class TradeMonitor:
             policy.get('binance_api_key'),
             policy.get('binance_api_secret')
         )
-        self.logger = TradeLogger()
+        self.logger = get_trade_logger()
+        self.stream = None  # optional MarketStream: mark prices without REST calls
 
     def check_all_positions(self):
         """
@@ -32,14 +35,25 @@ class TradeMonitor:
 
         print(f"[TradeMonitor] Checking {len(open_positions)} open position(s)...", flush=True)
 
+        # لقطة واحدة لكل دورة: طلب positionRisk واحد + طلب أسعار واحد، مهما كان عدد الصفقات
+        positions = self._fetch_positions()
+        if positions is None:
+            # فشل في جلب البيانات — تخطى هذه الدورة
+            return
+        prices = None
+
         for symbol, pos in open_positions.items():
             try:
-                self._check_position(symbol, pos)
+                position_amt = positions.get(symbol, 0.0)
+                if position_amt and prices is None:
+                    prices = self._fetch_prices(open_positions.keys())
+                self._check_position(symbol, pos, position_amt, (prices or {}).get(symbol))
             except Exception as e:
                 print(f"[TradeMonitor] Error checking {symbol}: {e}", flush=True)
 
-    def _check_position(self, symbol: str, pos: dict):
-        """يتحقق من صفقة واحدة ويغلقها إذا لزم."""
+    def _check_position(self, symbol: str, pos: dict, binance_position: float,
+                        current_price: Optional[float]):
+        """يتحقق من صفقة واحدة مقابل اللقطة ويغلقها إذا لزم."""
         side = pos.get('side', 'BUY')
         entry_price = float(pos.get('entry_price', 0))
         sl_price = float(pos.get('sl_price', 0))
@@ -48,25 +62,16 @@ class TradeMonitor:
         leverage = int(pos.get('leverage', 15))
 
         # 1. تحقق من أن الصفقة لا تزال مفتوحة في بينانس
-        binance_position = self._get_binance_position(symbol)
-
-        if binance_position is None:
-            # فشل في جلب البيانات — تخطى هذه الدورة
-            return
-
         if binance_position == 0:
             # الصفقة أُغلقت من بينانس (SL/TP أو يدوياً)
             print(f"[TradeMonitor] {symbol}: Position already closed on Binance. Cleaning up.", flush=True)
             self._finalize_closed_position(symbol, pos, entry_price, side, quantity, leverage, "CLOSED_EXTERNALLY")
             return
 
-        # 2. جلب السعر الحالي
-        ticker = self.client._get("/fapi/v1/ticker/price", {"symbol": symbol})
-        if not ticker:
+        # 2. السعر الحالي من اللقطة
+        if current_price is None:
             print(f"[TradeMonitor] {symbol}: Cannot fetch price, skipping.", flush=True)
             return
-
-        current_price = float(ticker['price'])
         direction = "LONG" if side == "BUY" else "SHORT"
 
         # حساب PnL الحالي
@@ -96,24 +101,44 @@ class TradeMonitor:
                 self._close_position(symbol, pos, current_price, "TAKE_PROFIT")
                 return
 
-    def _get_binance_position(self, symbol: str):
+    def _fetch_positions(self) -> Optional[Dict[str, float]]:
         """
-        يجلب حجم الـ position الحالي من بينانس.
-        يرجع: float (حجم الـ position)، أو None إذا فشل الطلب.
+        يجلب أحجام كل الـ positions من بينانس بطلب واحد غير مفلتر.
+        يرجع: {symbol: abs(positionAmt)} (الرمز الغائب = 0)، أو None إذا فشل الطلب.
         """
         try:
-            positions = self.client._get("/fapi/v2/positionRisk", {"symbol": symbol}, signed=True)
-            if not positions:
+            positions = self.client._get("/fapi/v2/positionRisk", signed=True)
+            if not positions or not isinstance(positions, list):
                 return None
+            sizes: Dict[str, float] = {}
             for p in positions:
-                if p.get('symbol') == symbol:
-                    amt = float(p.get('positionAmt', 0))
-                    return abs(amt)
-            return 0.0
+                symbol = p.get('symbol')
+                if symbol:
+                    # hedge mode returns a LONG and a SHORT row per symbol
+                    sizes[symbol] = sizes.get(symbol, 0.0) + abs(float(p.get('positionAmt', 0)))
+            return sizes
         except Exception as e:
-            print(f"[TradeMonitor] positionRisk error for {symbol}: {e}", flush=True)
+            print(f"[TradeMonitor] positionRisk error: {e}", flush=True)
             return None
 
+    def _fetch_prices(self, symbols) -> Dict[str, float]:
+        """
+        أسعار المارك لكل الرموز: من البث المحلي إن كانت حديثة لكل الرموز المطلوبة،
+        وإلا من طلب premiumIndex واحد لكل السوق.
+        """
+        if self.stream:
+            prices = {s: self.stream.mark_price(s) for s in symbols}
+            if all(p is not None for p in prices.values()):
+                return prices
+        try:
+            marks = self.client._get("/fapi/v1/premiumIndex")
+            if not isinstance(marks, list):
+                return {}
+            return {m['symbol']: float(m['markPrice']) for m in marks if m.get('markPrice')}
+        except Exception as e:
+            print(f"[TradeMonitor] premiumIndex error: {e}", flush=True)
+            return {}
+
     def _close_position(self, symbol: str, pos: dict, exit_price: float, reason: str):
         """يغلق الصفقة في بينانس ويحدّث الذاكرة."""
         side = pos.get('side', 'BUY')
@@ -163,6 +188,17 @@ class TradeMonitor:
 
         # تحديث PnL اليومي
         self.memory.update_pnl(pnl)
+        self.memory.record_trade({
+            "ts": int(time.time() * 1000),
+            "symbol": symbol,
+            "side": side,
+            "strategy": pos.get('strategy'),
+            "entry_price": entry_price,
+            "exit_price": exit_price,
+            "quantity": quantity,
+            "pnl": round(pnl, 4),
+            "reason": reason,
+        })
 
         # تسجيل الصفقة في السجل
         try:
@@ -187,16 +223,9 @@ class TradeMonitor:
     def _round_quantity(self, symbol: str, quantity: float) -> float:
         """يقرّب الكمية لأقرب step size مسموح."""
         try:
-            info = self.client._get("/fapi/v1/exchangeInfo")
+            info = get_symbol_registry().get(symbol, self.client)
             if info:
-                for s in info.get('symbols', []):
-                    if s['symbol'] == symbol:
-                        for f in s.get('filters', []):
-                            if f['filterType'] == 'LOT_SIZE':
-                                step = float(f['stepSize'])
-                                quantity = math.floor(quantity / step) * step
-                                decimals = len(str(step).rstrip('0').split('.')[-1]) if '.' in str(step) else 0
-                                return round(quantity, decimals)
+                return info.round_quantity(quantity)
         except Exception:
             pass
         return round(quantity, 3)
@@ -17,11 +17,17 @@ except Exception as _e:
     print(f'[OUTBOUND IP] Could not detect: {_e}', flush=True)
 
 from core.brain.memory import Memory
+from core.brain.sqlite_memory import SQLiteMemory
 from core.tools.risk_governor import RiskGovernor
 from core.tools.market_scan import MarketScanner
 from core.tools.weighted_brain import WeightedBrain
 from core.tools.order_router import OrderRouter
 from core.tools.trade_monitor import TradeMonitor
+from core.tools.binance_futures import get_shared_session, DEFAULT_POOL_SIZE
+from core.tools.market_stream import MarketStream
+from core.tools.strategy_registry import StrategyRegistry
+from core.tools.derivatives_data import get_derivatives_data
+from core.tools.trade_logger import get_trade_logger, DEFAULT_MAX_BYTES
 
 
 def load_policy():
@@ -48,8 +54,23 @@ def load_policy():
 def main_loop():
     print(f"[{datetime.now()}] MohammedCore Worker started.", flush=True)
 
-    memory = Memory(data_path=Path("storage/state.json"))
     policy = load_policy()
+    memory_cfg = policy.get('memory', {})
+    memory_args = dict(fsync=memory_cfg.get('fsync', 'always'), snapshot_every=memory_cfg.get('snapshot_every', 500))
+    if memory_cfg.get('backend', 'json') == 'sqlite':
+        # trade history kept and indexed in SQLite; an existing state.json is imported once
+        memory = SQLiteMemory(data_path=Path("storage/state.db"), migrate_from=Path("storage/state.json"),
+                              **memory_args)
+    else:
+        memory = Memory(data_path=Path("storage/state.json"), **memory_args)
+
+    # One buffered trade log shared by ExecutionGuard and TradeMonitor
+    log_cfg = policy.get('trade_log', {})
+    get_trade_logger(max_bytes=log_cfg.get('max_bytes', DEFAULT_MAX_BYTES),
+                     rotate_daily=log_cfg.get('rotate_daily', True))
+
+    # One keep-alive connection pool for every Binance client in this process
+    get_shared_session(policy.get('http_pool_size', DEFAULT_POOL_SIZE))
 
     print(f"[{datetime.now()}] API Key loaded: {'YES' if policy.get('binance_api_key') else 'NO'}", flush=True)
     print(f"[{datetime.now()}] Max positions: {policy.get('max_open_positions', 10)}", flush=True)
@@ -59,41 +80,47 @@ def main_loop():
     governor = RiskGovernor(policy, memory)
     router = OrderRouter(policy, memory)
     monitor = TradeMonitor(memory, policy)   # ← وحدة المتابعة
-
-    from core.tools.momentum_strategy import MomentumStrategy
-    from core.tools.pattern_strategy import PatternStrategy
+    strategies = StrategyRegistry(policy)    # ← built once, configured by strategy_weights
+
+    # Funding for every symbol in one call + OI history for the shortlist, polled in the background
+    if 'funding_oi' in strategies.specs:
+        tracked = lambda: scanner.universe.top_symbols() if scanner.universe else []
+        get_derivatives_data().start(tracked, policy.get('derivatives', {}).get('poll_seconds', 300))
+
+    # Optional WebSocket ingestion: scanner and monitor then read local state
+    stream_cfg = policy.get('market_stream', {})
+    if stream_cfg.get('enabled', False):
+        scanner._load_valid_symbols()
+        stream = MarketStream(scanner.candle_store, scanner._valid_symbols,
+                              interval=stream_cfg.get('interval', '15m'))
+        stream.start()
+        scanner.stream = stream
+        monitor.stream = stream
+        print(f"[{datetime.now()}] Market stream started for {len(scanner._valid_symbols)} symbols", flush=True)
 
     while True:
         try:
             # ═══════════════════════════════════════════
             # الخطوة 1: تابع الصفقات المفتوحة أولاً
             # ═══════════════════════════════════════════
-            monitor.check_all_positions()
+            # The monitor's saves (PnL, closes, stats) coalesce into one journal write; opening
+            # writes are never batched: add_open_position reaches disk before route() returns
+            with memory.batch():
+                monitor.check_all_positions()
 
             # ═══════════════════════════════════════════
             # الخطوة 2: امسح السوق وافتح صفقات جديدة
             # ═══════════════════════════════════════════
             print(f"[{datetime.now()}] Scanning market...", flush=True)
-            candidates = scanner.scan_for_candidates()
-
-            if not candidates:
-                print(f"[{datetime.now()}] No candidates found. Waiting for next cycle.", flush=True)
-                time.sleep(60)
-                continue
-
-            momentum_strategy = MomentumStrategy()
-            pattern_strategy = PatternStrategy()
-
             placed = 0
-            for candidate in candidates:
+            seen = 0
+            # Candidates stream in while the rest of the universe is still being scanned;
+            # every active strategy runs concurrently on each one
+            for candidate, scores in strategies.evaluate(scanner.iter_candidates()):
+                seen += 1
                 symbol = candidate['symbol']
                 print(f"[{datetime.now()}] Analyzing candidate: {symbol}", flush=True)
 
-                scores = [
-                    momentum_strategy.analyze(candidate['candles']),
-                    pattern_strategy.analyze(candidate['candles'])
-                ]
-
                 brain_dump = brain.evaluate(scores)
                 signal = governor.validate_trade(symbol, brain_dump, candidate)
 
@@ -110,6 +137,11 @@ def main_loop():
                 else:
                     print(f"[{datetime.now()}] ❌ Order FAILED for {symbol}: {result['status']}", flush=True)
 
+            if not seen:
+                print(f"[{datetime.now()}] No candidates found. Waiting for next cycle.", flush=True)
+                time.sleep(60)
+                continue
+
             open_count = len(memory.state.get('open_positions', {}))
             print(f"[{datetime.now()}] Scan complete. Placed: {placed} | Open positions: {open_count}", flush=True)
             time.sleep(policy.get('scanner', {}).get('scan_interval_seconds', 300))
@@ -12,6 +12,7 @@ from core.tools.risk_governor import RiskGovernor, TradeSignal
 from core.tools.momentum_engine import MomentumEngine
 from core.tools.weighted_brain import WeightedBrain
 from core.tools.strategy_scores import StrategyScore
+from core.tools.binance_futures import BinanceFutures, make_session
 
 
 POLICY = {
@@ -154,6 +155,1516 @@ class TestRiskGovernor(unittest.TestCase):
         print(f"[PASS] test_reject_daily_loss: approved={signal.approved}, reason={signal.reason}")
 
 
+class TestBinanceTransport(unittest.TestCase):
+    def test_shared_session_reused(self):
+        a = BinanceFutures("K", "S")
+        b = BinanceFutures()
+        self.assertIs(a.session, b.session)
+        private = BinanceFutures(pool_size=4)
+        self.assertIsNot(private.session, a.session)
+        print("[PASS] test_shared_session_reused")
+
+    def test_request_timing_recorded(self):
+        from unittest.mock import MagicMock
+        session = MagicMock()
+        session.request.return_value = MagicMock(ok=True, status_code=200, headers={}, content=b'{"price": "1.0"}')
+        client = BinanceFutures("K", "S", session=session)
+        client.get_ticker("BTCUSDT")
+        client.get_ticker("ETHUSDT")
+        self.assertEqual(client.last_request["endpoint"], "/fapi/v1/ticker/price")
+        summary = client.timing_summary()
+        self.assertEqual(summary["/fapi/v1/ticker/price"]["count"], 2)
+        self.assertEqual(summary["/fapi/v1/ticker/price"]["errors"], 0)
+        print(f"[PASS] test_request_timing_recorded: {summary}")
+
+    def test_5xx_retries_pass_through_limiter(self):
+        from unittest.mock import MagicMock
+        busy = MagicMock(ok=False, status_code=503, headers={}, text="busy")
+        ok = MagicMock(ok=True, status_code=200, headers={}, content=b'{"price": "1.0"}')
+        session, limiter = MagicMock(), MagicMock()
+        session.request.side_effect = [busy, busy, ok]
+        client = BinanceFutures("K", "S", session=session, limiter=limiter, backoff_factor=0)
+        self.assertEqual(client.get_ticker("BTCUSDT"), {"price": "1.0"})
+        self.assertEqual(limiter.acquire.call_count, 3)  # every attempt is metered
+        self.assertEqual(client.timing_summary()["/fapi/v1/ticker/price"]["errors"], 2)
+        session.request.side_effect = [busy, ok]
+        limiter.reset_mock()
+        self.assertIsNone(client._post("/fapi/v1/order", {"symbol": "BTCUSDT"}))  # orders never replayed
+        self.assertEqual(limiter.acquire.call_count, 1)
+        adapter = make_session(pool_size=1).get_adapter("https://fapi.binance.com")
+        self.assertEqual((adapter.max_retries.status, adapter.max_retries.read), (0, 0))
+        print("[PASS] test_5xx_retries_pass_through_limiter")
+
+    def test_signed_retries_are_resigned(self):
+        from unittest.mock import MagicMock
+        busy = MagicMock(ok=False, status_code=503, headers={}, text="busy")
+        ok = MagicMock(ok=True, status_code=200, headers={}, content=b'{"ok": true}')
+        session = MagicMock()
+        session.request.side_effect = [busy, ok]
+        client = BinanceFutures("K", "S", session=session, limiter=MagicMock(), backoff_factor=0)
+        client._get_timestamp = MagicMock(side_effect=[1000, 7000])  # the clock moves during the wait
+        params = {"symbol": "BTCUSDT"}
+        client._request("GET", "/fapi/v2/account", params, signed=True)
+        sent = [c.kwargs["params"] for c in session.request.call_args_list]
+        self.assertEqual([p["timestamp"] for p in sent], [1000, 7000])
+        self.assertNotEqual(sent[0]["signature"], sent[1]["signature"])
+        self.assertEqual(params, {"symbol": "BTCUSDT"})  # the caller's params stay unsigned
+        print("[PASS] test_signed_retries_are_resigned")
+
+
+class TestAsyncBinanceFutures(unittest.TestCase):
+    def test_candles_fan_out_is_bounded(self):
+        import asyncio
+        from aiohttp import web
+        from core.tools.async_binance_futures import AsyncBinanceFutures
+
+        state = {"in_flight": 0, "peak": 0}
+
+        async def klines(request):
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            await asyncio.sleep(0.01)
+            state["in_flight"] -= 1
+            return web.json_response([[1, "1.0", "2.0", "0.5", "1.5", "10.0", 2]])
+
+        async def run():
+            app = web.Application()
+            app.router.add_get("/fapi/v1/klines", klines)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            try:
+                async with AsyncBinanceFutures(max_concurrency=5) as client:
+                    client.base_url = f"http://127.0.0.1:{port}"
+                    return await client.get_candles_many([f"C{i}USDT" for i in range(30)])
+            finally:
+                await runner.cleanup()
+
+        result = asyncio.run(run())
+        self.assertEqual(len(result), 30)
+        self.assertEqual(result["C0USDT"][0]["close"], 1.5)
+        self.assertLessEqual(state["peak"], 5)
+        print(f"[PASS] test_candles_fan_out_is_bounded: peak in-flight={state['peak']}")
+
+    def test_client_reused_across_event_loops(self):
+        import asyncio
+        from aiohttp import web
+        from core.tools.async_binance_futures import AsyncBinanceFutures
+
+        async def klines(request):
+            await asyncio.sleep(0.01)
+            return web.json_response([[1, "1.0", "2.0", "0.5", "1.5", "10.0", 2]])
+
+        client = AsyncBinanceFutures(max_concurrency=2)
+
+        async def run():  # like BinanceFutures.get_candles_many: a fresh asyncio.run per call
+            app = web.Application()
+            app.router.add_get("/fapi/v1/klines", klines)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            client.base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+            try:
+                async with client:  # the semaphore is contended, so it binds to this loop
+                    return await client.get_candles_many([f"C{i}USDT" for i in range(6)])
+            finally:
+                await runner.cleanup()
+
+        self.assertEqual(len(asyncio.run(run())), 6)
+        self.assertEqual(len(asyncio.run(run())), 6)
+        print("[PASS] test_client_reused_across_event_loops")
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        from core.tools.rate_limiter import RateLimiter
+        self.limiter = RateLimiter(weight_per_minute=100, headroom=1.0, clock=lambda: self.now[0])
+
+    def test_endpoint_weights(self):
+        from core.tools.rate_limiter import endpoint_weight
+        self.assertEqual(endpoint_weight("GET", "/fapi/v1/klines", {"symbol": "BTCUSDT", "limit": 100}), 2)
+        self.assertEqual(endpoint_weight("GET", "/fapi/v1/klines", {"symbol": "BTCUSDT", "limit": 1500}), 10)
+        self.assertEqual(endpoint_weight("GET", "/fapi/v1/ticker/price"), 2)
+        self.assertEqual(endpoint_weight("GET", "/fapi/v1/ticker/price", {"symbol": "BTCUSDT"}), 1)
+        self.assertEqual(endpoint_weight("GET", "/fapi/v1/exchangeInfo"), 40)
+        print("[PASS] test_endpoint_weights")
+
+    def test_budget_exhaustion_waits(self):
+        self.assertEqual(self.limiter.reserve("GET", "/fapi/v1/exchangeInfo"), 0.0)
+        self.assertEqual(self.limiter.reserve("GET", "/fapi/v1/exchangeInfo"), 0.0)
+        # 80 of 100 spent; the next 40 overdraws by 20 → 12s at 100/60s refill
+        self.assertAlmostEqual(self.limiter.reserve("GET", "/fapi/v1/exchangeInfo"), 12.0)
+        print("[PASS] test_budget_exhaustion_waits")
+
+    def test_header_sync_and_retry_after(self):
+        self.limiter.update_from_response(200, {"X-MBX-USED-WEIGHT-1M": "99"})
+        self.assertGreater(self.limiter.reserve("GET", "/fapi/v1/klines", {"limit": 100}), 0)
+        self.limiter.update_from_response(429, {"Retry-After": "30"})
+        self.now[0] += 10
+        self.assertGreaterEqual(self.limiter.reserve("GET", "/fapi/v1/ticker/price", {"symbol": "X"}), 20.0)
+        print("[PASS] test_header_sync_and_retry_after")
+
+    def test_orders_metered_separately(self):
+        from core.tools.rate_limiter import RateLimiter
+        limiter = RateLimiter(orders_per_10s=2, headroom=1.0, clock=lambda: self.now[0])
+        self.assertEqual(limiter.reserve("POST", "/fapi/v1/order"), 0.0)
+        self.assertEqual(limiter.reserve("POST", "/fapi/v1/order"), 0.0)
+        self.assertGreater(limiter.reserve("POST", "/fapi/v1/order"), 0.0)
+        self.assertEqual(limiter.reserve("POST", "/fapi/v1/leverage"), 0.0)
+        print("[PASS] test_orders_metered_separately")
+
+
+class TestSymbolRegistry(unittest.TestCase):
+    EXCHANGE_INFO = {"symbols": [
+        {"symbol": "BTCUSDT", "status": "TRADING", "contractType": "PERPETUAL", "quoteAsset": "USDT",
+         "filters": [{"filterType": "LOT_SIZE", "stepSize": "0.001", "minQty": "0.001"},
+                     {"filterType": "PRICE_FILTER", "tickSize": "0.10"},
+                     {"filterType": "MIN_NOTIONAL", "notional": "100"}]},
+        {"symbol": "OLDUSDT", "status": "SETTLING", "contractType": "PERPETUAL", "quoteAsset": "USDT",
+         "filters": [{"filterType": "LOT_SIZE", "stepSize": "1", "minQty": "1"}]},
+    ]}
+
+    def test_loaded_once_and_quantized(self):
+        from unittest.mock import MagicMock
+        from core.tools.symbol_registry import SymbolRegistry
+        client = MagicMock()
+        client._get.return_value = self.EXCHANGE_INFO
+        registry = SymbolRegistry()
+        btc = registry.get("BTCUSDT", client)
+        self.assertEqual(btc.round_quantity(0.0123456), 0.012)
+        self.assertEqual(btc.round_price(65000.37), 65000.3)
+        self.assertEqual(btc.min_notional, 100.0)
+        self.assertEqual(registry.round_quantity("OLDUSDT", 7.9, client), 7)
+        self.assertEqual(registry.symbols(client, quote_asset="USDT"), {"BTCUSDT"})
+        self.assertEqual(client._get.call_count, 1)
+        print("[PASS] test_loaded_once_and_quantized")
+
+    def test_unknown_symbol_refresh_is_throttled(self):
+        from unittest.mock import MagicMock
+        from core.tools.symbol_registry import SymbolRegistry
+        client = MagicMock()
+        client._get.return_value = self.EXCHANGE_INFO
+        registry = SymbolRegistry(min_refresh_interval=60)
+        registry.get("BTCUSDT", client)
+        self.assertIsNone(registry.get("NEWUSDT", client))
+        self.assertEqual(client._get.call_count, 1)
+        print("[PASS] test_unknown_symbol_refresh_is_throttled")
+
+
+class TestCandleSeries(unittest.TestCase):
+    def test_dict_compat_and_views(self):
+        from core.tools.candle_series import CandleSeries
+        raw = [[i * 60000, "1.0", str(2.0 + i), "0.5", str(1.5 + i), "10.0", i * 60000 + 59999] for i in range(5)]
+        series = CandleSeries.from_klines(raw, "BTCUSDT", "1m")
+        self.assertEqual(len(series), 5)
+        self.assertEqual(series[-1]["close"], 5.5)
+        self.assertEqual(series[0]["open_time"], 0)
+        window = series[1:3]
+        self.assertEqual(len(window), 2)
+        self.assertTrue(window.close.base is series.close or window.close.base is series.close.base)
+        self.assertEqual([c["close"] for c in series][:2], [1.5, 2.5])
+        self.assertFalse(CandleSeries.empty())
+        print("[PASS] test_dict_compat_and_views")
+
+    def test_strategies_match_on_series(self):
+        from core.tools.candle_series import CandleSeries
+        from core.tools.pattern_strategy import PatternStrategy
+        from core.tools.indicator_strategy import RSIStrategy
+        candles = make_candles(60, trend="SIDEWAYS")
+        series = CandleSeries.from_dicts(candles)
+        self.assertEqual(MomentumEngine().analyze(candles), MomentumEngine().analyze(series))
+        self.assertEqual(PatternStrategy().analyze(candles), PatternStrategy().analyze(series))
+        self.assertEqual(RSIStrategy().analyze(candles), RSIStrategy().analyze(series))
+        print("[PASS] test_strategies_match_on_series")
+
+
+class TestFastDecode(unittest.TestCase):
+    def test_klines_decoded_into_columns(self):
+        from core.tools.fast_decode import decode_klines
+        payload = b'[[1000,"1.5","2.0","1.0","1.7","100.0",1999,"0",3,"1","1","0"],' \
+                  b'[2000,"1.7","2.1","1.6","2.0","50.5",2999,"0",3,"1","1","0"]]'
+        series = decode_klines(payload, "BTCUSDT", "1s")
+        self.assertEqual(series.close.tolist(), [1.7, 2.0])
+        self.assertEqual(series.open_time.dtype.name, "int64")
+        self.assertEqual(series[1]["volume"], 50.5)
+        self.assertFalse(decode_klines(b"[]"))
+        print("[PASS] test_klines_decoded_into_columns")
+
+    def test_exchange_info_keeps_registry_fields_only(self):
+        import json
+        from core.tools.fast_decode import decode_exchange_info
+        doc = {"symbols": [{"symbol": "BTCUSDT", "status": "TRADING", "contractType": "PERPETUAL",
+                            "quoteAsset": "USDT", "orderTypes": ["LIMIT", "MARKET"],
+                            "filters": [{"filterType": "LOT_SIZE", "stepSize": "0.001", "maxQty": "1000"},
+                                        {"filterType": "MAX_NUM_ORDERS", "limit": 200}]}],
+               "assets": [{"asset": "USDT"}]}
+        slim = decode_exchange_info(json.dumps(doc).encode())
+        self.assertNotIn("assets", slim)
+        self.assertNotIn("orderTypes", slim["symbols"][0])
+        self.assertEqual(slim["symbols"][0]["filters"], [{"filterType": "LOT_SIZE", "stepSize": "0.001"}])
+        print("[PASS] test_exchange_info_keeps_registry_fields_only")
+
+
+class FakeKlineClient:
+    """Serves synthetic 1m klines up to the candle forming at `now`."""
+    def __init__(self, now_ms):
+        self.now_ms = now_ms
+        self.calls = []
+
+    def get_candles(self, symbol, interval='1m', limit=100, start_time=None, end_time=None):
+        from core.tools.candle_series import CandleSeries
+        self.calls.append({"limit": limit, "start_time": start_time})
+        last_open = self.now_ms[0] // 60000 * 60000
+        first = start_time if start_time is not None else last_open - (limit - 1) * 60000
+        times = list(range(first, last_open + 1, 60000))[:limit]
+        # the forming candle's close tracks the clock so in-place updates are visible
+        closes = [t / 60000 + (self.now_ms[0] - t) / 1e6 for t in times]
+        return CandleSeries(times, closes, closes, closes, closes, [1.0] * len(times),
+                            [t + 59999 for t in times], symbol=symbol, interval=interval)
+
+
+class TestRollingCandleStore(unittest.TestCase):
+    def test_ring_wraps_contiguously(self):
+        from core.tools.candle_store import CandleRing
+        from core.tools.candle_series import CandleSeries
+        ring = CandleRing(4)
+        for t in range(6):
+            ring.extend(CandleSeries([t], [t], [t], [t], [float(t)], [1], [t]))
+        self.assertEqual(ring.series().close.tolist(), [2.0, 3.0, 4.0, 5.0])
+        ring.extend(CandleSeries([5], [5], [5], [5], [9.0], [1], [5]))
+        self.assertEqual(ring.series(2, copy=False).close.tolist(), [4.0, 9.0])
+        print("[PASS] test_ring_wraps_contiguously")
+
+    def test_incremental_refresh(self):
+        from core.tools.candle_store import RollingCandleStore
+        now = [100 * 60000 + 5000]
+        client = FakeKlineClient(now)
+        store = RollingCandleStore(client, capacity=50, clock=lambda: now[0] / 1000)
+        first = store.get("BTCUSDT", "1m", 20)
+        self.assertEqual(len(first), 20)
+        self.assertEqual(client.calls[-1], {"limit": 20, "start_time": None})
+        store.get("BTCUSDT", "1m", 20)
+        self.assertEqual(len(client.calls), 1)  # same candle still forming → no request
+        now[0] += 2 * 60000
+        latest = store.get("BTCUSDT", "1m", 20)
+        self.assertEqual(client.calls[-1], {"limit": 3, "start_time": 100 * 60000})
+        self.assertEqual(latest.open_time[-1], 102 * 60000)
+        self.assertEqual(latest.close[-3], 100 + 125000 / 1e6)  # old forming candle finalized in place
+        self.assertTrue((latest.open_time[1:] - latest.open_time[:-1] == 60000).all())
+        print("[PASS] test_incremental_refresh")
+
+
+class TestMarketStream(unittest.TestCase):
+    def test_replay_reconnect_and_resubscribe(self):
+        import asyncio
+        from aiohttp import web, WSMsgType
+        from core.tools.candle_store import RollingCandleStore
+        from core.tools.market_stream import MarketStream
+
+        now = [100 * 60000 + 5000]
+        client = FakeKlineClient(now)
+        store = RollingCandleStore(client, capacity=50, clock=lambda: now[0] / 1000)
+
+        def kline(close):
+            return {"stream": "btcusdt@kline_1m", "data": {"e": "kline", "k": {
+                "t": 100 * 60000, "T": 100 * 60000 + 59999, "s": "BTCUSDT", "i": "1m",
+                "o": "100", "h": "125", "l": "99", "c": str(close), "v": "5"}}}
+        mark = {"stream": "!markPrice@arr", "data": [
+            {"e": "markPriceUpdate", "E": 1, "s": "BTCUSDT", "p": "123.4", "r": "0.0001", "T": 2}]}
+        # First session drops after two frames; the second must resubscribe and keep streaming
+        sessions = [[kline(123.5), mark], [kline(124.0)]]
+        subscriptions = []
+
+        async def handler(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            msg = await ws.receive()
+            self.assertEqual(msg.type, WSMsgType.TEXT)
+            subscriptions.append(json.loads(msg.data))
+            frames = sessions.pop(0) if sessions else []
+            for frame in frames:
+                await ws.send_str(json.dumps(frame))
+            if sessions:
+                await ws.close()
+            else:
+                async for _ in ws:  # hold the connection until the client leaves
+                    pass
+            return ws
+
+        async def run():
+            app = web.Application()
+            app.router.add_get("/stream", handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            stream = MarketStream(store, ["BTCUSDT"], interval="1m", url=f"ws://127.0.0.1:{port}/stream",
+                                  reconnect_delay=0.05)
+            task = asyncio.create_task(stream.run())
+            try:
+                for _ in range(200):
+                    await asyncio.sleep(0.01)
+                    ring = store.ring("BTCUSDT", "1m")
+                    if stream.stats["connects"] >= 2 and ring and ring.series(1).close[-1] == 124.0:
+                        break
+                return stream, store.is_live("BTCUSDT", "1m")
+            finally:
+                stream._stop.set()
+                await task
+                await runner.cleanup()
+
+        stream, live = asyncio.run(run())
+        self.assertEqual(len(subscriptions), 2)
+        self.assertEqual(subscriptions[1]["params"], ["btcusdt@kline_1m", "!markPrice@arr"])
+        self.assertTrue(live)
+        self.assertEqual(stream.mark_price("BTCUSDT"), 123.4)
+        self.assertEqual(len(client.calls), 1)  # one REST backfill; the reconnect found nothing missing
+        latest = store.get("BTCUSDT", "1m", 20)
+        self.assertEqual(len(client.calls), 1)  # live key → served from the ring
+        self.assertEqual(latest.close[-1], 124.0)
+        print("[PASS] test_replay_reconnect_and_resubscribe")
+
+
+class TestTradeMonitorSnapshot(unittest.TestCase):
+    def test_one_snapshot_per_tick(self):
+        import tempfile
+        from unittest.mock import MagicMock
+        from core.tools.trade_monitor import TradeMonitor
+        tmp = tempfile.NamedTemporaryFile(suffix=".json", delete=False)
+        tmp.close()
+        os.unlink(tmp.name)
+        memory = Memory(Path(tmp.name))
+        for symbol in ["AUSDT", "BUSDT", "CUSDT", "DUSDT"]:
+            memory.add_open_position(symbol, {"side": "BUY", "quantity": 1.0, "entry_price": 100.0,
+                                              "sl_price": 90.0, "tp_price": 110.0, "leverage": 15})
+        monitor = TradeMonitor(memory, POLICY)
+        # CUSDT is missing from positionRisk → closed on the exchange; DUSDT hit TP
+        monitor.client._get = MagicMock(side_effect=lambda endpoint, params=None, signed=False:
+            [{"symbol": s, "positionAmt": "1.0"} for s in ("AUSDT", "BUSDT", "DUSDT")] if "positionRisk" in endpoint else
+            [{"symbol": s, "markPrice": p} for s, p in (("AUSDT", "101"), ("BUSDT", "99"), ("DUSDT", "111"))]
+            if "premiumIndex" in endpoint else None)
+        monitor.client._post = MagicMock(return_value={"orderId": 1})
+        monitor.logger.log_trade = MagicMock()
+        monitor.check_all_positions()
+        endpoints = [c.args[0] for c in monitor.client._get.call_args_list]
+        self.assertEqual(endpoints.count("/fapi/v2/positionRisk"), 1)
+        self.assertEqual(endpoints.count("/fapi/v1/premiumIndex"), 1)
+        self.assertNotIn("/fapi/v1/ticker/price", endpoints)
+        self.assertEqual(sorted(memory.state["open_positions"]), ["AUSDT", "BUSDT"])
+        os.unlink(tmp.name)
+        print("[PASS] test_one_snapshot_per_tick")
+
+
+class TestMarketScanner(unittest.TestCase):
+    def test_pooled_scan_streams_candidates(self):
+        import threading
+        import time
+        from unittest.mock import MagicMock
+        from core.tools.market_scan import MarketScanner
+        scanner = MarketScanner({**POLICY, "scanner": {"entry_threshold": 1.0, "max_workers": 4,
+                                                          "shortlist_size": 0}})
+        symbols = [f"S{i}USDT" for i in range(12)]
+        scanner._valid_symbols = set(symbols)
+        scanner.client.get_all_tickers = MagicMock(return_value=[{"symbol": s} for s in symbols])
+        state = {"in_flight": 0, "peak": 0}
+        lock = threading.Lock()
+
+        def get(symbol, interval, limit):
+            with lock:
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+            time.sleep(0.02)
+            with lock:
+                state["in_flight"] -= 1
+            return [{"close": 1.0}] * 30
+
+        scanner.candle_store.get = get
+        scanner.momentum_engine.analyze = lambda candles: {"score": 2.0, "direction": "LONG"}
+        stream = scanner.iter_candidates()
+        first = next(stream)  # available before the rest of the universe is done
+        self.assertIn(first["symbol"], symbols)
+        rest = list(stream)
+        self.assertEqual(len(rest) + 1, len(symbols))
+        self.assertEqual(state["peak"], 4)
+        print(f"[PASS] test_pooled_scan_streams_candidates: peak workers={state['peak']}")
+
+
+class TestMarketUniverse(unittest.TestCase):
+    TICKERS = [
+        # symbol, quoteVolume, priceChangePercent, high, low, last
+        {"symbol": "BIGUSDT", "quoteVolume": "9e9", "priceChangePercent": "4.0",
+         "highPrice": "105", "lowPrice": "95", "lastPrice": "100"},
+        {"symbol": "MIDUSDT", "quoteVolume": "5e8", "priceChangePercent": "-9.0",
+         "highPrice": "12", "lowPrice": "9", "lastPrice": "10"},
+        {"symbol": "DEADUSDT", "quoteVolume": "1e4", "priceChangePercent": "0.1",
+         "highPrice": "1.001", "lowPrice": "1.0", "lastPrice": "1.0"},
+        {"symbol": "BTCDOMUSDT", "quoteVolume": "1e10", "priceChangePercent": "20",
+         "highPrice": "2", "lowPrice": "1", "lastPrice": "1.5"},
+    ]
+
+    def test_shortlist_ranks_and_filters(self):
+        from unittest.mock import MagicMock
+        from core.tools.market_universe import MarketUniverse, UniverseConfig
+        from core.tools.symbol_registry import SymbolRegistry
+        info = {"symbols": [{"symbol": s, "status": "TRADING", "contractType": "PERPETUAL", "quoteAsset": "USDT"}
+                            for s in ("BIGUSDT", "MIDUSDT", "DEADUSDT")]}
+        client = MagicMock()
+        client._get.side_effect = lambda endpoint, params=None, signed=False: (
+            info if "exchangeInfo" in endpoint else self.TICKERS)
+        universe = MarketUniverse(UniverseConfig(top_n=2), client=client, registry=SymbolRegistry())
+        self.assertEqual(universe.top_symbols(), ["MIDUSDT", "BIGUSDT"])
+        universe.top_symbols()  # cached within refresh_seconds
+        endpoints = [c.args[0] for c in client._get.call_args_list]
+        self.assertEqual(endpoints, ["/fapi/v1/exchangeInfo", "/fapi/v1/ticker/24hr"])
+        print("[PASS] test_shortlist_ranks_and_filters")
+
+
+class TestIndicators(unittest.TestCase):
+    @staticmethod
+    def legacy_ema(data, period):
+        ema = [sum(data[:period]) / period]
+        multiplier = 2 / (period + 1)
+        for price in data[period:]:
+            ema.append((price - ema[-1]) * multiplier + ema[-1])
+        return ema
+
+    @staticmethod
+    def legacy_rsi(closes, period=14):
+        deltas = [closes[i] - closes[i-1] for i in range(1, len(closes))]
+        gains = [d if d > 0 else 0 for d in deltas]
+        losses = [-d if d < 0 else 0 for d in deltas]
+        avg_gain = sum(gains[:period]) / period
+        avg_loss = sum(losses[:period]) / period
+        values = []
+        for i in range(period, len(deltas)):
+            rs = 100 if avg_loss == 0 else avg_gain / avg_loss
+            values.append(100 - (100 / (1 + rs)))
+            avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+            avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+        return values
+
+    def test_matches_legacy_loops(self):
+        import numpy as np
+        from core.tools import indicators
+        rng = np.random.default_rng(7)
+        closes = 100 + np.cumsum(rng.normal(size=3000))
+        for period in (9, 21, 200):
+            np.testing.assert_allclose(indicators.ema(closes, period)[period - 1:],
+                                       self.legacy_ema(closes.tolist(), period), rtol=1e-10)
+        np.testing.assert_allclose(indicators.rsi(closes), self.legacy_rsi(closes.tolist()), atol=1e-8)
+        rising = np.arange(40.0)  # no losses → legacy rs = 100 quirk
+        np.testing.assert_allclose(indicators.rsi(rising), self.legacy_rsi(rising.tolist()))
+        self.assertEqual(indicators.rsi(rising[:15]), [])
+        print("[PASS] test_matches_legacy_loops")
+
+    def test_matrix_rows_match_series(self):
+        import numpy as np
+        from core.tools import indicators
+        rng = np.random.default_rng(3)
+        closes = 100 + np.cumsum(rng.normal(size=(4, 120)), axis=1)
+        highs, lows = closes + 1, closes - 1
+        batched = [indicators.ema(closes, 21), indicators.rsi_wilder(closes), indicators.atr(highs, lows, closes),
+                   indicators.bollinger(closes)[1], indicators.volume_stats(closes)[2],
+                   indicators.rolling_max(highs, 12)]
+        for row in range(4):
+            single = [indicators.ema(closes[row], 21), indicators.rsi_wilder(closes[row]),
+                      indicators.atr(highs[row], lows[row], closes[row]), indicators.bollinger(closes[row])[1],
+                      indicators.volume_stats(closes[row])[2], indicators.rolling_max(highs[row], 12)]
+            for b, s in zip(batched, single):
+                np.testing.assert_allclose(b[row], s, equal_nan=True)
+        self.assertEqual(indicators.rolling_max(highs, 12)[0, -1], highs[0, -12:].max())
+        print("[PASS] test_matrix_rows_match_series")
+
+
+class TestStreamingIndicators(unittest.TestCase):
+    def test_match_batch_indicators(self):
+        import numpy as np
+        from core.tools import indicators
+        from core.tools.streaming_indicators import (StreamingEMA, StreamingRSI, RollingExtreme, RollingSum,
+                                                     indicator_from_dict)
+        rng = np.random.default_rng(11)
+        closes = 100 + np.cumsum(rng.normal(size=400))
+        streams = [StreamingEMA(21), StreamingRSI(14), RollingExtreme(12, "max"), RollingExtreme(12, "min"),
+                   RollingSum(19)]
+        batch = [indicators.ema(closes, 21), indicators.rsi_wilder(closes, 14),
+                 indicators.rolling_max(closes, 12), indicators.rolling_min(closes, 12),
+                 indicators.sma(closes, 19) * 19]
+        for t, close in enumerate(closes):
+            for stream, expected in zip(streams, batch):
+                self.assertTrue(np.isclose(stream.peek(close), expected[t], equal_nan=True))
+                self.assertTrue(np.isclose(stream.update(close), expected[t], equal_nan=True))
+            if t == 200:  # survive a serialization round trip mid-stream
+                streams = [indicator_from_dict(json.loads(json.dumps(s.to_dict()))) for s in streams]
+        print("[PASS] test_match_batch_indicators")
+
+    def test_momentum_update_matches_analyze(self):
+        import numpy as np
+        from core.tools.candle_series import CandleSeries
+        rng = np.random.default_rng(5)
+        n = 120
+        closes = 100 + np.cumsum(rng.normal(size=n))
+        opens = closes + rng.normal(size=n) * 0.3
+        series = CandleSeries(np.arange(n) * 60000, opens, np.maximum(opens, closes) + rng.random(n),
+                              np.minimum(opens, closes) - rng.random(n), closes,
+                              rng.random(n) * (1 + 5 * (rng.random(n) > 0.9)))
+        batch, streaming = MomentumEngine(), MomentumEngine()
+        for t in range(n):
+            expected = batch.analyze(series[:t + 1])
+            self.assertEqual(streaming.update(series[t], "BTCUSDT", closed=False), expected)
+            self.assertEqual(streaming.update(series[t], "BTCUSDT"), expected)
+        self.assertEqual(streaming.update(series[n - 1], "BTCUSDT"), expected)  # repeat ignored
+        print("[PASS] test_momentum_update_matches_analyze")
+
+
+class TestMomentumBatch(unittest.TestCase):
+    @staticmethod
+    def random_series(rng, n=100):
+        import numpy as np
+        from core.tools.candle_series import CandleSeries
+        closes = 100 + np.cumsum(rng.normal(size=n))
+        opens = closes + rng.normal(size=n) * 0.3
+        return CandleSeries(np.arange(n) * 60000, opens, np.maximum(opens, closes) + rng.random(n),
+                            np.minimum(opens, closes) - rng.random(n), closes,
+                            rng.random(n) * (1 + 5 * (rng.random(n) > 0.9)))
+
+    def test_batch_matches_analyze(self):
+        import numpy as np
+        from core.tools.momentum_engine import stack_series, DIRECTION_NAMES
+        rng = np.random.default_rng(9)
+        series = [self.random_series(rng) for _ in range(300)] + [self.random_series(rng, 50)]
+        engine = MomentumEngine()
+        rows, ohlcv = stack_series(series, 100)
+        self.assertEqual(ohlcv.shape, (300, 100, 5))
+        scores, directions = engine.analyze_batch(ohlcv)
+        for k, i in enumerate(rows):
+            self.assertEqual(engine.analyze(series[i]),
+                             {"score": int(scores[k]), "direction": DIRECTION_NAMES[int(directions[k])]})
+        self.assertGreater(scores.max(), 3)
+        print("[PASS] test_batch_matches_analyze")
+
+    def test_scanner_batch_scoring(self):
+        import numpy as np
+        from core.tools.market_scan import MarketScanner
+        rng = np.random.default_rng(4)
+        series = {f"S{i}USDT": self.random_series(rng) for i in range(40)}
+        scanner = MarketScanner({**POLICY, "scanner": {"entry_threshold": 3.0, "shortlist_size": 0,
+                                                      "batch_scoring": True}})
+        scanner._scan_symbols = lambda: list(series)
+        scanner.candle_store.get = lambda symbol, interval, limit: series[symbol]
+        found = {c["symbol"]: (c["score"], c["direction"]) for c in scanner.iter_candidates()}
+        expected = {s: (r["score"], r["direction"]) for s, r in
+                    ((s, MomentumEngine().analyze(c)) for s, c in series.items()) if r["score"] >= 3.0}
+        self.assertEqual(found, expected)
+        print(f"[PASS] test_scanner_batch_scoring: {len(found)} candidates")
+
+
+class TestFeatureCache(unittest.TestCase):
+    def series(self, n=60, last_close=None, symbol="BTCUSDT"):
+        import numpy as np
+        from core.tools.candle_series import CandleSeries
+        closes = 100 + np.sin(np.arange(n) / 3.0)
+        if last_close is not None:
+            closes[-1] = last_close
+        return CandleSeries(np.arange(n) * 60000, closes, closes + 0.5, closes - 0.5, closes,
+                            np.ones(n), symbol=symbol, interval="1m")
+
+    def test_hits_invalidation_and_eviction(self):
+        from core.tools.feature_cache import FeatureCache
+        cache = FeatureCache(max_entries=2)
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+        self.assertEqual(cache.get_or_compute(self.series(), "f", compute), 1)
+        self.assertEqual(cache.get_or_compute(self.series(), "f", compute), 1)  # same candles, new object
+        self.assertEqual(cache.get_or_compute(self.series(last_close=150.0), "f", compute), 2)  # forming bar moved
+        self.assertEqual(cache.get_or_compute(self.series(61), "f", compute), 3)  # new candle
+        self.assertEqual(len(cache), 1)  # superseded key dropped
+        cache.get_or_compute(self.series(symbol="ETHUSDT"), "f", compute)
+        cache.get_or_compute(self.series(symbol="SOLUSDT"), "f", compute)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats["evictions"], 1)
+        self.assertEqual(cache.get_or_compute([{"close": 1.0}], "f", compute), 6)  # no identity → not cached
+        print("[PASS] test_hits_invalidation_and_eviction")
+
+    def test_strategy_reuses_scanner_analysis(self):
+        from unittest.mock import MagicMock
+        from core.tools.feature_cache import FeatureCache
+        from core.tools.momentum_strategy import MomentumStrategy
+        cache = FeatureCache()
+        candles = self.series()
+        scan_engine = MomentumEngine()
+        analysis = cache.get_or_compute(candles, "momentum", lambda: scan_engine.analyze(candles))
+        strategy = MomentumStrategy(feature_cache=cache)
+        strategy.engine.analyze = MagicMock(side_effect=AssertionError("recomputed"))
+        first = strategy.analyze(candles)
+        self.assertEqual((first.score, first.direction), (analysis["score"], analysis["direction"]))
+        self.assertIs(strategy.analyze(self.series()), first)  # unchanged candles → score reused
+        print("[PASS] test_strategy_reuses_scanner_analysis")
+
+
+class TestStrategyRegistry(unittest.TestCase):
+    def candidate(self):
+        import numpy as np
+        from core.tools.candle_series import CandleSeries
+        closes = 100 + np.cumsum(np.random.default_rng(2).normal(size=100))
+        return {"symbol": "BTCUSDT", "candles": CandleSeries(np.arange(100) * 60000, closes, closes + 1,
+                                                             closes - 1, closes, np.ones(100))}
+
+    def test_built_from_weights_and_run_concurrently(self):
+        from core.tools.strategy_registry import StrategyRegistry
+        registry = StrategyRegistry({"strategy_weights": {"momentum": 1.5, "patterns": 1.0, "rsi": 1.0,
+                                                          "volume": 1.0, "funding_oi": 0}})
+        try:
+            self.assertEqual(list(registry.specs), ["momentum", "patterns", "rsi"])
+            self.assertEqual(registry.lookback, 50)
+            scores = registry.evaluate_one(self.candidate())
+            self.assertEqual([s.name for s in scores], ["momentum", "patterns", "rsi"])
+            short = {"symbol": "NEWUSDT", "candles": self.candidate()["candles"][-30:]}
+            self.assertEqual([s.name for s in registry.evaluate_one(short)], ["momentum", "rsi"])
+        finally:
+            registry.close()
+        print("[PASS] test_built_from_weights_and_run_concurrently")
+
+    def test_slow_strategy_times_out(self):
+        import time
+        from core.tools.strategy_registry import StrategyRegistry, StrategySpec, STRATEGY_SPECS
+
+        class Slow:
+            def analyze(self, symbol):
+                time.sleep(1.0)
+
+        specs = {"momentum": STRATEGY_SPECS["momentum"],
+                 "slow": StrategySpec("slow", Slow, needs="symbol", timeout=0.1)}
+        registry = StrategyRegistry({"strategy_weights": {"momentum": 1.0, "slow": 1.0}}, specs=specs)
+        try:
+            started = time.monotonic()
+            results = registry.evaluate_all([self.candidate()])
+            self.assertLess(time.monotonic() - started, 0.5)
+            self.assertEqual([s.name for s in results["BTCUSDT"]], ["momentum"])
+        finally:
+            registry.close()
+        print("[PASS] test_slow_strategy_times_out")
+
+    def test_hung_strategy_is_not_resubmitted(self):
+        import threading
+        from core.tools.strategy_registry import StrategyRegistry, StrategySpec, STRATEGY_SPECS
+        release = threading.Event()
+
+        class Hung:
+            def analyze(self, symbol):
+                release.wait(5)
+
+        specs = {"momentum": STRATEGY_SPECS["momentum"],
+                 "hung": StrategySpec("hung", Hung, needs="symbol", timeout=0.05)}
+        registry = StrategyRegistry({"strategy_weights": {"momentum": 1.0, "hung": 1.0},
+                                     "strategy_workers": 1}, specs=specs)
+        try:
+            candidate = self.candidate()
+            self.assertEqual([s.name for s in registry.evaluate_one(candidate)], ["momentum"])
+            self.assertEqual(registry.abandoned["hung"], 1)
+            # still running: not submitted again, and momentum keeps its own pool
+            for _ in range(3):
+                self.assertEqual([s.name for s in registry.evaluate_one(candidate)], ["momentum"])
+            self.assertEqual((registry.abandoned["hung"], registry.skipped["hung"]), (1, 3))
+            release.set()
+            registry._threads["hung"].submit(lambda: None).result(timeout=1)
+            self.assertEqual(registry.in_flight_abandoned["hung"], 0)
+            registry.evaluate_one(candidate)
+            self.assertEqual(registry.skipped["hung"], 3)  # submitted again once it returned
+        finally:
+            release.set()
+            registry.close()
+        print("[PASS] test_hung_strategy_is_not_resubmitted")
+
+    def test_process_executor_matches_thread(self):
+        from core.tools.strategy_registry import StrategyRegistry
+        weights = {"strategy_weights": {"rsi": 1.0}}
+        threaded = StrategyRegistry(weights)
+        pooled = StrategyRegistry({**weights, "strategies": {"rsi": {"executor": "process"}},
+                                   "strategy_workers": 1})
+        try:
+            candidate = self.candidate()
+            self.assertEqual(pooled.evaluate_one(candidate), threaded.evaluate_one(candidate))
+        finally:
+            threaded.close()
+            pooled.close()
+        print("[PASS] test_process_executor_matches_thread")
+
+    def test_process_executor_uses_registry_spec(self):
+        from core.tools.momentum_strategy import MomentumStrategy
+        from core.tools.strategy_registry import StrategyRegistry, StrategySpec
+        # registered under a built-in name: the worker must build this factory, not the global one
+        specs = {"rsi": StrategySpec("rsi", MomentumStrategy, lookback=21, executor="process")}
+        registry = StrategyRegistry({"strategy_weights": {"rsi": 1.0}, "strategy_workers": 1}, specs=specs)
+        try:
+            candidate = self.candidate()
+            self.assertEqual(registry.evaluate_one(candidate), [MomentumStrategy().analyze(candidate["candles"])])
+        finally:
+            registry.close()
+        print("[PASS] test_process_executor_uses_registry_spec")
+
+
+class TestDerivativesData(unittest.TestCase):
+    def test_series_ring_stats(self):
+        import numpy as np
+        from core.tools.derivatives_data import SeriesRing
+        ring = SeriesRing(10)
+        values = 1e8 + np.cumsum(np.random.default_rng(1).normal(size=25)) * 1e4
+        for t, v in enumerate(values):
+            ring.append(t, v)
+        window = values[-10:]
+        self.assertEqual(ring.window().tolist(), window.tolist())
+        self.assertAlmostEqual(ring.mean(), window.mean(), places=4)
+        self.assertAlmostEqual(ring.std(), window.std(), places=4)
+        self.assertAlmostEqual(ring.zscore(), (window[-1] - window.mean()) / window.std(), places=6)
+        self.assertAlmostEqual(ring.delta(3), window[-1] - window[-4])
+        print("[PASS] test_series_ring_stats")
+
+    def test_bulk_funding_and_oi_features(self):
+        from unittest.mock import MagicMock
+        from core.tools.derivatives_data import DerivativesData
+        from core.tools.derivatives_strategy import DerivativesStrategy
+        oi = {"value": 1300.0}
+
+        def get(endpoint, params=None, signed=False):
+            if endpoint == "/fapi/v1/premiumIndex":
+                return [{"symbol": s, "lastFundingRate": r, "markPrice": "1", "time": 1}
+                        for s, r in (("BTCUSDT", "0.0012"), ("ETHUSDT", "-0.0002"), ("XRPUSDT", "0.0001"))]
+            if endpoint == "/futures/data/openInterestHist":
+                return [{"timestamp": t, "sumOpenInterest": str(1000 + t)} for t in range(1, 21)]
+            if endpoint == "/fapi/v1/openInterest":
+                return {"openInterest": str(oi["value"]), "time": 100}
+            return None
+
+        client = MagicMock()
+        client._get.side_effect = get
+        data = DerivativesData(client=client)
+        self.assertEqual(data.get_funding_rate("BTCUSDT"), 0.0012)
+        self.assertEqual(data.get_funding_rate("ETHUSDT"), -0.0002)
+        self.assertEqual(data.get_funding_rate("XRPUSDT"), 0.0001)
+        self.assertEqual(data.sample_many(["BTCUSDT"]), 1)
+        endpoints = [c.args[0] for c in client._get.call_args_list]
+        self.assertEqual(endpoints.count("/fapi/v1/premiumIndex"), 1)
+        self.assertEqual(data.oi_delta("BTCUSDT"), 1300.0 - 1020.0)
+        self.assertGreater(data.oi_zscore("BTCUSDT"), 2)
+        score = DerivativesStrategy(data).analyze("BTCUSDT")
+        self.assertEqual((score.direction, score.score), ("SHORT", 2.5))
+        self.assertGreater(score.meta["oi_change_pct"], 0)
+        print("[PASS] test_bulk_funding_and_oi_features")
+
+    def test_reads_do_not_sample_into_rings(self):
+        from unittest.mock import MagicMock, patch
+        from core.tools.derivatives_data import DerivativesData
+        client = MagicMock()
+        client._get.side_effect = lambda endpoint, params=None, signed=False: (
+            [] if endpoint == "/futures/data/openInterestHist" else {"openInterest": "500", "time": 100})
+        data = DerivativesData(client=client)
+        data.sample_many(["BTCUSDT"])
+        calls = client._get.call_count
+        with patch("core.tools.derivatives_data.time.time", return_value=1e12):  # far past cache_ttl
+            self.assertEqual(data.get_open_interest("BTCUSDT"), 500.0)
+            self.assertEqual(client._get.call_count, calls)
+            # untracked symbol: read ad hoc, cached, and kept out of the rings
+            self.assertEqual(data.get_open_interest("ETHUSDT"), 500.0)
+            self.assertEqual(data.get_open_interest("ETHUSDT"), 500.0)
+        self.assertEqual(client._get.call_count, calls + 1)
+        self.assertEqual(len(data._oi_rings["BTCUSDT"]), 1)
+        self.assertNotIn("ETHUSDT", data._oi_rings)
+        print("[PASS] test_reads_do_not_sample_into_rings")
+
+    def test_funding_reads_do_not_sample_into_rings(self):
+        from unittest.mock import MagicMock, patch
+        from core.tools.derivatives_data import DerivativesData
+        stamp = [1]
+
+        def get(endpoint, params=None, signed=False):
+            if endpoint == "/fapi/v1/premiumIndex":
+                stamp[0] += 1  # every call carries a new time, like the live endpoint
+                return [{"symbol": "BTCUSDT", "lastFundingRate": str(0.0001 * stamp[0]), "time": stamp[0]}]
+            return None
+
+        client = MagicMock()
+        client._get.side_effect = get
+        data = DerivativesData(client=client)
+        data.poll()
+        data.poll()
+        for now in (1e12, 2e12, 3e12):  # each read past cache_ttl forces a refresh
+            with patch("core.tools.derivatives_data.time.time", return_value=now):
+                self.assertAlmostEqual(data.get_funding_rate("BTCUSDT"), 0.0001 * stamp[0])
+        self.assertEqual(stamp[0], 6)
+        self.assertEqual(len(data._funding_rings["BTCUSDT"]), 2)
+        self.assertAlmostEqual(data.funding_trend("BTCUSDT"), 0.00005)
+        print("[PASS] test_funding_reads_do_not_sample_into_rings")
+
+
+class TestResampler(unittest.TestCase):
+    def _series(self, n, start):
+        import numpy as np
+        from core.tools.candle_series import CandleSeries
+        rng = np.random.default_rng(3)
+        t = start + np.arange(n) * 60000
+        close = 100 + np.cumsum(rng.normal(size=n))
+        open_ = close + rng.normal(size=n) * 0.1
+        return CandleSeries(t, open_, np.maximum(open_, close) + 0.5, np.minimum(open_, close) - 0.5,
+                            close, rng.random(n), t + 59999, symbol="BTCUSDT", interval="1m")
+
+    def test_vectorized_resample(self):
+        from core.tools.resampler import resample
+        base = self._series(62, 1000 * 60000 + 3 * 60000)  # starts mid 5m bucket
+        out = resample(base, "5m")
+        self.assertEqual(out.open_time[0], 1005 * 60000)  # partial head bucket dropped
+        self.assertEqual(len(out), 12)                     # last bucket still forming (3 of 5 bars)
+        first = base[2:7]
+        self.assertEqual(out.open[0], first.open[0])
+        self.assertEqual(out.high[0], first.high.max())
+        self.assertEqual(out.low[0], first.low.min())
+        self.assertEqual(out.close[0], first.close[-1])
+        self.assertAlmostEqual(out.volume[0], first.volume.sum())
+        self.assertEqual(out.close[-1], base.close[-1])
+        self.assertEqual(out.close_time[0], 1010 * 60000 - 1)
+        with self.assertRaises(ValueError):
+            resample(base, "7m")
+        print("[PASS] test_vectorized_resample")
+
+    def test_incremental_matches_vectorized(self):
+        import numpy as np
+        from core.tools.candle_series import CandleSeries
+        from core.tools.resampler import Resampler, resample
+        base = self._series(400, 1000 * 60000 + 7 * 60000)
+        expected = resample(base, "15m")
+        inc = Resampler("1m", "15m", capacity=100, symbol="BTCUSDT")
+        inc.update(base[:150])
+        for i in range(150, len(base)):
+            row = base[i:i + 1]
+            # the forming bar arrives first with provisional values, then closes
+            inc.update(CandleSeries(row.open_time, row.open, row.open, row.open, row.open, [0.0],
+                                    row.close_time))
+            current = inc.update(row)
+            self.assertEqual(current.close[-1], row.close[0])
+        got = inc.series()
+        self.assertEqual(got.open_time.tolist(), expected.open_time.tolist())
+        for name in ("open", "high", "low", "close", "volume"):
+            self.assertTrue(np.allclose(getattr(got, name), getattr(expected, name)), name)
+        print("[PASS] test_incremental_matches_vectorized")
+
+    def test_store_resamples_without_requests(self):
+        from core.tools.candle_store import RollingCandleStore
+        now = [300 * 60000 + 5000]
+        client = FakeKlineClient(now)
+        store = RollingCandleStore(client, capacity=50, clock=lambda: now[0] / 1000)
+        store.get("BTCUSDT", "1m", 200)
+        calls = len(client.calls)
+        five = store.get_resampled("BTCUSDT", "5m", 20)
+        fifteen = store.get_resampled("BTCUSDT", "15m", 10)
+        self.assertEqual(len(client.calls), calls)  # both served from the stored 1m ring
+        self.assertEqual((len(five), five.interval), (20, "5m"))
+        self.assertEqual(five.open_time[-1], 300 * 60000)
+        self.assertTrue((five.open_time[1:] - five.open_time[:-1] == 300000).all())
+        self.assertEqual(len(fifteen), 10)
+        print("[PASS] test_store_resamples_without_requests")
+
+
+class TestBacktester(unittest.TestCase):
+    def _series(self, n, seed, symbol="BTCUSDT"):
+        import numpy as np
+        from core.tools.candle_series import CandleSeries
+        rng = np.random.default_rng(seed)
+        t = 1_700_000_100_000 // 900000 * 900000 + np.arange(n) * 900000
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+        open_ = np.r_[close[0], close[:-1]]
+        high = np.maximum(open_, close) * (1 + rng.random(n) * 0.003)
+        low = np.minimum(open_, close) * (1 - rng.random(n) * 0.003)
+        return CandleSeries(t, open_, high, low, close, rng.lognormal(0, 1, n), t + 899999,
+                            symbol=symbol, interval="15m")
+
+    def test_signals_match_strategies(self):
+        import numpy as np
+        from core.backtest.engine import DIRECTION_NAMES, momentum_signals, pattern_signals, rsi_signals
+        from core.tools.feature_cache import FeatureCache
+        from core.tools.indicator_strategy import RSIStrategy
+        from core.tools.momentum_strategy import MomentumStrategy
+        from core.tools.pattern_strategy import PatternStrategy
+        series = self._series(600, 1)
+        pairs = [(MomentumStrategy(FeatureCache()), momentum_signals(series, 100, 128)),
+                 (PatternStrategy(FeatureCache()), pattern_signals(series, 100)),
+                 (RSIStrategy(feature_cache=FeatureCache()), rsi_signals(series, 100, 128))]
+        for i in np.random.default_rng(2).integers(99, 600, 60):
+            window = series[i - 99:i + 1]
+            for strategy, (score, direction) in pairs:
+                result = strategy.analyze(window)
+                self.assertEqual((result.score, result.direction),
+                                 (score[i], DIRECTION_NAMES[int(direction[i])]), type(strategy).__name__)
+        print("[PASS] test_signals_match_strategies")
+
+    def test_exits_and_funding(self):
+        import numpy as np
+        from core.backtest.engine import Backtester
+        from core.tools.candle_series import CandleSeries
+        t = np.arange(5) * 60000
+        series = CandleSeries(t, [100, 100, 100, 97, 99], [101, 101, 102.5, 98, 100],
+                              [99, 99, 99.5, 96, 98], [100, 100, 101, 97, 99], [1] * 5, t + 59999)
+        self.assertEqual(Backtester._first_exit(series, 0, True, 98.5, 102.0), (2, 102.0, "TAKE_PROFIT"))
+        self.assertEqual(Backtester._first_exit(series, 2, True, 98.5, 105.0), (3, 97.0, "STOP_LOSS"))  # gap
+        self.assertEqual(Backtester._first_exit(series, 3, False, 120.0, 50.0), (4, 99.0, "END_OF_DATA"))
+        funding = (np.array([60000, 180000, 240000]), np.array([0.001, 0.002, 0.003]))
+        # long 2 units over (0, 180000]: pays 0.001 * 100 * 2 + 0.002 * 97 * 2
+        self.assertAlmostEqual(Backtester._funding_cost(series, funding, 0, 180000, 2.0), 0.588)
+        print("[PASS] test_exits_and_funding")
+
+    def test_portfolio_replay(self):
+        import numpy as np
+        from core.backtest.engine import Backtester, BacktestConfig
+        policy = {"strategy_weights": {"momentum": 1.5, "patterns": 1.0, "rsi": 1.0},
+                  "conflict_policy": "dominant", "scanner": {"entry_threshold": 1.0},
+                  "max_open_positions": 2, "max_daily_loss": 1e9, "leverage": 10,
+                  "risk_per_trade": 0.02, "default_sl": 0.01, "default_tp": 0.015}
+        data = {s: self._series(3000, k, s) for k, s in enumerate(("BTCUSDT", "ETHUSDT", "XRPUSDT"))}
+        result = Backtester(policy, BacktestConfig(initial_equity=1000.0)).run(data)
+        summary = result.summary()
+        self.assertGreater(summary["trades"], 10)
+        self.assertAlmostEqual(result.equity[-1], 1000.0 + sum(t["pnl"] for t in result.trades))
+        self.assertAlmostEqual(sum(a["pnl"] for a in result.attribution.values()), summary["net_pnl"])
+        self.assertGreater(result.rejections.get("Max open positions", 0), 0)
+        self.assertLessEqual(result.drawdown.max(), 0.0)
+        # never two positions on one symbol, never more than max_open_positions at once
+        spans = sorted((t["entry_time"], t["exit_time"], t["symbol"]) for t in result.trades)
+        for k, (entry, _, symbol) in enumerate(spans):
+            live = [s for e, x, s in spans[:k] if x > entry]
+            self.assertNotIn(symbol, live)
+            self.assertLess(len(live), 2)
+        self.assertTrue(all(t["fees"] > 0 for t in result.trades))
+        self.assertTrue(np.all(np.diff(result.equity_times) >= 0))
+        print("[PASS] test_portfolio_replay")
+
+
+    def test_exit_settles_after_its_bar(self):
+        import numpy as np
+        from core.backtest.engine import Backtester, BacktestConfig
+        from core.tools.candle_series import CandleSeries
+        from core.tools.momentum_engine import FLAT, LONG
+        policy = {"strategy_weights": {"momentum": 1.0}, "conflict_policy": "dominant",
+                  "scanner": {"entry_threshold": 1.0}, "max_open_positions": 1, "max_daily_loss": 1e9,
+                  "leverage": 10, "risk_per_trade": 0.02, "default_sl": 0.01, "default_tp": 0.05}
+        n, t = 130, np.arange(130) * 900000
+        data, signals = {}, {}
+        for symbol, bars in (("AUSDT", [100]), ("BUSDT", [104, 105])):
+            low = np.full(n, 99.9)
+            if symbol == "AUSDT":
+                low[105] = 98.0  # A's stop is hit inside bar 105
+            data[symbol] = CandleSeries(t, np.full(n, 100.0), np.full(n, 100.1), low, np.full(n, 100.0),
+                                        np.ones(n), t + 899999, symbol=symbol, interval="15m")
+            score, direction = np.zeros(n), np.full(n, FLAT)
+            score[bars], direction[bars] = 5.0, LONG
+            signals[symbol] = {"momentum": (score, direction)}
+        result = Backtester(policy, BacktestConfig()).run(data, signals=signals)
+        a, b = result.trades
+        self.assertEqual((a["symbol"], a["exit_time"]), ("AUSDT", int(t[105]) + 900000))
+        # B's bar-104 decision (at bar 105's open) still sees A's slot taken
+        self.assertEqual(result.rejections, {"Max open positions": 1})
+        # B's bar-105 decision comes after the settlement and sizes on the equity after A's loss
+        self.assertEqual((b["symbol"], b["entry_time"]), ("BUSDT", int(t[105]) + 900000))
+        sl_pct = (b["entry_price"] - 99.0) / b["entry_price"]
+        self.assertAlmostEqual(b["quantity"] * b["entry_price"], (1000.0 + a["pnl"]) * 0.02 / sl_pct)
+        print("[PASS] test_exit_settles_after_its_bar")
+
+
+class TestSweep(unittest.TestCase):
+    def test_trials_and_params(self):
+        from core.backtest.sweep import apply_params, grid, random_samples, trial_id
+        trials = grid({"strategy_weights.momentum": [1.0, 2.0], "default_sl": [0.01, 0.02, 0.03]})
+        self.assertEqual(len(trials), 6)
+        policy = {"strategy_weights": {"momentum": 1.5, "rsi": 1.0}}
+        updated = apply_params(policy, trials[-1])
+        self.assertEqual(updated["strategy_weights"], {"momentum": 2.0, "rsi": 1.0})
+        self.assertEqual(updated["default_sl"], 0.03)
+        self.assertEqual(policy["strategy_weights"]["momentum"], 1.5)  # base untouched
+        samples = random_samples({"leverage": [5, 10], "default_tp": (0.01, 0.03)}, 20, seed=1)
+        self.assertTrue(all(0.01 <= p["default_tp"] <= 0.03 and p["leverage"] in (5, 10) for p in samples))
+        self.assertEqual(trial_id({"a": 1, "b": 2}), trial_id({"b": 2, "a": 1}))
+        print("[PASS] test_trials_and_params")
+
+    def test_sweep_matches_backtest_and_resumes(self):
+        import tempfile
+        import numpy as np
+        from pathlib import Path
+        from core.backtest.engine import Backtester
+        from core.backtest.sweep import SweepRunner, apply_params, load_arrays, rank
+        policy = {"strategy_weights": {"momentum": 1.5, "patterns": 1.0, "rsi": 1.0},
+                  "conflict_policy": "dominant", "scanner": {"entry_threshold": 1.0},
+                  "max_open_positions": 3, "max_daily_loss": 1e9, "leverage": 10,
+                  "risk_per_trade": 0.02, "default_sl": 0.01, "default_tp": 0.015}
+        series = TestBacktester()._series
+        data = {s: series(1500, k, s) for k, s in enumerate(("BTCUSDT", "ETHUSDT"))}
+        trials = [{"scanner.entry_threshold": t, "default_tp": tp} for t in (1.0, 3.0) for tp in (0.01, 0.03)]
+        with tempfile.TemporaryDirectory() as tmp:
+            runner = SweepRunner(policy, Path(tmp) / "cache", Path(tmp) / "results.jsonl", max_workers=2)
+            self.assertEqual(runner.prepare(data), 2)
+            self.assertEqual(runner.prepare(data), 0)  # cache is current
+            corrected = dict(data, BTCUSDT=series(1500, 0, "BTCUSDT"))
+            corrected["BTCUSDT"].close[700] *= 1.01  # same length and last bar, different candles
+            self.assertEqual(runner.prepare(corrected), 1)
+            funding = {"ETHUSDT": (data["ETHUSDT"].open_time[::480].copy(), np.full(4, 0.0001))}
+            self.assertEqual(runner.prepare(data, funding), 2)  # BTC back to the original, ETH gains funding
+            self.assertEqual(set(load_arrays(Path(tmp) / "cache")[1]), {"ETHUSDT"})
+            self.assertEqual(runner.prepare(data, funding), 0)
+            self.assertEqual(runner.prepare(data), 1)  # funding dropped again
+            self.assertEqual(load_arrays(Path(tmp) / "cache")[1], {})
+            shared, _, _ = load_arrays(Path(tmp) / "cache")
+            self.assertIsNotNone(shared["BTCUSDT"].close.base)  # a view on the memory map, not a copy
+            results = runner.run(trials)
+            self.assertEqual(len(results), 4)
+            direct = Backtester(apply_params(policy, trials[1])).run(data).summary()
+            self.assertAlmostEqual(results[1]["summary"]["net_pnl"], direct["net_pnl"])
+            self.assertEqual(results[1]["summary"]["trades"], direct["trades"])
+            with open(runner.results_path, "a") as f:
+                f.write('{"trial": "torn')  # interrupted write
+            again = SweepRunner(policy, runner.cache_dir, runner.results_path, max_workers=2)
+            self.assertEqual(len(again.completed()), 4)
+            self.assertEqual([r["trial"] for r in again.run(trials)], [r["trial"] for r in results])
+            again.run(trials + [{"scanner.entry_threshold": 2.0}])
+            self.assertEqual(len(again.completed()), 5)
+            ranked = rank(results)
+            returns = [r["summary"]["return_pct"] for r in ranked]
+            self.assertEqual(returns, sorted(returns, reverse=True))
+        print("[PASS] test_sweep_matches_backtest_and_resumes")
+
+
+class TestKlineStore(unittest.TestCase):
+    def _candles(self, first, n):
+        import numpy as np
+        from core.tools.candle_series import CandleSeries
+        t = (first + np.arange(n)) * 60000
+        close = np.arange(first, first + n, dtype=float)
+        return CandleSeries(t, close, close + 1, close - 1, close, np.ones(n), t + 59999,
+                            symbol="BTCUSDT", interval="1m")
+
+    def test_append_range_and_compact(self):
+        import tempfile
+        import numpy as np
+        from pathlib import Path
+        from core.tools.kline_store import KlineStore
+        with tempfile.TemporaryDirectory() as tmp:
+            store = KlineStore(Path(tmp))
+            self.assertEqual(store.append(self._candles(0, 1000)), 1000)
+            self.assertEqual(store.append(self._candles(990, 20)), 10)  # overlap is skipped
+            table = store.table("BTCUSDT", "1m")
+            window = store.range("BTCUSDT", "1m", 100 * 60000, 110 * 60000)
+            self.assertEqual(window.close.tolist(), list(map(float, range(100, 110))))
+            self.assertIsInstance(window.close.base, np.memmap)  # zero-copy view
+            self.assertEqual(store.tail("BTCUSDT", "1m", 3).open_time[-1], 1009 * 60000)
+            self.assertEqual(table.compact(600 * 60000), 600)
+            self.assertEqual(len(table), 1010)
+            spanning = table.range(590 * 60000, 612 * 60000)  # cold segment + hot columns
+            self.assertEqual(spanning.close.tolist(), list(map(float, range(590, 612))))
+            self.assertEqual(len(table.tail(500)), 500)
+            self.assertEqual(table.tail(500).open_time[0], 510 * 60000)
+            # a torn append (one column longer than the rest) is cut back on reopen
+            with open(table._hot / "close", "ab") as f:
+                f.write(b"\0" * 8)
+            reopened = KlineStore(Path(tmp))
+            self.assertEqual(len(reopened.table("BTCUSDT", "1m")), 1010)
+            self.assertEqual(list(reopened.load(["BTCUSDT", "ETHUSDT"], "1m", 1000 * 60000)), ["BTCUSDT"])
+        print("[PASS] test_append_range_and_compact")
+
+    def test_insert_into_compacted_history(self):
+        import tempfile
+        from pathlib import Path
+        from core.tools.kline_store import KlineStore
+        with tempfile.TemporaryDirectory() as tmp:
+            store = KlineStore(Path(tmp))
+            store.append(self._candles(100, 100))
+            store.append(self._candles(300, 200))  # a hole at 200..299
+            table = store.table("BTCUSDT", "1m")
+            self.assertEqual(table.compact(400 * 60000), 200)  # the hole is now inside a cold segment
+            before = [s[3] for s in table._segments]
+            self.assertEqual(table.insert(self._candles(0, 500)), 200)  # head 0..99 and the hole
+            self.assertEqual(table.insert(self._candles(0, 500)), 0)
+            self.assertEqual(len(table), 500)
+            self.assertEqual(table.range().close.tolist(), list(map(float, range(500))))
+            # a crash before the replaced segment was removed leaves it inside the merged one
+            for path in before:
+                path.write_bytes(b"stale")
+            reopened = KlineStore(Path(tmp)).table("BTCUSDT", "1m")
+            self.assertEqual(reopened.range().close.tolist(), list(map(float, range(500))))
+            self.assertFalse(any(path.exists() for path in before))
+        print("[PASS] test_insert_into_compacted_history")
+
+    def test_rolling_store_backfills_from_disk(self):
+        import tempfile
+        from pathlib import Path
+        from core.tools.candle_store import RollingCandleStore
+        from core.tools.kline_store import KlineStore
+        with tempfile.TemporaryDirectory() as tmp:
+            now = [500 * 60000 + 5000]
+            first = RollingCandleStore(FakeKlineClient(now), capacity=100, clock=lambda: now[0] / 1000,
+                                       history=KlineStore(Path(tmp)))
+            first.get("BTCUSDT", "1m", 100)
+            history = KlineStore(Path(tmp))
+            self.assertEqual(history.last_open_time("BTCUSDT", "1m"), 499 * 60000)  # forming bar not archived
+            now[0] += 3 * 60000  # restart three candles later
+            client = FakeKlineClient(now)
+            second = RollingCandleStore(client, capacity=100, clock=lambda: now[0] / 1000, history=history)
+            candles = second.get("BTCUSDT", "1m", 100)
+            self.assertEqual(client.calls, [{"limit": 5, "start_time": 499 * 60000}])
+            self.assertEqual(candles.open_time[-1], 503 * 60000)
+            self.assertTrue((candles.open_time[1:] - candles.open_time[:-1] == 60000).all())
+        print("[PASS] test_rolling_store_backfills_from_disk")
+
+
+class TestKlineDownloader(unittest.TestCase):
+    def test_plan_pages_and_gaps(self):
+        import numpy as np
+        from core.tools.kline_downloader import find_gaps, plan_pages
+        pages = plan_pages(0, 4000 * 60000, "1m")
+        self.assertEqual(pages, [(0, 1500 * 60000 - 1), (1500 * 60000, 3000 * 60000 - 1),
+                                 (3000 * 60000, 4000 * 60000 - 1)])
+        times = np.array([0, 1, 2, 5, 6, 9]) * 60000
+        self.assertEqual(find_gaps(times, "1m"), [(3 * 60000, 5 * 60000), (7 * 60000, 9 * 60000)])
+        print("[PASS] test_plan_pages_and_gaps")
+
+    @staticmethod
+    async def _serve(klines, downloader, symbols, start):
+        """Run the downloader against a local stand-in serving /fapi/v1/klines with `klines`."""
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get("/fapi/v1/klines", klines)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        downloader.base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        try:
+            return await downloader.download_async(symbols, "1m", start)
+        finally:
+            await runner.cleanup()
+
+    def test_head_backfill_after_compaction(self):
+        import asyncio
+        import tempfile
+        import numpy as np
+        from pathlib import Path
+        from aiohttp import web
+        from core.tools.kline_downloader import KlineDownloader
+        from core.tools.kline_store import KlineStore
+
+        minute = 60000
+        now = 4000 * minute
+        requests = []
+
+        async def klines(request):
+            q = request.query
+            start, end = int(q["startTime"]), int(q["endTime"])
+            requests.append(start)
+            times = range(max(start, 2000 * minute), min(end, now - minute) + 1, minute)  # listed at 2000
+            return web.json_response([[t, "1", "2", "0.5", str(t / minute), "1.0", t + minute - 1] for t in times])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = KlineStore(Path(tmp))
+            make = lambda: KlineDownloader(KlineStore(Path(tmp)), clock=lambda: now / 1000)
+            self.assertEqual(asyncio.run(self._serve(klines, make(), ["ETHUSDT"], 3000 * minute)), {"ETHUSDT": True})
+            self.assertEqual(store.table("ETHUSDT", "1m").compact(now), 1000)  # everything is cold now
+            done = asyncio.run(self._serve(klines, make(), ["ETHUSDT"], 1000 * minute))
+            self.assertEqual(done, {"ETHUSDT": True})
+            history = KlineStore(Path(tmp)).range("ETHUSDT", "1m")
+            self.assertEqual((history.open_time[0], len(history)), (2000 * minute, 2000))
+            self.assertTrue((np.diff(history.open_time) == minute).all())
+            requests.clear()
+            asyncio.run(self._serve(klines, make(), ["ETHUSDT"], 1000 * minute))
+            self.assertEqual(requests, [])  # the listing date was recorded
+        print("[PASS] test_head_backfill_after_compaction")
+
+    def test_download_resume_and_refill(self):
+        import asyncio
+        import tempfile
+        import numpy as np
+        from pathlib import Path
+        from aiohttp import web
+        from core.tools.candle_series import CandleSeries
+        from core.tools.kline_downloader import KlineDownloader
+        from core.tools.kline_store import KlineStore
+
+        minute = 60000
+        now = 5000 * minute + 30000
+        listed = {"BTCUSDT": 0, "ETHUSDT": 2000 * minute, "XRPUSDT": 0, "NEWUSDT": now + minute}  # NEW: not yet
+        outage = (3100 * minute, 3200 * minute)  # BTC has no candles here on the exchange
+        fail_once = {("ETHUSDT", 2500 * minute)}
+        requests = []
+
+        async def klines(request):
+            q = request.query
+            symbol, start, end = q["symbol"], int(q["startTime"]), int(q["endTime"])
+            requests.append((symbol, start))
+            if (symbol, start) in fail_once:
+                fail_once.discard((symbol, start))
+                return web.json_response({"code": -1003, "msg": "busy"}, status=400)
+            first = max(start, listed[symbol])
+            times = [t for t in range(first - first % minute, min(end, now - minute) + 1, minute)
+                     if not (symbol == "BTCUSDT" and outage[0] <= t < outage[1])][:int(q["limit"])]
+            return web.json_response([[t, str(t / minute), str(t / minute + 1), str(t / minute - 1),
+                                       str(t / minute), "1.0", t + minute - 1] for t in times])
+
+        run = lambda downloader, symbols, start: self._serve(klines, downloader, symbols, start)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = KlineStore(Path(tmp))
+            # XRP already has history with a local hole (e.g. an earlier interrupted tool)
+            t = np.r_[np.arange(1000, 1400), np.arange(1600, 2000)] * minute
+            store.append(CandleSeries(t, t / minute, t / minute + 1, t / minute - 1, t / minute,
+                                      np.ones(len(t)), t + minute - 1, symbol="XRPUSDT", interval="1m"))
+            symbols = ["BTCUSDT", "ETHUSDT", "XRPUSDT", "NEWUSDT"]
+            make = lambda: KlineDownloader(KlineStore(Path(tmp)), max_concurrency=4, clock=lambda: now / 1000)
+
+            first = asyncio.run(run(make(), symbols, 1000 * minute))
+            self.assertEqual(first, {"BTCUSDT": True, "ETHUSDT": False, "XRPUSDT": True, "NEWUSDT": True})
+            self.assertEqual(len(KlineStore(Path(tmp)).range("NEWUSDT", "1m")), 0)
+            partial = KlineStore(Path(tmp)).range("ETHUSDT", "1m")
+            self.assertEqual(partial.open_time[-1], 2500 * minute - minute)  # stopped before the failed page
+            self.assertTrue((np.diff(partial.open_time) == minute).all())
+
+            requests.clear()
+            second = asyncio.run(run(make(), symbols, 1000 * minute))
+            self.assertTrue(all(second.values()))
+            # only the unfinished symbol: NEW's empty head download is recorded, not retried
+            self.assertEqual(sorted(set(s for s, _ in requests)), ["ETHUSDT"])
+            final = KlineStore(Path(tmp))
+            eth = final.range("ETHUSDT", "1m")
+            self.assertEqual((eth.open_time[0], eth.open_time[-1]), (2000 * minute, 4999 * minute))
+            xrp = final.range("XRPUSDT", "1m")
+            self.assertEqual(len(xrp), 4000)  # hole refilled, history extended to now
+            self.assertTrue((np.diff(xrp.open_time) == minute).all())
+            btc = final.range("BTCUSDT", "1m")
+            self.assertEqual(len(btc), 4000 - 100)  # the exchange outage stays a gap
+
+            requests.clear()
+            third = asyncio.run(run(make(), symbols, 1000 * minute))
+            self.assertTrue(all(third.values()))
+            self.assertEqual(requests, [])  # listing date and outage are in the checkpoint
+        print("[PASS] test_download_resume_and_refill")
+
+
+class TestMemoryJournal(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "state.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _lines(self):
+        return self.path.with_name("state.json.journal").read_text().splitlines()
+
+    def test_changes_append_to_journal(self):
+        memory = Memory(self.path)
+        snapshot = self.path.read_bytes()
+        memory.add_open_position("BTCUSDT", {"side": "BUY", "entry_price": 50000})
+        memory.record_trade({"symbol": "ETHUSDT", "pnl": 1.5})
+        memory.update_pnl(1.5)
+        self.assertEqual(self.path.read_bytes(), snapshot)  # the snapshot is not rewritten
+        self.assertEqual(len(self._lines()), 3)
+        reloaded = Memory(self.path)
+        self.assertEqual(reloaded.state["open_positions"], {"BTCUSDT": {"side": "BUY", "entry_price": 50000}})
+        self.assertEqual(reloaded.state["trade_history"], [{"symbol": "ETHUSDT", "pnl": 1.5}])
+        self.assertEqual((reloaded.state["daily_pnl"], reloaded.state["trades_today"]), (1.5, 1))
+        print("[PASS] test_changes_append_to_journal")
+
+    def test_batch_coalesces_saves(self):
+        memory = Memory(self.path)
+        memory.add_open_position("BTCUSDT", {"side": "BUY"})
+        memory.add_open_position("ETHUSDT", {"side": "SELL"})
+        with memory.batch():
+            memory.remove_open_position("BTCUSDT")
+            memory.state["win_streak"] = 2  # in-place mutation, as CompoundingManager does
+            memory.save()
+            for i in range(40):
+                memory.add_user_message(f"m{i}")
+            self.assertEqual(len(self._lines()), 2)
+        self.assertEqual(len(self._lines()), 3)
+        reloaded = Memory(self.path)
+        self.assertEqual(list(reloaded.state["open_positions"]), ["ETHUSDT"])
+        self.assertEqual(reloaded.state["win_streak"], 2)
+        self.assertEqual(reloaded.state["last_user_messages"], [f"m{i}" for i in range(10, 40)])
+        print("[PASS] test_batch_coalesces_saves")
+
+    def test_opening_a_position_is_never_deferred(self):
+        memory = Memory(self.path)
+        with memory.batch():
+            memory.update_pnl(1.0)
+            memory.add_open_position("BTCUSDT", {"side": "BUY"})
+            # a crash here (e.g. SIGTERM skips the batch's exit) must not lose the live position
+            self.assertIn("BTCUSDT", Memory(self.path).state["open_positions"])
+        print("[PASS] test_opening_a_position_is_never_deferred")
+
+    def test_torn_tail_and_snapshot_crash(self):
+        memory = Memory(self.path, snapshot_every=3)
+        memory.record_trade({"n": 1})
+        with open(self.path.with_name("state.json.journal"), "a") as f:
+            f.write('{"seq": 99, "ops": [["set", ["daily_pnl"], 7')  # interrupted write
+        reloaded = Memory(self.path, snapshot_every=3)
+        self.assertEqual((reloaded.state["trade_history"], reloaded.state["daily_pnl"]), ([{"n": 1}], 0.0))
+        reloaded.record_trade({"n": 2})  # appended after the dropped tail
+        journal = self.path.with_name("state.json.journal")
+        for n in range(3, 6):
+            reloaded.record_trade({"n": n})
+        self.assertLessEqual(len(self._lines()), 3)  # folded into a new snapshot
+        # crash after the snapshot rename but before the journal was emptied
+        before = journal.read_bytes()
+        reloaded.snapshot()
+        journal.write_bytes(before)
+        again = Memory(self.path)
+        self.assertEqual([t["n"] for t in again.state["trade_history"]], [1, 2, 3, 4, 5])
+        self.assertEqual(again.state["trades_today"], 5)
+        print("[PASS] test_torn_tail_and_snapshot_crash")
+
+    def test_journal_without_snapshot_is_discarded(self):
+        memory = Memory(self.path)
+        memory.add_open_position("BTCUSDT", {"side": "BUY"})
+        self.path.unlink()
+        self.assertEqual(Memory(self.path).state["open_positions"], {})
+        print("[PASS] test_journal_without_snapshot_is_discarded")
+
+
+class TestSQLiteMemory(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "state.db"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_same_interface_and_batched_commits(self):
+        from core.brain.sqlite_memory import SQLiteMemory
+        memory = SQLiteMemory(self.path)
+        self.assertEqual(memory.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        commits = []
+        memory.conn.set_trace_callback(lambda sql: commits.append(sql) if sql == "COMMIT" else None)
+        with memory.batch():
+            memory.add_open_position("BTCUSDT", {"side": "BUY", "strategy": "momentum"})
+            memory.add_open_position("ETHUSDT", {"side": "SELL"})
+            memory.remove_open_position("ETHUSDT")
+            memory.record_trade({"symbol": "SOLUSDT", "strategy": "rsi", "pnl": -2.0})
+            memory.update_pnl(-2.0)
+            memory.state["strategy_stats"]["rsi"] = {"wins": 0, "losses": 1, "total": 1}
+            memory.state["win_streak"] = 0
+            memory.add_user_message("hello")
+        self.assertEqual(len(commits), 3)  # each opened position commits at once, the rest at exit
+        memory.close()
+        reloaded = SQLiteMemory(self.path)
+        self.assertEqual(reloaded.state["open_positions"], {"BTCUSDT": {"side": "BUY", "strategy": "momentum"}})
+        self.assertEqual([t["symbol"] for t in reloaded.state["trade_history"]], ["SOLUSDT"])
+        self.assertEqual((reloaded.state["daily_pnl"], reloaded.state["trades_today"]), (-2.0, 1))
+        self.assertEqual(reloaded.state["strategy_stats"], {"rsi": {"wins": 0, "losses": 1, "total": 1}})
+        self.assertEqual(reloaded.state["last_user_messages"], ["hello"])
+        print("[PASS] test_same_interface_and_batched_commits")
+
+    def test_history_outlives_the_day_and_queries_use_indexes(self):
+        import time
+        from core.brain.sqlite_memory import DAY_MS, SQLiteMemory
+        memory = SQLiteMemory(self.path)
+        now = int(time.time() * 1000)
+        with memory.batch():
+            for i in range(60):  # one trade every 12 hours, oldest 30 days back
+                memory.record_trade({"ts": now - i * DAY_MS // 2, "symbol": "BTCUSDT" if i % 2 else "ETHUSDT",
+                                     "strategy": "momentum" if i % 3 else "patterns", "pnl": 1.0 if i % 4 else -1.0})
+        memory.conn.execute("UPDATE kv SET value = ? WHERE key = 'date'", ('"2000-01-01"',))
+        memory.close()
+        reopened = SQLiteMemory(self.path)  # a new day: today's view resets, stored history stays
+        self.assertEqual((reopened.state["trade_history"], reopened.state["trades_today"]), ([], 0))
+        self.assertEqual(len(reopened.trades()), 60)
+        pnl = reopened.strategy_pnl(days=10, now_ms=now)
+        self.assertEqual(sum(v["trades"] for v in pnl.values()), 21)
+        self.assertEqual(pnl["patterns"]["trades"], 7)
+        self.assertEqual([t["ts"] for t in reopened.trades(symbol="BTCUSDT", limit=2)],
+                         [now - 3 * DAY_MS // 2, now - DAY_MS // 2])
+        plan = reopened.conn.execute("EXPLAIN QUERY PLAN SELECT strategy, SUM(pnl) FROM trades "
+                                     "WHERE ts >= ? GROUP BY strategy", (now,)).fetchall()
+        self.assertIn("USING INDEX", str(plan))
+        print("[PASS] test_history_outlives_the_day_and_queries_use_indexes")
+
+    def test_migrates_json_state(self):
+        from core.brain.sqlite_memory import SQLiteMemory
+        from core.tools.execution_guard import lead_strategy
+        legacy = Memory(Path(self.tmp.name) / "state.json")
+        legacy.add_open_position("XRPUSDT", {"side": "BUY", "quantity": 3.0})
+        legacy.record_trade({"symbol": "XRPUSDT", "pnl": 0.5})
+        legacy.update_pnl(0.5)
+        memory = SQLiteMemory(self.path, migrate_from=legacy.data_path)
+        self.assertEqual(memory.state["open_positions"], {"XRPUSDT": {"side": "BUY", "quantity": 3.0}})
+        memory.close()
+        reloaded = SQLiteMemory(self.path, migrate_from=legacy.data_path)
+        self.assertEqual((reloaded.state["daily_pnl"], len(reloaded.trades())), (0.5, 1))
+        dump = {"details": [{"strategy": "momentum", "direction": "LONG", "weighted_score": 2.0},
+                            {"strategy": "rsi", "direction": "LONG", "weighted_score": 3.0},
+                            {"strategy": "patterns", "direction": "SHORT", "weighted_score": 5.0}]}
+        self.assertEqual(lead_strategy(dump, "LONG"), "rsi")
+        print("[PASS] test_migrates_json_state")
+
+    def test_migration_leaves_legacy_files_untouched(self):
+        import json
+        from core.brain.sqlite_memory import SQLiteMemory
+        legacy = Memory(Path(self.tmp.name) / "state.json")
+        legacy.add_open_position("XRPUSDT", {"side": "BUY", "quantity": 3.0})
+        legacy.record_trade({"symbol": "XRPUSDT", "pnl": 0.5})
+        snapshot = json.loads(legacy.data_path.read_text())
+        snapshot["date"] = "2020-01-01"  # stale: a full Memory load would reset the day and save
+        legacy.data_path.write_text(json.dumps(snapshot))
+        with open(legacy.journal_path, "a") as f:
+            f.write('{"seq": 99, "ops": [')  # torn tail: a full Memory load would truncate it
+        files = {path: path.read_bytes() for path in (legacy.data_path, legacy.journal_path)}
+        memory = SQLiteMemory(self.path, migrate_from=legacy.data_path)
+        self.assertEqual({path: path.read_bytes() for path in files}, files)
+        self.assertEqual(memory.state["open_positions"], {"XRPUSDT": {"side": "BUY", "quantity": 3.0}})
+        self.assertEqual(len(memory.trades()), 1)
+        memory.close()
+        print("[PASS] test_migration_leaves_legacy_files_untouched")
+
+
+class TestTradeLogger(unittest.TestCase):
+    def test_shared_logger(self):
+        from core.tools.execution_guard import ExecutionGuard
+        from core.tools.trade_logger import get_trade_logger
+        from core.tools.trade_monitor import TradeMonitor
+        memory = Memory(Path(f"/tmp/test_state_logger_{os.getpid()}.json"))
+        self.assertIs(ExecutionGuard(POLICY, memory).logger, TradeMonitor(memory, POLICY).logger)
+        self.assertIs(get_trade_logger(), ExecutionGuard(POLICY, memory).logger)
+        print("[PASS] test_shared_logger")
+
+    def test_rotation_and_columnar_reader(self):
+        import tempfile
+        import time
+        import numpy as np
+        from core.tools.trade_logger import ARCHIVE_DIR, COLUMNS, TradeLogger, read_trades
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "trades.csv"
+            with open(path, "w") as f:  # yesterday's file: rotated by the first new row
+                f.write(",".join(COLUMNS) + "\r\n2020-01-01 10:00:00,OLDUSDT,BUY,1.0,,,,old\r\n")
+            os.utime(path, (time.time() - 86400, time.time() - 86400))
+            logger = TradeLogger(path, max_bytes=800)
+            for i in range(40):
+                logger.log_trade(symbol="BTCUSDT" if i % 2 else "ETHUSDT", side="BUY", entry_price=100.0 + i,
+                                 exit_price=None if i % 4 == 0 else 101.0, pnl=float(i), reason="TAKE_PROFIT")
+            logger.flush()
+            archives = list((Path(tmp) / ARCHIVE_DIR).glob("trades.*.npz"))
+            self.assertGreater(len(archives), 2)  # the daily rotation plus size rotations
+            self.assertLess(path.stat().st_size, 800 + 100)
+            trades = read_trades(path)
+            self.assertEqual(len(trades["pnl"]), 41)
+            self.assertEqual(trades["symbol"][0], "OLDUSDT")
+            np.testing.assert_array_equal(trades["pnl"][1:], np.arange(40.0))
+            self.assertTrue(np.isnan(trades["exit_price"][1]) and trades["exit_price"][2] == 101.0)
+            self.assertEqual(trades["timestamp"].dtype, np.dtype("datetime64[us]"))
+            self.assertTrue((np.diff(trades["timestamp"]) >= np.timedelta64(0, "us")).all())
+            recent = read_trades(path, start="2021-01-01")
+            self.assertEqual((len(recent["pnl"]), set(recent["symbol"])), (40, {"BTCUSDT", "ETHUSDT"}))
+            logger.close()
+        print("[PASS] test_rotation_and_columnar_reader")
+
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("  Mohammed Core - Unit Tests")
@@ -166,6 +1677,31 @@ if __name__ == '__main__':
     suite.addTests(loader.loadTestsFromTestCase(TestMomentumEngine))
     suite.addTests(loader.loadTestsFromTestCase(TestWeightedBrain))
     suite.addTests(loader.loadTestsFromTestCase(TestRiskGovernor))
+    suite.addTests(loader.loadTestsFromTestCase(TestBinanceTransport))
+    suite.addTests(loader.loadTestsFromTestCase(TestAsyncBinanceFutures))
+    suite.addTests(loader.loadTestsFromTestCase(TestRateLimiter))
+    suite.addTests(loader.loadTestsFromTestCase(TestSymbolRegistry))
+    suite.addTests(loader.loadTestsFromTestCase(TestCandleSeries))
+    suite.addTests(loader.loadTestsFromTestCase(TestFastDecode))
+    suite.addTests(loader.loadTestsFromTestCase(TestRollingCandleStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestMarketStream))
+    suite.addTests(loader.loadTestsFromTestCase(TestTradeMonitorSnapshot))
+    suite.addTests(loader.loadTestsFromTestCase(TestMarketScanner))
+    suite.addTests(loader.loadTestsFromTestCase(TestMarketUniverse))
+    suite.addTests(loader.loadTestsFromTestCase(TestIndicators))
+    suite.addTests(loader.loadTestsFromTestCase(TestStreamingIndicators))
+    suite.addTests(loader.loadTestsFromTestCase(TestMomentumBatch))
+    suite.addTests(loader.loadTestsFromTestCase(TestFeatureCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestStrategyRegistry))
+    suite.addTests(loader.loadTestsFromTestCase(TestDerivativesData))
+    suite.addTests(loader.loadTestsFromTestCase(TestResampler))
+    suite.addTests(loader.loadTestsFromTestCase(TestBacktester))
+    suite.addTests(loader.loadTestsFromTestCase(TestSweep))
+    suite.addTests(loader.loadTestsFromTestCase(TestKlineStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestKlineDownloader))
+    suite.addTests(loader.loadTestsFromTestCase(TestMemoryJournal))
+    suite.addTests(loader.loadTestsFromTestCase(TestSQLiteMemory))
+    suite.addTests(loader.loadTestsFromTestCase(TestTradeLogger))
     
     runner = unittest.TextTestRunner(verbosity=2)
     result = runner.run(suite)
@@ -129,7 +129,7 @@ monitor = TradeMonitor(mem3, policy3)
 # محاكاة: السعر وصل للـ TP (3070 > 3060)
 monitor.client._get = MagicMock(side_effect=lambda endpoint, params=None, signed=False:
     [{"symbol": "ETHUSDT", "positionAmt": "1.0"}] if "positionRisk" in endpoint else
-    {"price": "3070.0"} if "ticker/price" in endpoint else
+    [{"symbol": "ETHUSDT", "markPrice": "3070.0"}] if "premiumIndex" in endpoint else
     {"symbols": []} if "exchangeInfo" in endpoint else None
 )
 monitor.client._post = MagicMock(return_value={"orderId": 1001})
@@ -161,7 +161,7 @@ monitor4 = TradeMonitor(mem4, policy4)
 # محاكاة: السعر نزل تحت SL (490 < 494)
 monitor4.client._get = MagicMock(side_effect=lambda endpoint, params=None, signed=False:
     [{"symbol": "BNBUSDT", "positionAmt": "2.0"}] if "positionRisk" in endpoint else
-    {"price": "490.0"} if "ticker/price" in endpoint else
+    [{"symbol": "BNBUSDT", "markPrice": "490.0"}] if "premiumIndex" in endpoint else
     {"symbols": []} if "exchangeInfo" in endpoint else None
 )
 monitor4.client._post = MagicMock(return_value={"orderId": 1002})
@@ -193,7 +193,7 @@ monitor5 = TradeMonitor(mem5, policy5)
 # محاكاة: بينانس يقول positionAmt = 0 (مغلقة)
 monitor5.client._get = MagicMock(side_effect=lambda endpoint, params=None, signed=False:
     [{"symbol": "ADAUSDT", "positionAmt": "0.0"}] if "positionRisk" in endpoint else
-    {"price": "0.99"} if "ticker/price" in endpoint else None
+    [{"symbol": "ADAUSDT", "markPrice": "0.99"}] if "premiumIndex" in endpoint else None
 )
 
 monitor5.check_all_positions()